@@ -1,8 +1,15 @@
 from flask import Flask, jsonify, request
 import chromadb
+import redis
 import numpy as np
 from langchain.vectorstores import Chroma
 from flask_cors import CORS
+from collection_router import CollectionRouter
+from bm25_index import BM25Index
+from doc_hashes import DocumentHashIndex
+from doc_vectors import DOC_COLLECTION, delete_doc_vectors
+from jd_skill_cache import JDSkillCache
+from retrieval_scope import normalize_id
 
 
 
@@ -13,7 +20,15 @@ CORS(app)
 # --- 1️⃣ Connect to your persisted Chroma DB directory ---
 client = chromadb.PersistentClient(path="./chroma_db")
 #vectorstore = client.get_collection("resume_v2")
-vectorstore = Chroma(collection_name="resume_v2", persist_directory="chroma_db")
+# Per-recruiter / per-job shards of resume_v2 (CHROMA_SHARD_MODE, see collection_router.py)
+shards = CollectionRouter(persist_directory="chroma_db")
+bm25 = BM25Index()
+REDIS_URL = "redis://localhost:6379/0"
+r = redis.from_url(REDIS_URL)
+# Per-job state kept next to the chunks; purge_job() clears all of it
+doc_index = DocumentHashIndex(r, shards)
+doc_vectorstore = Chroma(collection_name=DOC_COLLECTION, persist_directory="chroma_db")
+jd_skill_cache = JDSkillCache(r)
 
 
 
@@ -27,12 +42,40 @@ def make_serializable(obj):
         return [make_serializable(i) for i in obj]
     return obj
 
+
+def purge_job(recruiter_id, job_id):
+    """
+    Delete everything stored for a job: its chunks (shards + BM25), the
+    whole-document vectors, the dedup hashes and the cached JD skills.
+    Returns the number of chunks removed.
+    """
+    deleted = shards.drop(recruiter_id, job_id)
+    bm25.drop(recruiter_id, job_id)
+    delete_doc_vectors(doc_vectorstore, recruiter_id, job_id)
+    doc_index.forget_job(recruiter_id, job_id)
+    jd_skill_cache.invalidate(recruiter_id, job_id)
+    return deleted
+
+
+def scoped_collections(recruiter_id=None, job_id=None):
+    """The shard collection(s) a recruiter / job lives in; every shard when unscoped."""
+    if not recruiter_id:
+        return shards.collections()
+    scope = {"recruiter_id": recruiter_id, "job_id": job_id} if job_id else {"recruiter_id": recruiter_id}
+    return [store._collection for store in shards.stores_for(scope)]
+
+
 @app.route("/collections", methods=["GET"])
 def list_collections():
     collections = client.list_collections()
     return jsonify({"collections": [c.name for c in collections]})
 
 
+@app.route("/shards", methods=["GET"])
+def list_shards():
+    return jsonify({"mode": shards.mode, "shards": shards.shards()})
+
+
 # --- 2️⃣ API: List all collections ---
 @app.route("/peek/<collection_name>", methods=["GET"])
 def peek_collection(collection_name):
@@ -75,24 +118,18 @@ def delete_collection(collection_name):
 @app.route("/delete_job_resumes", methods=["POST"])
 def delete_job_resumes():
     data = request.get_json()
-    recruiter_id = data.get("recruiter_id")
-    job_id = data.get("job_id")
+    recruiter_id = normalize_id(data.get("recruiter_id"))
+    job_id = normalize_id(data.get("job_id"))
 
     if not all([recruiter_id, job_id]):
         return jsonify({"error": "recruiter_id and job_id required"}), 400
 
-    # delete from vectorstore
-    vectorstore.delete(
-        where={
-            "$and": [
-                {"recruiter_id": recruiter_id},
-                {"job_id": job_id}
-            ]
-        }
-    )
+    # Per-job shards: a collection delete; otherwise a metadata delete in the shard
+    deleted = purge_job(recruiter_id, job_id)
 
     return jsonify({
-        "message": f"All resumes for recruiter '{recruiter_id}' and job '{job_id}' have been deleted."
+        "message": f"All resumes for recruiter '{recruiter_id}' and job '{job_id}' have been deleted.",
+        "deleted_chunks": deleted
     })
 
 @app.route("/debug/vectorstore", methods=["GET"])
@@ -107,24 +144,25 @@ def debug_vectorstore():
     # Build where filter dynamically
     where_filter = {}
     if recruiter_id:
-        where_filter["recruiter_id"] = recruiter_id.lower()
+        where_filter["recruiter_id"] = normalize_id(recruiter_id)
     if job_id:
-        where_filter["job_id"] = job_id.lower()
+        where_filter["job_id"] = normalize_id(job_id)
+    clauses = [{field: {"$eq": value}} for field, value in where_filter.items()]
+    where = None if not clauses else clauses[0] if len(clauses) == 1 else {"$and": clauses}
 
     try:
-        data = vectorstore._collection.get(
-            where=where_filter if where_filter else None,
-            include=["metadatas"]
-        )
-
         results = []
-        for meta in data.get("metadatas", []):
-            results.append({
-                "recruiter_id": meta.get("recruiter_id"),
-                "job_id": meta.get("job_id"),
-                "doc_type": meta.get("doc_type"),
-                "file_name": meta.get("file_name"),
-            })
+        # Every shard the filter can live in (just resume_v2 when CHROMA_SHARD_MODE=none)
+        for collection in scoped_collections(where_filter.get("recruiter_id"), where_filter.get("job_id")):
+            data = collection.get(where=where, include=["metadatas"])
+            for meta in data.get("metadatas", []):
+                results.append({
+                    "recruiter_id": meta.get("recruiter_id"),
+                    "job_id": meta.get("job_id"),
+                    "doc_type": meta.get("doc_type"),
+                    "file_name": meta.get("file_name"),
+                    "collection": collection.name,
+                })
 
         return jsonify({
             "total_docs": len(results),
@@ -149,43 +187,48 @@ def find_or_delete_docs():
     }
     """
     data = request.get_json() or {}
-    recruiter_id = (data.get("recruiter_id") or "").strip().lower()
-    job_id = (data.get("job_id") or "").strip().lower()
+    recruiter_id = normalize_id(data.get("recruiter_id"))
+    job_id = normalize_id(data.get("job_id"))
     delete_flag = data.get("delete", False)
 
     if not recruiter_id or not job_id:
         return jsonify({"error": "recruiter_id and job_id are required"}), 400
 
-    # --- ✅ Fetch everything from the Chroma collection ---
-    all_docs = vectorstore.get(include=["documents", "metadatas"])
-
-    ids = all_docs.get("ids", [])
-    metadatas = all_docs.get("metadatas", [])
-
     matched = []
-    ids_to_delete = []
-
-    # --- ✅ Filter case-insensitive by recruiter_id + job_id ---
-    for i, meta in enumerate(metadatas):
-        meta_r = (meta.get("recruiter_id") or "").strip().lower()
-        meta_j = (meta.get("job_id") or "").strip().lower()
-        if meta_r == recruiter_id and meta_j == job_id:
-            matched.append({
-                "id": ids[i],
-                "recruiter_id": meta.get("recruiter_id"),
-                "job_id": meta.get("job_id"),
-                "doc_type": meta.get("doc_type"),
-                "file_name": meta.get("file_name")
-            })
-            ids_to_delete.append(ids[i])
+    ids_to_delete = {}  # collection name -> (collection, ids)
+
+    # --- ✅ Scan every shard: legacy chunks with mixed-case ids may sit in any of them ---
+    for collection in shards.collections():
+        all_docs = collection.get(include=["metadatas"])
+        ids = all_docs.get("ids", [])
+        metadatas = all_docs.get("metadatas", [])
+
+        # --- ✅ Filter case-insensitive by recruiter_id + job_id ---
+        for i, meta in enumerate(metadatas):
+            meta_r = normalize_id(meta.get("recruiter_id"))
+            meta_j = normalize_id(meta.get("job_id"))
+            if meta_r == recruiter_id and meta_j == job_id:
+                matched.append({
+                    "id": ids[i],
+                    "recruiter_id": meta.get("recruiter_id"),
+                    "job_id": meta.get("job_id"),
+                    "doc_type": meta.get("doc_type"),
+                    "file_name": meta.get("file_name"),
+                    "collection": collection.name,
+                })
+                ids_to_delete.setdefault(collection.name, (collection, []))[1].append(ids[i])
 
     # --- 🗑️ Delete if requested ---
     if delete_flag and ids_to_delete:
         try:
-            vectorstore.delete(ids=ids_to_delete)
+            for collection, collection_ids in ids_to_delete.values():
+                collection.delete(ids=collection_ids)
+            # ids as stored (the match above is case-insensitive)
+            for stored_recruiter, stored_job in {(m["recruiter_id"], m["job_id"]) for m in matched}:
+                purge_job(stored_recruiter, stored_job)
             return jsonify({
-                "message": f"Deleted {len(ids_to_delete)} document(s)",
-                "deleted_count": len(ids_to_delete)
+                "message": f"Deleted {len(matched)} document(s)",
+                "deleted_count": len(matched)
             }), 200
         except Exception as e:
             return jsonify({"error": f"Delete failed: {str(e)}"}), 500
@@ -208,15 +251,20 @@ def debug_chroma():
     if not recruiter_id:
         return jsonify({"error": "recruiter_id is required"}), 400
 
-    # Step 1️⃣ — Fetch by recruiter_id first (Chroma only allows one condition)
-    data = vectorstore.get(
-        where={"recruiter_id": recruiter_id},
-        include=["metadatas", "documents"]
-    )
+    # Step 1️⃣ — Fetch by recruiter_id first, from the recruiter's shard(s)
+    recruiter_id = normalize_id(recruiter_id)
+    job_id = normalize_id(job_id) or None
+    rows = []
+    for collection in scoped_collections(recruiter_id, job_id):
+        data = collection.get(
+            where={"recruiter_id": recruiter_id},
+            include=["metadatas", "documents"]
+        )
+        rows.extend(zip(data["metadatas"], data["documents"]))
 
     # Step 2️⃣ — Manually filter in Python
     filtered = []
-    for meta, doc in zip(data["metadatas"], data["documents"]):
+    for meta, doc in rows:
         if job_id and meta.get("job_id") != job_id:
             continue
         if doc_type and meta.get("doc_type") != doc_type:
@@ -1,12 +1,13 @@
 # ingest.py
 from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
+from embedding_backends import create_embeddings
+from ingest_utils import detect_section
 from langchain_experimental.text_splitter import SemanticChunker
 import pdfplumber
 import re
 
 # Initialize embeddings
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+embeddings = create_embeddings("sentence-transformers/all-MiniLM-L6-v2")
 
 # Initialize Chroma vectorstore
 vectorstore = Chroma(
@@ -49,18 +50,8 @@ def extract_metadata(chunk, chunk_id):
     if years:
         metadata["years"] = ",".join(sorted(set(years)))
     
-    # Detect section
-    chunk_lower = chunk.lower()
-    if "experience" in chunk_lower or "responsibilities" in chunk_lower:
-        metadata["section"] = "experience"
-    elif "education" in chunk_lower or "certification" in chunk_lower:
-        metadata["section"] = "education"
-    elif "technical" in chunk_lower or "expertise" in chunk_lower:
-        metadata["section"] = "skills"
-    elif "summary" in chunk_lower:
-        metadata["section"] = "summary"
-    else:
-        metadata["section"] = "general"
+    # Detect section (same rules as the app's ingest)
+    metadata["section"] = detect_section(chunk)
     
     return metadata
 
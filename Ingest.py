@@ -1,10 +1,10 @@
 # ingest.py
 from langchain.vectorstores import Chroma
-from langchain.embeddings import HuggingFaceEmbeddings
+from embedding_backends import create_embeddings
 import pdfplumber
 
 # Initialize embeddings
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+embeddings = create_embeddings("sentence-transformers/all-MiniLM-L6-v2")
 
 # Initialize or create Chroma vectorstore
 vectorstore = Chroma(
@@ -1,21 +1,15 @@
+import time
+_app_import_started = time.perf_counter()
+
 from flask import Flask, request,Response,jsonify
 from langchain.vectorstores import Chroma
-from langchain.embeddings import HuggingFaceEmbeddings
 import requests
 import json
 import re
 
-from langchain.llms import Ollama
-from langchain.chains import LLMChain, MapReduceDocumentsChain
-from langchain.prompts import PromptTemplate
 import redis
 from flask_cors import CORS
 
-from langchain.memory import ConversationBufferMemory
-from langchain.memory.chat_message_histories import RedisChatMessageHistory
-from langchain.memory import ConversationBufferMemory
-from langchain.memory import ConversationBufferMemory
-from langchain.schema import Document
 
 
 from voice_handler import voice_bp
@@ -25,35 +19,52 @@ from s3_files import files_bp
 
 
 from datetime import timedelta
-from ingest_utils import read_pdf, chunk_text, extract_metadata
+from ingest_utils import read_pdf, read_pdfs, chunk_text, extract_metadata, detect_section, year_metadata
 
 import requests
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 from flask import Flask, request, jsonify
 from matching_skill_extraction import extract_and_compare_skills,extract_and_compare_skills_with_flag
 
 from flask import request, jsonify
-import uuid, os
+import uuid, os, io
 from werkzeug.utils import secure_filename
 import uuid
 from collections import defaultdict
 
 
 from ingest_utils import read_pdf, chunk_text, extract_metadata
-from ats_evaluate_utills import extract_keywords_from_jd,compute_keyword_score,evaluate_resume_hybrid,compute_embedding_similarity
+from ats_evaluate_utills import extract_keywords_from_jd,compute_keyword_score,evaluate_resume_hybrid,compute_embedding_similarities
 from flask import request, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from models import db
 from models import User
 from flask_jwt_extended import JWTManager
+from doc_vectors import DOC_COLLECTION, store_doc_vector, resolve_doc_vectors
+from batch_scoring import CohortScorer
+from llm_pool import map_bounded
+from jd_skill_cache import JDSkillCache
+from llm_cache import llm_cache
+from llm_client import llm_client, query_ollama
+from streaming import wants_stream, event_stream_response
+from ingest_jobs import IngestJobQueue
+from doc_hashes import DocumentHashIndex, file_hash, text_hash
+from retrieval_scope import normalize_id, request_scope, scope_filter
+from chunk_store import key_metadata, fetch_text, fetch_texts_by_file
+from bulk_embed import ChunkBatcher
+from collection_router import CollectionRouter
+from bm25_index import BM25Index
+from hybrid_retrieval import hybrid_search, BM25_ENABLED, HYBRID_CANDIDATES, HYBRID_TOP_K
+from reranker import Reranker, RERANK_ENABLED, RERANK_CANDIDATES
+from context_packer import pack_chunks
+import model_loader
+from model_loader import LazyEmbeddings, LazyProxy
 import logging
 
 
 
 redis_url = "redis://localhost:6379"
-OLLAMA_URL = "http://localhost:11434/api/generate"
 app = Flask(__name__)
 #CORS(app)
 
@@ -92,10 +103,21 @@ def after_request(response):
 # Initialize embeddings + Chroma
 
 #embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-mpnet-base-v2")
-
-
-vectorstore = Chroma(collection_name="resume_v2", embedding_function=embeddings, persist_directory="chroma_db")
+# Models and Chroma load on first use (model_loader); set PRELOAD_MODELS to warm them at startup
+embeddings = LazyEmbeddings()
+
+# Resume / JD chunks: resume_v2, or per-recruiter / per-job shards (CHROMA_SHARD_MODE)
+model_loader.register("resume_shards", lambda: CollectionRouter(embeddings, persist_directory="chroma_db"))
+# One whole-document vector per resume / JD, used for batch scoring
+model_loader.register("doc_vectorstore", lambda: Chroma(
+    collection_name=DOC_COLLECTION, embedding_function=embeddings, persist_directory="chroma_db"
+))
+shards = LazyProxy("resume_shards")
+doc_vectorstore = LazyProxy("doc_vectorstore")
+# Lexical index written alongside the Chroma chunks, for hybrid /ask-hybrid retrieval
+bm25 = BM25Index()
+# Optional cross-encoder pass over the fused candidates (RERANK_ENABLED)
+reranker = Reranker()
 
 app.register_blueprint(voice_bp)
 app.register_blueprint(auth_bp, url_prefix='/auth')
@@ -112,61 +134,8 @@ logging.basicConfig(
         logging.StreamHandler()                     # also show in console
     ]
 )
+logger = logging.getLogger(__name__)
 
-def query_ollama(prompt, ollama_url="http://localhost:11434/api/generate"):
-    """
-    Queries Ollama for LLM evaluation and ensures a JSON dict is always returned.
-    """
-
-    instruction = (
-        "You are a resume evaluator. Analyze the resume against the job description "
-        "and return the result strictly as a JSON object with the following fields:\n"
-        " - llm_score (integer 0-100)\n"
-        " - matched_skills (list of strings)\n"
-        " - missing_skills (list of strings)\n\n"
-        "Do not include any text outside the JSON."
-    )
-
-    full_prompt = f"{instruction}\n\n{prompt}"
-
-    payload = {
-        "model": "llama3:8b",
-        "prompt": full_prompt,
-        "stream": False,
-        "options": {"temperature": 0.1, "top_p": 0.9, "num_predict": 300}
-    }
-
-    try:
-        response = requests.post(ollama_url, json=payload, timeout=40)
-        data = response.json()
-
-        # Ollama might return {"response": "..."}
-        output = data.get("response", "")
-
-        # Try strict JSON parsing first
-        try:
-            parsed = json.loads(output)
-            return parsed
-        except json.JSONDecodeError:
-            pass
-
-        # Fallback: extract score using regex if not JSON
-        score_match = re.search(r"(\d{1,3})\s*%", output)
-        llm_score = int(score_match.group(1)) if score_match else 0
-
-        return {
-            "llm_score": llm_score,
-            "matched_skills": [],
-            "missing_skills": []
-        }
-
-    except Exception as e:
-        return {
-            "llm_score": 0,
-            "matched_skills": [],
-            "missing_skills": []
-        }
-    
 @app.route("/")
 def home():
     return "Flask is running again !"
@@ -174,9 +143,14 @@ def home():
 #redis_client = redis.StrictRedis.from_url(redis_url)
 REDIS_URL = "redis://localhost:6379/0"
 r = redis.from_url(REDIS_URL)
+jd_skill_cache = JDSkillCache(r)
+ingest_jobs = IngestJobQueue(r)
+doc_index = DocumentHashIndex(r, shards)
 
 def get_memory(session_id: str):
-    
+    from langchain.memory import ConversationBufferMemory
+    from langchain.memory.chat_message_histories import RedisChatMessageHistory
+
     key = f"message_store:{session_id}"
 
     # set expiry of 4 hours (14400 seconds)
@@ -194,29 +168,61 @@ def get_memory(session_id: str):
     return memory
 
 
-def build_hybrid_context_and_query(question):
-    """Helper to perform year-aware vector search, build the strict resume prompt,
-    query the Ollama API with streaming, and return the final answer string.
-    Returns None if no relevant results were found.
+def vector_search(question, k, scope=None):
+    """
+    Year-aware vector search. Scope and year are pushed down to Chroma as
+    metadata filters, and the scope picks the shard(s) to search.
     """
     year_match = re.search(r'\b(19\d{2}|20\d{2})\b', question)
 
     if year_match:
         year = year_match.group(1)
-        all_results = vectorstore.similarity_search(question, k=30)
+        year_results = shards.similarity_search(question, k=k, scope=scope, filter=scope_filter(scope, year))
+        if year_results:
+            return year_results
+
+        # Chunks ingested before year_YYYY flags existed: previous post-filter, within scope
+        all_results = shards.similarity_search(question, k=max(30, k), scope=scope, filter=scope_filter(scope))
         year_filtered = [r for r in all_results if year in r.page_content]
-        results = year_filtered[:5] if year_filtered else all_results[:5]
-    else:
-        results = vectorstore.similarity_search(question, k=5)
+        return year_filtered[:k] if year_filtered else all_results[:k]
+    return shards.similarity_search(question, k=k, scope=scope, filter=scope_filter(scope))
+
+
+def retrieve_resume_chunks(question, scope=None, timings=None):
+    """
+    Hybrid retrieval used by /ask-hybrid and /voice-query: vector search and
+    BM25 run in parallel and are fused with RRF; with RERANK_ENABLED the
+    fused candidates are cut down by the cross-encoder. Per-stage latencies
+    (ms) are written into `timings` when a dict is passed.
+    """
+    retrievers = {"vector": lambda: vector_search(question, HYBRID_CANDIDATES, scope)}
+    if BM25_ENABLED:
+        retrievers["bm25"] = lambda: [doc for doc, _ in bm25.search(question, HYBRID_CANDIDATES, scope)]
+
+    results, stage_timings = hybrid_search(retrievers, k=RERANK_CANDIDATES if RERANK_ENABLED else HYBRID_TOP_K)
+    if RERANK_ENABLED and results:
+        start = time.perf_counter()
+        results = reranker.rerank(question, results)
+        stage_timings["rerank"] = round((time.perf_counter() - start) * 1000, 2)
+        stage_timings["retrieval"] = round(stage_timings["retrieval"] + stage_timings["rerank"], 2)
+    if timings is not None:
+        timings.update(stage_timings)
+    return results
+
+
+def pack_resume_context(results):
+    """
+    Dedupe the retrieved chunks and pack them, best first, into
+    RAG_CONTEXT_TOKENS. Returns (chunks used, context text, token count).
+    """
+    packed = pack_chunks([chunk.page_content for chunk in results])
+    return [results[i] for i in packed["chunks"]], packed["text"], packed["tokens"]
 
-    if not results:
-        return None
 
-    # Build context
-    context = "\n\n".join([chunk.page_content for chunk in results])
+def build_resume_prompt(question, context):
 
     # Strict prompt to prevent hallucination
-    prompt = f"""You are a precise resume analyzer. Follow these rules:
+    return f"""You are a precise resume analyzer. Follow these rules:
 
 1. Answer ONLY using information from the RESUME CONTEXT below
 2. If information exists: provide specific details (companies, dates, projects)
@@ -230,32 +236,69 @@ QUESTION: {question}
 
 ANSWER:"""
 
-    # Query Ollama
-    final_answer = ""
-    payload = {
-        "model": "llama3:8b",
-        "prompt": prompt,
-        "stream": True,
-        "options": {
-            "temperature": 0.1,
-            "top_p": 0.9,
-            "num_predict": 300
-        }
-    }
 
-    response = requests.post(OLLAMA_URL, json=payload, stream=True, timeout=30)
+def stream_ollama_tokens(prompt):
+    """Yield response tokens from Ollama as they are generated."""
+    return llm_client.generate_stream(prompt, timeout=30)
 
-    for line in response.iter_lines():
-        if line:
-            try:
-                chunk_data = json.loads(line.decode("utf-8"))
-                final_answer += chunk_data.get("response", "")
-            except json.JSONDecodeError:
-                continue
 
+def build_hybrid_context_and_query(question, scope=None, timings=None, context_info=None):
+    """Helper to perform hybrid (BM25 + vector) retrieval, build the strict resume prompt,
+    query the Ollama API with streaming, and return the final answer string.
+    Returns None if no relevant results were found. Stage latencies go into `timings`,
+    the packed context size (context_tokens / context_chunks) into `context_info`.
+    """
+    timings = {} if timings is None else timings
+    results = retrieve_resume_chunks(question, scope, timings)
+    if not results:
+        return None
+
+    used, context, context_tokens = pack_resume_context(results)
+    if context_info is not None:
+        context_info.update({"context_tokens": context_tokens, "context_chunks": len(used)})
+
+    start = time.perf_counter()
+    final_answer = "".join(stream_ollama_tokens(build_resume_prompt(question, context)))
+    timings["generation"] = round((time.perf_counter() - start) * 1000, 2)
     return final_answer.strip() or "No answer generated."
 
 
+def stream_hybrid_answer(question, scope=None):
+    """
+    Streaming variant of build_hybrid_context_and_query. Yields event dicts:
+    one "context" event with the metadata of the chunks packed into the
+    prompt, its token count and the retrieval timings, then a "token" event
+    per generated token, then "done" with the full answer and all stage
+    timings (ms).
+    """
+    try:
+        timings = {}
+        results = retrieve_resume_chunks(question, scope, timings)
+        results, context, context_tokens = pack_resume_context(results)
+        yield {
+            "type": "context",
+            "chunks": [
+                {**chunk.metadata, "chunk_length": len(chunk.page_content)}
+                for chunk in results
+            ],
+            "context_tokens": context_tokens,
+            "timings_ms": dict(timings)
+        }
+        if not results:
+            yield {"type": "done", "answer": "No relevant content found.", "timings_ms": timings}
+            return
+
+        final_answer = ""
+        start = time.perf_counter()
+        for token in stream_ollama_tokens(build_resume_prompt(question, context)):
+            final_answer += token
+            yield {"type": "token", "token": token}
+        timings["generation"] = round((time.perf_counter() - start) * 1000, 2)
+        yield {"type": "done", "answer": final_answer.strip() or "No answer generated.", "timings_ms": timings}
+    except Exception as e:
+        yield {"type": "error", "error": str(e)}
+
+
 # hyrbid ask
 @app.route("/ask-hybrid", methods=["POST"])
 def ask_hybrid():
@@ -267,14 +310,22 @@ def ask_hybrid():
     if not question:
         return jsonify({"answer": "Please provide a question."})
 
+    # Optional recruiter_id / job_id / file_name scope, applied to both the Chroma and BM25 searches
+    scope = request_scope(data)
+
+    # Streamed mode: retrieval metadata first, then tokens as Ollama produces them
+    if wants_stream(request):
+        return event_stream_response(stream_hybrid_answer(question, scope), request)
+
+    timings, context_info = {}, {}
     try:
-        final_answer = build_hybrid_context_and_query(question)
+        final_answer = build_hybrid_context_and_query(question, scope, timings, context_info)
         if final_answer is None:
-            return jsonify({"answer": "No relevant content found."})
+            return jsonify({"answer": "No relevant content found.", "timings_ms": timings})
     except Exception as e:
         return jsonify({"answer": f"Error: {str(e)}"})
     
-    return jsonify({"answer": final_answer})
+    return jsonify({"answer": final_answer, **context_info, "timings_ms": timings})
 
 # ingest Resume and JD and evaluate
 
@@ -291,51 +342,291 @@ def ingest_documents():
 
     resume_pdf = request.files['resume_file']
     jd_text = request.form['jd_text']
-    recruiter_id = request.form.get('recruiter_id')
+    recruiter_id = normalize_id(request.form.get('recruiter_id'))
     applicant_id = request.form.get('applicant_id')
-    job_id = request.form.get('job_id')
+    job_id = normalize_id(request.form.get('job_id'))
 
     if not recruiter_id or not applicant_id or not job_id:
         return jsonify({"error": "Missing recruiter_id, applicant_id or job_id"}), 400
     
-    existing_docs = vectorstore.similarity_search(
-        query="",  # no actual query, just filter
-        filter={
-            "$and": [
-                {"recruiter_id": recruiter_id},
-                {"applicant_id": applicant_id},
-                {"job_id": job_id},
-                {"doc_type": "resume_v2"}
-            ]
-        },
-        k=1
+    # Metadata-only existence check (no embedding, no ANN query); a job
+    # whose shard was never written has nothing ingested yet
+    existing_store = shards.store(recruiter_id, job_id, create=False)
+    if existing_store is not None:
+        existing_docs = existing_store._collection.get(
+            where={
+                "$and": [
+                    {"recruiter_id": recruiter_id},
+                    {"applicant_id": applicant_id},
+                    {"job_id": job_id},
+                    {"doc_type": "resume_v2"}
+                ]
+            },
+            limit=1,
+            include=["metadatas"]
+        )
+
+        if existing_docs["ids"]:
+            return jsonify({"error": "Resume for this recruiter, applicant, and job already exists"}), 409
+
+    # --- 1️⃣ Process Resume PDF ---
+    pdf_bytes = resume_pdf.read()
+    resume_sha = file_hash(pdf_bytes)
+    resume_text = read_pdf(io.BytesIO(pdf_bytes))
+    resume_text_sha = text_hash(resume_text)
+
+    # Identical resume already stored somewhere: copy its chunks + embeddings
+    resume_status = "ingested"
+    resume_chunks, resume_metadata = [], []
+    source = doc_index.find_anywhere("resume_v2", resume_text_sha)
+    if source:
+        resume_chunks, resume_metadata = doc_index.link(source, recruiter_id, job_id, "resume_v2", {
+            "applicant_id": applicant_id,
+            "file_name": None,
+            "file_sha256": resume_sha,
+            **key_metadata("resume_v2", recruiter_id, job_id, applicant_id=applicant_id),
+        })
+        resume_status = "linked" if resume_chunks else resume_status
+
+    if not resume_chunks:
+        resume_chunks = chunk_text(resume_text, embeddings)
+        resume_metadata = [
+            {
+                **extract_metadata(c, idx, "resume_v2", recruiter_id, applicant_id, job_id),
+                **key_metadata("resume_v2", recruiter_id, job_id, applicant_id=applicant_id),
+                "file_sha256": resume_sha,
+                "text_sha256": resume_text_sha
+            }
+            for idx, c in enumerate(resume_chunks)
+        ]
+        shards.store(recruiter_id, job_id).add_texts(resume_chunks, resume_metadata)
+    bm25.add(recruiter_id, job_id, resume_chunks, resume_metadata)
+
+    # Keyed like the chunks (applicant_id; they carry no file_name) so /evaluate_resume finds it
+    store_doc_vector(doc_vectorstore, "\n".join(resume_chunks), "resume_v2", recruiter_id, job_id,
+                     applicant_id=applicant_id)
+    doc_index.record(recruiter_id, job_id, "resume_v2", applicant_id, resume_text_sha,
+                     file_sha256=resume_sha, chunks=len(resume_chunks))
+
+    # --- 2️⃣ Process Job Description Text (once per job) ---
+    jd_status, jd_chunk_count = ingest_job_description(
+        recruiter_id, job_id, jd_text,
+        lambda c, idx: {
+            **extract_metadata(c, idx, "job", recruiter_id, None, job_id),
+            **key_metadata("job", recruiter_id, job_id)
+        }
     )
 
-    if existing_docs:
-        return jsonify({"error": "Resume for this recruiter, applicant, and job already exists"}), 409
+    return jsonify({
+        "message": "Resume and Job Description ingested successfully",
+        "resume_chunks": len(resume_chunks),
+        "resume_status": resume_status,
+        "jd_chunks": jd_chunk_count,
+        "jd_status": jd_status
+    })
+
 
-    # --- 1️⃣ Process Resume PDF ---
-    resume_text = read_pdf(resume_pdf)
-    resume_chunks = chunk_text(resume_text, embeddings)
-    resume_metadata = [
-        extract_metadata(c, idx, "resume_v2", recruiter_id, applicant_id, job_id)
-        for idx, c in enumerate(resume_chunks)
-    ]
-    vectorstore.add_texts(resume_chunks, resume_metadata)
+def ingest_job_description(recruiter_id, job_id, jd_text, build_metadata):
+    """
+    Store the JD once per job. An identical JD (by normalized text hash) is
+    skipped; a different one replaces the job's previous JD chunks.
+    Returns (status, chunk_count), status being "skipped", "ingested" or "replaced".
+    """
+    jd_sha = text_hash(jd_text)
+    if doc_index.find(recruiter_id, job_id, "job", text_sha256=jd_sha):
+        return "skipped", 0
+
+    jd_scope = {
+        "$and": [
+            {"recruiter_id": {"$eq": recruiter_id}},
+            {"job_id": {"$eq": job_id}},
+            {"doc_type": {"$eq": "job"}}
+        ]
+    }
+    status = "ingested"
+    vectorstore = shards.store(recruiter_id, job_id)
+    if vectorstore._collection.get(where=jd_scope, limit=1, include=["metadatas"])["ids"]:
+        vectorstore._collection.delete(where=jd_scope)
+        bm25.remove(recruiter_id, job_id, doc_type="job")
+        doc_index.forget(recruiter_id, job_id, "job")
+        status = "replaced"
 
-    # --- 2️⃣ Process Job Description Text ---
     jd_chunks = chunk_text(jd_text, embeddings)
     jd_metadata = [
-        extract_metadata(c, idx, "job", recruiter_id, None, job_id)
+        {**build_metadata(c, idx), "text_sha256": jd_sha}
         for idx, c in enumerate(jd_chunks)
     ]
     vectorstore.add_texts(jd_chunks, jd_metadata)
+    bm25.add(recruiter_id, job_id, jd_chunks, jd_metadata)
+    store_doc_vector(doc_vectorstore, "\n".join(jd_chunks), "job", recruiter_id, job_id)
+    jd_skill_cache.invalidate(recruiter_id, job_id)
+    doc_index.record(recruiter_id, job_id, "job", "job_description", jd_sha, chunks=len(jd_chunks))
+    return status, len(jd_chunks)
 
-    return jsonify({
-        "message": "Resume and Job Description ingested successfully",
-        "resume_chunks": len(resume_chunks),
-        "jd_chunks": len(jd_chunks)
-    })
+
+def process_batch_ingest(recruiter_id, job_id, jd_text, files, progress=None):
+    """
+    Chunk, embed and store the JD and every resume of a batch upload.
+    `files` is a list of (file_name, pdf_bytes). `progress(index, **fields)`
+    is called as each file moves through the pipeline.
+    Raises if the JD fails; per-resume failures are recorded and skipped.
+    """
+    progress = progress or (lambda index, **fields: None)
+    processed = []
+    failed = []
+    skipped = []
+
+    # --- 1️⃣ Process JD once per job ---
+    jd_status, _ = ingest_job_description(
+        recruiter_id, job_id, jd_text,
+        lambda c, idx: {
+            "chunk_index": idx,
+            "doc_type": "job",
+            "recruiter_id": recruiter_id,
+            "file_name": "job_description",
+            "job_id": job_id,
+            **key_metadata("job", recruiter_id, job_id),
+            **year_metadata(c)
+        }
+    )
+
+    def skip(index, file_name, duplicate):
+        skipped.append({"file_name": file_name, "duplicate_of": duplicate["file_name"]})
+        progress(index, status="skipped", duplicate_of=duplicate["file_name"])
+
+    # --- 2️⃣ Skip uploads whose bytes are already stored for this job (no parsing) ---
+    file_hashes = [file_hash(pdf_bytes) for _, pdf_bytes in files]
+    seen_files, seen_texts = {}, {}
+    to_parse = []
+    for index, (file_name, _) in enumerate(files):
+        fh = file_hashes[index]
+        duplicate = seen_files.get(fh) or doc_index.find(recruiter_id, job_id, "resume_v2", file_sha256=fh)
+        if duplicate:
+            skip(index, file_name, duplicate)
+            continue
+        seen_files[fh] = {"file_name": file_name}
+        to_parse.append(index)
+
+    # --- 3️⃣ Parse remaining PDFs in parallel (process pool, page order preserved) ---
+    resume_texts = dict(zip(
+        to_parse,
+        read_pdfs([files[i][1] for i in to_parse], return_exceptions=True)
+    ))
+
+    # --- 4️⃣ Chunk each resume; embedding is batched across files ---
+    batcher = ChunkBatcher(embeddings, shards.collection(recruiter_id, job_id))
+    pending = {}  # index -> (file_name, resume_chunks, resume_metadata, text_sha256, linked)
+
+    def flush():
+        indexed_chunks, indexed_metadata = [], []
+        for index, outcome in batcher.flush().items():
+            file_name, resume_chunks, resume_metadata, th, linked = pending.pop(index)
+            try:
+                if isinstance(outcome, Exception):
+                    raise outcome
+
+                store_doc_vector(doc_vectorstore, "\n".join(resume_chunks), "resume_v2", recruiter_id, job_id,
+                                 file_name=file_name, vector=outcome["doc_vector"])
+                doc_index.record(recruiter_id, job_id, "resume_v2", file_name, th,
+                                 file_sha256=file_hashes[index], chunks=len(resume_chunks))
+            except Exception as e:
+                failed.append({
+                    "file_name": file_name,
+                    "error": str(e)
+                })
+                progress(index, status="failed", error=str(e))
+                continue
+
+            indexed_chunks.extend(resume_chunks)
+            indexed_metadata.extend(resume_metadata)
+            processed.append({
+                "file_name": file_name,
+                "chunks": len(resume_chunks),
+                "status": "success",
+                "linked": linked
+            })
+            progress(index, status="success", chunks=len(resume_chunks))
+        # One BM25 write per flush for every file that made it into Chroma
+        bm25.add(recruiter_id, job_id, indexed_chunks, indexed_metadata)
+
+    for index in to_parse:
+        file_name = files[index][0]
+        progress(index, status="processing")
+        try:
+            resume_text = resume_texts[index]
+            if isinstance(resume_text, Exception):
+                raise resume_text
+
+            if not resume_text.strip():
+                raise ValueError("Empty PDF")
+
+            # Same text under a different file (re-exported PDF, renamed copy)
+            th = text_hash(resume_text)
+            duplicate = seen_texts.get(th) or doc_index.find(recruiter_id, job_id, "resume_v2", text_sha256=th)
+            if duplicate:
+                skip(index, file_name, duplicate)
+                continue
+            seen_texts[th] = {"file_name": file_name}
+
+            # Identical resume stored for another job: copy chunks + embeddings instead of re-embedding
+            resume_chunks, linked_metadata = [], []
+            source = doc_index.find_anywhere("resume_v2", th)
+            if source:
+                resume_chunks, linked_metadata = doc_index.link(source, recruiter_id, job_id, "resume_v2", {
+                    "file_name": file_name,
+                    "file_sha256": file_hashes[index],
+                    "applicant_id": None,
+                    **key_metadata("resume_v2", recruiter_id, job_id, file_name=file_name),
+                })
+
+            new_chunks, resume_metadata = [], []
+            if not resume_chunks:
+                resume_chunks = new_chunks = chunk_text(resume_text, embeddings)
+                resume_metadata = [
+                    {
+                        "chunk_index": idx,
+                        "doc_type": "resume_v2",
+                        "recruiter_id": recruiter_id,
+                        "file_name": file_name,  # ✅ FIX: Use actual filename
+                        "job_id": job_id,
+                        "file_sha256": file_hashes[index],
+                        "text_sha256": th,
+                        "section": detect_section(c),
+                        **key_metadata("resume_v2", recruiter_id, job_id, file_name=file_name),
+                        **year_metadata(c)
+                    }
+                    for idx, c in enumerate(resume_chunks)
+                ]
+
+            batcher.add(index, new_chunks, resume_metadata, doc_text="\n".join(resume_chunks))
+            pending[index] = (file_name, resume_chunks, resume_metadata or linked_metadata, th, bool(source))
+            progress(index, status="embedding", chunks=len(resume_chunks))
+
+        except Exception as e:
+            failed.append({
+                "file_name": file_name,
+                "error": str(e)
+            })
+            progress(index, status="failed", error=str(e))
+            continue
+
+        if batcher.should_flush():
+            flush()
+
+    flush()
+
+    return {
+        "recruiter_id": recruiter_id,
+        "job_id": job_id,
+        "jd_status": jd_status,
+        "total_files": len(files),
+        "processed_count": len(processed),
+        "failed_count": len(failed),
+        "skipped_count": len(skipped),
+        "processed": processed,
+        "failed": failed,
+        "skipped": skipped
+    }
 
 
 # Batch Ingest endpoint
@@ -344,9 +635,13 @@ def batch_ingest():
     """
     Accepts multiple resume PDFs for the same job description.
     Each resume is chunked, embedded, and stored in the vector database.
+
+    Runs as a background job by default and returns 202 with an
+    ingest_job_id; poll /batch_ingest/status/<ingest_job_id> for progress.
+    Send sync=true to process inside the request as before.
     """
-    recruiter_id = request.form.get("recruiter_id").lower()
-    job_id = request.form.get("job_id").lower()
+    recruiter_id = normalize_id(request.form.get("recruiter_id"))
+    job_id = normalize_id(request.form.get("job_id"))
     jd_text = request.form.get("jd_text")
     resume_files = request.files.getlist("resume_files")
 
@@ -357,69 +652,34 @@ def batch_ingest():
     if not resume_files or len(resume_files) == 0:
         return jsonify({"error": "No resume files uploaded"}), 400
 
-    processed = []
-    failed = []
+    # Uploads are only readable during the request, so buffer them for the worker
+    files = [(f.filename, f.read()) for f in resume_files]
 
-    try:
-        # --- 1️⃣ Process JD once ---
-        jd_chunks = chunk_text(jd_text, embeddings)
-        jd_metadata = [
-            {
-                "chunk_index": idx,
-                "doc_type": "job",
-                "recruiter_id": recruiter_id,
-                "file_name": "job_description",
-                "job_id": job_id
-            }
-            for idx, c in enumerate(jd_chunks)
-        ]
-        vectorstore.add_texts(jd_chunks, jd_metadata)
-    except Exception as e:
-        return jsonify({"error": f"Failed to process JD: {str(e)}"}), 500
-
-    # --- 2️⃣ Process Each Resume PDF ---
-    for resume_pdf in resume_files:
+    if request.form.get("sync", "").lower() == "true":
         try:
-            resume_text = read_pdf(resume_pdf)
-
-            if not resume_text.strip():
-                raise ValueError("Empty PDF")
-
-            resume_chunks = chunk_text(resume_text, embeddings)
-            resume_metadata = [
-                {
-                    "chunk_index": idx,
-                    "doc_type": "resume_v2",
-                    "recruiter_id": recruiter_id,
-                    "file_name": resume_pdf.filename,  # ✅ FIX: Use actual filename
-                    "job_id": job_id
-                }
-                for idx, c in enumerate(resume_chunks)
-            ]
-
-            vectorstore.add_texts(resume_chunks, resume_metadata)
-
-            processed.append({
-                "file_name": resume_pdf.filename,
-                "chunks": len(resume_chunks),
-                "status": "success"
-            })
-
+            return jsonify(process_batch_ingest(recruiter_id, job_id, jd_text, files)), 200
         except Exception as e:
-            failed.append({
-                "file_name": resume_pdf.filename,
-                "error": str(e)
-            })
+            return jsonify({"error": f"Failed to process JD: {str(e)}"}), 500
+
+    ingest_job_id = ingest_jobs.create(recruiter_id, job_id, [name for name, _ in files])
+    ingest_jobs.submit(ingest_job_id, process_batch_ingest, recruiter_id, job_id, jd_text, files)
 
     return jsonify({
+        "ingest_job_id": ingest_job_id,
+        "status": "queued",
         "recruiter_id": recruiter_id,
         "job_id": job_id,
-        "total_files": len(resume_files),
-        "processed_count": len(processed),
-        "failed_count": len(failed),
-        "processed": processed,
-        "failed": failed
-    }), 200
+        "total_files": len(files),
+        "status_url": f"/batch_ingest/status/{ingest_job_id}"
+    }), 202
+
+
+@app.route("/batch_ingest/status/<ingest_job_id>", methods=["GET"])
+def batch_ingest_status(ingest_job_id):
+    status = ingest_jobs.status(ingest_job_id)
+    if status is None:
+        return jsonify({"error": "Ingest job not found"}), 404
+    return jsonify(status)
 
 #Evaluate resume endpoint
 
@@ -427,50 +687,33 @@ def batch_ingest():
 @app.route("/evaluate_resume", methods=["POST"])
 def evaluate_resume():
     data = request.get_json()
-    recruiter_id = data.get("recruiter_id")
+    recruiter_id = normalize_id(data.get("recruiter_id"))
     applicant_id = data.get("applicant_id")
-    job_id = data.get("job_id")
+    job_id = normalize_id(data.get("job_id"))
 
     if not all([recruiter_id, applicant_id, job_id]):
         return jsonify({"error": "recruiter_id, applicant_id, and job_id are required"}), 400
 
-    # Fetch resume & JD chunks from vectorstore
-    resume_chunks = vectorstore.similarity_search(
-        query="",
-        filter={
-            "$and": [
-                {"recruiter_id": recruiter_id},
-                {"applicant_id": applicant_id},
-                {"job_id": job_id},
-                {"doc_type": "resume_v2"},
-            ]
-        },
-        k=10,
-    )
+    # Fetch every resume & JD chunk by metadata, in chunk order (no embedding, no ANN)
+    collection = shards.collection(recruiter_id, job_id, create=False)
+    resume_text = fetch_text(collection, recruiter_id, job_id, "resume_v2", applicant_id=applicant_id)
+    jd_text = fetch_text(collection, recruiter_id, job_id, "job")
 
-    jd_chunks = vectorstore.similarity_search(
-        query="",
-        filter={
-            "$and": [
-                {"recruiter_id": recruiter_id},
-                {"job_id": job_id},
-                {"doc_type": "job"},
-            ]
-        },
-        k=5,
-    )
-
-    if not resume_chunks or not jd_chunks:
+    if not resume_text or not jd_text:
         return jsonify({"error": "Resume or JD not found"}), 404
 
-    resume_text = "\n".join([c.page_content for c in resume_chunks])
-    jd_text = "\n".join([c.page_content for c in jd_chunks])
-
     #  Extract and compare skills
-    skill_results = extract_and_compare_skills(resume_text, jd_text)
-
-    # 🔹 Compute embedding similarity
-    embedding_similarity = compute_embedding_similarity(resume_text, jd_text, embeddings)
+    jd_skills = jd_skill_cache.get_or_extract(recruiter_id, job_id, jd_text)
+    skill_results = extract_and_compare_skills(resume_text, jd_text, jd_skills)
+
+    # 🔹 Compute embedding similarity from the whole-document vectors stored at ingest
+    jd_vector = resolve_doc_vectors(
+        doc_vectorstore, recruiter_id, job_id, "job", {"job_description": jd_text}
+    )["job_description"]
+    resume_vector = resolve_doc_vectors(
+        doc_vectorstore, recruiter_id, job_id, "resume_v2", {applicant_id: resume_text}, key="applicant_id"
+    )[applicant_id]
+    embedding_similarity = compute_embedding_similarities([resume_vector], jd_vector)[0]
 
     # 🔹 Compute final hybrid score (weighted)
     final_score = round(
@@ -486,6 +729,7 @@ def evaluate_resume():
         "final_score": final_score,
         "matched_skills": skill_results["matched_skills"],
         "missing_skills": skill_results["missing_skills"],
+        "context_tokens": skill_results["context_tokens"],
     })
 
 
@@ -494,7 +738,6 @@ def evaluate_resume():
 from flask import Flask, request, jsonify
 from collections import defaultdict
 import uuid
-from langchain.schema import Document
 
 
 @app.route("/evaluate_batch_summary", methods=["POST"])
@@ -504,60 +747,42 @@ def evaluate_batch_summary():
     Mode options: 'fast' (no LLM), 'full' (with LLM), 'auto' (LLM for top 5 only)
     """
     data = request.get_json()
-    recruiter_id = data.get("recruiter_id").lower()
-    job_id = data.get("job_id").lower()
+    recruiter_id = normalize_id(data.get("recruiter_id"))
+    job_id = normalize_id(data.get("job_id"))
     mode = data.get("mode", "auto").lower()
 
     if not all([recruiter_id, job_id]):
         return jsonify({"error": "recruiter_id and job_id required"}), 400
 
-    collection = vectorstore._collection
-
-    # --- Fetch resumes ---
-    resume_data = collection.get(
-        where={
-            "$and": [
-                {"recruiter_id": {"$eq": recruiter_id}},
-                {"job_id": {"$eq": job_id}},
-                {"doc_type": {"$eq": "resume_v2"}}
-            ]
-        },
-        include=["documents", "metadatas"]
-    )
+    collection = shards.collection(recruiter_id, job_id, create=False)
 
-    # --- Fetch JD ---
-    jd_data = collection.get(
-        where={
-            "$and": [
-                {"recruiter_id": {"$eq": recruiter_id}},
-                {"job_id": {"$eq": job_id}},
-                {"doc_type": {"$eq": "job"}}
-            ]
-        },
-        include=["documents", "metadatas"]
-    )
+    # --- Fetch resumes (grouped by file_name) and JD, in chunk order ---
+    resume_texts = fetch_texts_by_file(collection, recruiter_id, job_id, "resume_v2")
+    jd_text = fetch_text(collection, recruiter_id, job_id, "job")
 
-    if not resume_data["documents"] or not jd_data["documents"]:
+    if not resume_texts or not jd_text:
         return jsonify({"error": "No resumes or JD found"}), 404
 
-    jd_text = "\n".join(jd_data["documents"])
-
-    # ✅ FIX: Group chunks by file_name
-    resumes_by_file = defaultdict(list)
-    for doc, meta in zip(resume_data["documents"], resume_data["metadatas"]):
-        file_name = meta.get("file_name")
-        if not file_name or file_name == "job_description":
-            continue  # Skip if no filename or it's JD
-        resumes_by_file[file_name].append(doc)
+    # --- Whole-document vectors stored at ingest: one mat-vec for the whole job ---
+    jd_vector = resolve_doc_vectors(
+        doc_vectorstore, recruiter_id, job_id, "job", {"job_description": jd_text}
+    )["job_description"]
+    resume_vectors = resolve_doc_vectors(doc_vectorstore, recruiter_id, job_id, "resume_v2", resume_texts)
+
+    # --- Keyword + embedding scores for the whole cohort in one vectorized pass ---
+    file_names = list(resume_texts.keys())
+    scorer = CohortScorer(jd_text, jd_vector)
+    base_scores = scorer.score(
+        [resume_texts[f] for f in file_names],
+        [resume_vectors[f] for f in file_names]
+    )
 
     # --- Evaluate each resume (NOT each chunk) ---
     results = []
-    for file_name, chunks in resumes_by_file.items():
-        resume_text = "\n".join(chunks)
-
-        # Calculate base scores first (fast)
-        keyword_score = compute_keyword_score(resume_text, jd_text)
-        embedding_similarity = compute_embedding_similarity(resume_text, jd_text, embeddings)
+    for file_name, scores in zip(file_names, base_scores):
+        resume_text = resume_texts[file_name]
+        keyword_score = scores["keyword_score"]
+        embedding_similarity = scores["embedding_similarity"]
         
         # Preliminary score without LLM
         prelim_score = round(0.5 * keyword_score + 0.5 * embedding_similarity)
@@ -579,19 +804,28 @@ def evaluate_batch_summary():
     # --- Apply LLM based on mode ---
     if mode == "full":
         # Run LLM on ALL resumes
-        for result in results:
-            skill_results = extract_and_compare_skills(result["resume_text"], jd_text)
-            result["llm_score"] = skill_results.get("llm_score", 0)
-            result["matched_skills"] = skill_results.get("matched_skills", [])
-            result["missing_skills"] = skill_results.get("missing_skills", [])
-            
+        llm_targets = results
     elif mode == "auto":
         # Run LLM only on top 5 candidates (smart optimization)
-        for result in results[:5]:
-            skill_results = extract_and_compare_skills(result["resume_text"], jd_text)
-            result["llm_score"] = skill_results.get("llm_score", 0)
-            result["matched_skills"] = skill_results.get("matched_skills", [])
-            result["missing_skills"] = skill_results.get("missing_skills", [])
+        llm_targets = results[:5]
+    else:
+        llm_targets = []
+
+    # JD skills are extracted once per job, then the per-resume comparisons
+    # fan out across a pool capped at Ollama's parallel slots; order is preserved
+    jd_skills = jd_skill_cache.get_or_extract(recruiter_id, job_id, jd_text) if llm_targets else []
+    llm_outcomes = map_bounded(
+        lambda result: extract_and_compare_skills(result["resume_text"], jd_text, jd_skills),
+        llm_targets
+    )
+    for result, (skill_results, error) in zip(llm_targets, llm_outcomes):
+        if error:
+            result["llm_error"] = error
+            continue
+        result["llm_score"] = skill_results.get("llm_score", 0)
+        result["matched_skills"] = skill_results.get("matched_skills", [])
+        result["missing_skills"] = skill_results.get("missing_skills", [])
+        result["context_tokens"] = skill_results.get("context_tokens", 0)
     
     # Calculate final scores with LLM
     for result in results:
@@ -634,55 +868,31 @@ def get_resume_skill_details():
     for a given recruiter_id and job_id.
     """
     data = request.get_json()
-    recruiter_id = data.get("recruiter_id", "").lower()
-    job_id = data.get("job_id", "").lower()
+    recruiter_id = normalize_id(data.get("recruiter_id"))
+    job_id = normalize_id(data.get("job_id"))
     file_name = data.get("file_name")
 
     if not all([recruiter_id, job_id, file_name]):
         return jsonify({"error": "recruiter_id, job_id, and file_name required"}), 400
 
-    collection = vectorstore._collection
-
-    # --- Fetch resume chunks for the specific file ---
-    resume_data = collection.get(
-        where={
-            "$and": [
-                {"recruiter_id": {"$eq": recruiter_id}},
-                {"job_id": {"$eq": job_id}},
-                {"doc_type": {"$eq": "resume_v2"}},
-                {"file_name": {"$eq": file_name}}
-            ]
-        },
-        include=["documents", "metadatas"]
-    )
+    collection = shards.collection(recruiter_id, job_id, create=False)
 
-    # --- Fetch JD chunks ---
-    jd_data = collection.get(
-        where={
-            "$and": [
-                {"recruiter_id": {"$eq": recruiter_id}},
-                {"job_id": {"$eq": job_id}},
-                {"doc_type": {"$eq": "job"}}
-            ]
-        },
-        include=["documents", "metadatas"]
-    )
+    # --- Fetch resume and JD chunks for the specific file, in chunk order ---
+    resume_text = fetch_text(collection, recruiter_id, job_id, "resume_v2", file_name=file_name)
+    jd_text = fetch_text(collection, recruiter_id, job_id, "job")
 
-    if not resume_data["documents"]:
+    if not resume_text:
         return jsonify({"error": f"No resume found for file: {file_name}"}), 404
 
-    if not jd_data["documents"]:
+    if not jd_text:
         return jsonify({"error": f"No JD found for job: {job_id}"}), 404
 
-    # --- Combine chunks into full texts ---
-    resume_text = "\n".join(resume_data["documents"])
-    jd_text = "\n".join(jd_data["documents"])
-
     # --- Extract skills comparison ---
     try:
-        skill_results = extract_and_compare_skills(resume_text, jd_text)
+        jd_skills = jd_skill_cache.get_or_extract(recruiter_id, job_id, jd_text)
+        skill_results = extract_and_compare_skills(resume_text, jd_text, jd_skills)
     except Exception as e:
-        print(f"Error in extract_and_compare_skills for {file_name}: {e}")
+        logger.debug("extract_and_compare_skills failed for %s: %s", file_name, e, exc_info=True)
         return jsonify({"error": str(e)}), 500
 
     # --- Build response ---
@@ -690,7 +900,8 @@ def get_resume_skill_details():
         "file_name": file_name,
         "llm_score": skill_results.get("llm_score", 0),
         "matched_skills": skill_results.get("matched_skills", []),
-        "missing_skills": skill_results.get("missing_skills", [])
+        "missing_skills": skill_results.get("missing_skills", []),
+        "context_tokens": skill_results.get("context_tokens", 0)
     })
 
 
@@ -723,6 +934,21 @@ def get_session_memory(session_id):
         "messages": messages
     })
 
+@app.route("/llm_cache/stats", methods=["GET"])
+def llm_cache_stats():
+    return jsonify(llm_cache.stats())
+
+@app.route("/embedding_cache/stats", methods=["GET"])
+def embedding_cache_stats():
+    if not model_loader.is_loaded("embeddings"):
+        return jsonify({"loaded": False})
+    return jsonify(embeddings.stats())
+
+@app.route("/models/status", methods=["GET"])
+def models_status():
+    return jsonify({**model_loader.status(), "app_import_seconds": APP_IMPORT_SECONDS,
+                    "reranker": reranker.stats()})
+
 @app.route("/redis/memory/flush", methods=["DELETE"])
 def flush_all_memory():
     r.flushdb()
@@ -730,6 +956,11 @@ def flush_all_memory():
 
 
 
+model_loader.preload_from_env()
+APP_IMPORT_SECONDS = round(time.perf_counter() - _app_import_started, 3)
+logger.info("app imported in %.2fs (models loaded: %s)",
+                                 APP_IMPORT_SECONDS, model_loader.status()["loaded"] or "none")
+
 if __name__ == "__main__":
     with app.app_context():
             db.create_all()
@@ -1,5 +1,8 @@
 import re
-from sklearn.metrics.pairwise import cosine_similarity
+import json
+import numpy as np
+
+from llm_client import query_ollama
 
 
 def extract_keywords_from_jd(jd_text):
@@ -38,9 +41,6 @@ def evaluate_resume_hybrid(resume_chunks, jd_chunks):
     }}
     """
 
-    from app import query_ollama
-    import json
-    
     llm_response = query_ollama(prompt)
     llm_data = json.loads(llm_response)  # ensure LLM returns JSON
 
@@ -91,12 +91,33 @@ def compute_embedding_similarity(resume_text, jd_text, embeddings):
     resume_emb = resume_emb_list[0]
     jd_emb = jd_emb_list[0]
 
-    # Compute cosine similarity
-    similarity = cosine_similarity([resume_emb], [jd_emb])[0][0]
+    # Cosine similarity scaled to 0-100 (numpy; sklearn is no longer imported)
+    return compute_embedding_similarities([resume_emb], jd_emb)[0]
+
+def compute_embedding_similarities(resume_vectors, jd_vector):
+    """
+    Batch version of compute_embedding_similarity over precomputed vectors.
+
+    Args:
+        resume_vectors: (n, dim) array-like, one whole-document vector per resume
+        jd_vector: (dim,) array-like for the job description
 
-    # Scale to 0-100
-    similarity_score = round(float(similarity * 100), 2)
-    return similarity_score
+    Returns:
+        list[float]: Similarity scores between 0 and 100, same rounding as
+        compute_embedding_similarity
+    """
+    matrix = np.asarray(resume_vectors, dtype=np.float64)
+    if matrix.size == 0:
+        return []
+    jd = np.asarray(jd_vector, dtype=np.float64)
+
+    # Same zero-norm handling as sklearn's cosine_similarity
+    row_norms = np.sqrt(np.einsum("ij,ij->i", matrix, matrix))
+    row_norms[row_norms == 0] = 1.0
+    jd_norm = np.sqrt(np.dot(jd, jd)) or 1.0
+
+    similarities = (matrix / row_norms[:, None]) @ (jd / jd_norm)
+    return [round(float(s * 100), 2) for s in similarities]
 
 def compute_keyword_score(resume_text, jd_text):
     """Simple keyword matching without LLM"""
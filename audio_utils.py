@@ -0,0 +1,100 @@
+# audio_utils.py
+"""
+Decode uploaded audio straight to what Whisper consumes: mono float32 at 16 kHz.
+
+ffmpeg reads the upload from stdin and writes raw f32le samples to stdout, so
+nothing touches the working directory. Containers whose index sits at the end
+of the file (mp4 / m4a / mov / 3gp) can't be demuxed from a pipe; only those
+get a unique NamedTemporaryFile, removed as soon as ffmpeg is done.
+16 kHz PCM WAV (what most browsers' recorders can emit) skips ffmpeg entirely.
+"""
+import io
+import os
+import subprocess
+import tempfile
+import wave
+
+import numpy as np
+
+ASR_SAMPLING_RATE = 16000
+FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+FFMPEG_TIMEOUT = float(os.getenv("FFMPEG_TIMEOUT", 60))
+# Recordings longer than this are split into windows and transcribed in batches (0 = off)
+ASR_CHUNK_LENGTH_S = float(os.getenv("ASR_CHUNK_LENGTH_S", 30))
+ASR_BATCH_SIZE = int(os.getenv("ASR_BATCH_SIZE", 4))
+
+SEEKABLE_FORMATS = {"mp4", "m4a", "mov", "3gp"}
+
+
+class AudioDecodeError(ValueError):
+    pass
+
+
+def _read_wav(data, sampling_rate):
+    """16-bit PCM WAV already at the target rate -> float32 mono, else None."""
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return None
+    try:
+        with wave.open(io.BytesIO(data)) as wav:
+            if wav.getsampwidth() != 2 or wav.getframerate() != sampling_rate:
+                return None
+            channels = wav.getnchannels()
+            frames = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        return None
+    audio = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768.0
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1)
+    return audio
+
+
+def _ffmpeg(input_args, stdin_data, sampling_rate):
+    cmd = [
+        FFMPEG_BIN, "-hide_banner", "-loglevel", "error",
+        *input_args,
+        "-ac", "1", "-ar", str(sampling_rate), "-f", "f32le", "pipe:1",
+    ]
+    try:
+        proc = subprocess.run(cmd, input=stdin_data, capture_output=True, timeout=FFMPEG_TIMEOUT)
+    except FileNotFoundError:
+        raise AudioDecodeError(f"ffmpeg not found ({FFMPEG_BIN})")
+    except subprocess.TimeoutExpired:
+        raise AudioDecodeError("ffmpeg timed out decoding audio")
+    if proc.returncode != 0:
+        raise AudioDecodeError(proc.stderr.decode("utf-8", "replace").strip() or "ffmpeg failed")
+    return np.frombuffer(proc.stdout, dtype=np.float32)
+
+
+def decode_audio(data, file_extension=None, sampling_rate=ASR_SAMPLING_RATE):
+    """Decode audio bytes (webm, ogg, wav, mp3, m4a, ...) to a float32 mono array."""
+    if not data:
+        raise AudioDecodeError("Empty audio upload")
+
+    audio = _read_wav(data, sampling_rate)
+    if audio is None:
+        extension = (file_extension or "").lower().lstrip(".")
+        if extension in SEEKABLE_FORMATS:
+            with tempfile.NamedTemporaryFile(suffix=f".{extension}") as tmp:
+                tmp.write(data)
+                tmp.flush()
+                audio = _ffmpeg(["-i", tmp.name], None, sampling_rate)
+        else:
+            audio = _ffmpeg(["-i", "pipe:0"], data, sampling_rate)
+
+    if audio.size == 0:
+        raise AudioDecodeError("No audio samples decoded")
+    return audio
+
+
+def transcribe(asr, audio, sampling_rate=ASR_SAMPLING_RATE, chunk_length_s=None, batch_size=None):
+    """
+    Run the ASR pipeline on a decoded array. Recordings longer than
+    chunk_length_s are split into overlapping windows and transcribed
+    batch_size windows at a time.
+    """
+    chunk_length_s = ASR_CHUNK_LENGTH_S if chunk_length_s is None else chunk_length_s
+    kwargs = {}
+    if chunk_length_s and len(audio) > chunk_length_s * sampling_rate:
+        kwargs = {"chunk_length_s": chunk_length_s, "batch_size": batch_size or ASR_BATCH_SIZE}
+    # The pipeline pops keys from the dict, so build a fresh one per call
+    return asr({"raw": audio, "sampling_rate": sampling_rate}, **kwargs)["text"]
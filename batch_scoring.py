@@ -0,0 +1,72 @@
+# batch_scoring.py
+"""
+Vectorized scoring of a whole cohort of resumes against one job description.
+
+Produces the same numbers as the per-resume helpers in ats_evaluate_utills
+(compute_keyword_score / compute_embedding_similarity), but tokenizes the JD
+once, builds one sparse resume x JD-term matrix and scores everyone in a
+single pass.
+"""
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from ats_evaluate_utills import compute_embedding_similarities
+
+
+def keyword_terms(text):
+    """Same tokenization as compute_keyword_score: lowercase, whitespace split, len > 4."""
+    return {word for word in text.lower().split() if len(word) > 4}
+
+
+class CohortScorer:
+    """
+    Usage:
+        scorer = CohortScorer(jd_text, jd_vector)
+        scores = scorer.score(resume_texts, resume_vectors)
+    """
+
+    def __init__(self, jd_text, jd_vector=None):
+        self.jd_terms = sorted(keyword_terms(jd_text))
+        self.vocabulary = {term: idx for idx, term in enumerate(self.jd_terms)}
+        self.jd_vector = jd_vector
+
+    def term_matrix(self, resume_texts):
+        """Binary CSR matrix: one row per resume, one column per JD term it contains."""
+        indptr = [0]
+        indices = []
+        vocabulary = self.vocabulary
+        for text in resume_texts:
+            columns = {vocabulary[w] for w in text.lower().split() if w in vocabulary}
+            indices.extend(sorted(columns))
+            indptr.append(len(indices))
+        data = np.ones(len(indices), dtype=np.int8)
+        return csr_matrix(
+            (data, np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(resume_texts), len(self.jd_terms))
+        )
+
+    def keyword_scores(self, resume_texts):
+        """Vectorized compute_keyword_score for every resume."""
+        if not self.jd_terms:
+            return [0] * len(resume_texts)
+        matched = self.term_matrix(resume_texts).getnnz(axis=1)
+        scores = np.minimum(np.round(matched / len(self.jd_terms) * 100), 100)
+        return [int(s) for s in scores]
+
+    def embedding_similarities(self, resume_vectors):
+        """Vectorized compute_embedding_similarity over precomputed vectors."""
+        if self.jd_vector is None:
+            raise ValueError("CohortScorer was built without a JD vector")
+        return compute_embedding_similarities(resume_vectors, self.jd_vector)
+
+    def score(self, resume_texts, resume_vectors=None):
+        """Return [{"keyword_score", "embedding_similarity"}] in input order."""
+        keyword = self.keyword_scores(resume_texts)
+        if resume_vectors is None:
+            similarity = [0.0] * len(resume_texts)
+        else:
+            similarity = self.embedding_similarities(resume_vectors)
+        return [
+            {"keyword_score": k, "embedding_similarity": s}
+            for k, s in zip(keyword, similarity)
+        ]
@@ -0,0 +1,77 @@
+# bench_batch_ingest.py
+"""
+Measure /batch_ingest embedding throughput: one add_texts per resume vs
+cross-document batches (bulk_embed.ChunkBatcher).
+
+Usage:
+    python bench_batch_ingest.py                          # 100 copies of Rana-Java-AI-IL.pdf
+    python bench_batch_ingest.py --copies 100 --batch-size 256
+
+Each copy gets a unique marker line so no embedding is shared between
+"resumes". PDF parsing is done once up front and excluded; the timing covers
+chunking, embedding, the whole-document vector and the Chroma writes.
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+from langchain_huggingface import HuggingFaceEmbeddings
+from langchain.vectorstores import Chroma
+
+from bulk_embed import ChunkBatcher
+from ingest_utils import read_pdf, chunk_text
+
+
+def per_file(embeddings, store, texts):
+    for i, text in enumerate(texts):
+        chunks = chunk_text(text, embeddings)
+        store.add_texts(chunks, [{"file_name": f"r{i}.pdf", "chunk_index": idx} for idx in range(len(chunks))])
+        embeddings.embed_documents(["\n".join(chunks)])
+
+
+def batched(embeddings, store, texts, batch_size):
+    batcher = ChunkBatcher(embeddings, store._collection, batch_size=batch_size)
+    for i, text in enumerate(texts):
+        chunks = chunk_text(text, embeddings)
+        batcher.add(i, chunks, [{"file_name": f"r{i}.pdf", "chunk_index": idx} for idx in range(len(chunks))],
+                    doc_text="\n".join(chunks))
+        if batcher.should_flush():
+            batcher.flush()
+    batcher.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pdf", nargs="?", default="Rana-Java-AI-IL.pdf")
+    parser.add_argument("--copies", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--model", default="sentence-transformers/all-mpnet-base-v2")
+    args = parser.parse_args()
+
+    base_text = read_pdf(args.pdf)
+    texts = [f"{base_text}\nCandidate reference {i}" for i in range(args.copies)]
+    embeddings = HuggingFaceEmbeddings(model_name=args.model, encode_kwargs={"batch_size": args.batch_size})
+    embeddings.embed_documents(["warm up"])
+
+    print(f"{args.copies} resumes, batch size {args.batch_size}")
+    print(f"{'mode':<10}{'sec':>10}{'docs/sec':>10}")
+    results = {}
+    for mode in ("per_file", "batched"):
+        persist_dir = tempfile.mkdtemp(prefix="bench_ingest_")
+        store = Chroma(collection_name=f"bench_{mode}", embedding_function=embeddings, persist_directory=persist_dir)
+        start = time.perf_counter()
+        if mode == "per_file":
+            per_file(embeddings, store, texts)
+        else:
+            batched(embeddings, store, texts, args.batch_size)
+        elapsed = time.perf_counter() - start
+        results[mode] = args.copies / elapsed
+        print(f"{mode:<10}{elapsed:>10.2f}{results[mode]:>10.2f}")
+        shutil.rmtree(persist_dir, ignore_errors=True)
+
+    print(f"speedup: {results['batched'] / results['per_file']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# bench_chunking.py
+"""
+Compare chunking strategies: ingest throughput and retrieval quality.
+
+Usage:
+    python bench_chunking.py                              # Rana-Java-AI-IL.pdf, built-in probes
+    python bench_chunking.py resumes/ --probes probes.json --repeat 3
+
+For every strategy the benchmark chunks each document and embeds the chunks
+(what ingest does), counting every text sent to the model, then answers the
+probe questions by cosine similarity over the chunk vectors.
+
+probes.json: [{"query": "experience at Emaratech", "expect": "Emaratech"}, ...]
+A probe is a hit at rank k if the k-th chunk contains the expected text.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+from langchain_huggingface import HuggingFaceEmbeddings
+
+from bench_pdf_extract import collect
+from ingest_utils import read_pdf, chunk_text
+
+STRATEGIES = ["semantic", "sections", "tokens"]
+
+DEFAULT_PROBES = [
+    {"query": "experience at Emaratech", "expect": "Emaratech"},
+    {"query": "Which university did the candidate attend?", "expect": "University of South Asia"},
+    {"query": "AWS certification", "expect": "AWS Certified"},
+    {"query": "Camunda BPMN workflow automation", "expect": "Camunda"},
+    {"query": "Which databases has the candidate worked with?", "expect": "PostgreSQL"},
+    {"query": "Spring Security with JWT authentication", "expect": "JWT"},
+    {"query": "What did the candidate build at Iaai?", "expect": "auction"},
+    {"query": "unit testing frameworks", "expect": "Mockito"},
+    {"query": "Angular front-end work", "expect": "Angular"},
+    {"query": "Dubai immigration visa system", "expect": "immigration"},
+]
+
+
+class CountingEmbeddings:
+    """Pass-through that counts texts sent to the model."""
+
+    def __init__(self, base):
+        self.base = base
+        self.texts = 0
+
+    def embed_documents(self, texts):
+        self.texts += len(texts)
+        return self.base.embed_documents(texts)
+
+    def embed_query(self, text):
+        self.texts += 1
+        return self.base.embed_query(text)
+
+
+def evaluate_retrieval(chunks, vectors, probes, base):
+    matrix = np.asarray(vectors, dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+    hits1 = hits3 = 0
+    reciprocal_ranks = []
+    for probe in probes:
+        q = np.asarray(base.embed_query(probe["query"]), dtype=np.float32)
+        order = np.argsort(-(matrix @ (q / (np.linalg.norm(q) + 1e-12))))
+        rank = next(
+            (r + 1 for r, i in enumerate(order) if probe["expect"].lower() in chunks[i].lower()),
+            None
+        )
+        hits1 += rank == 1
+        hits3 += rank is not None and rank <= 3
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+    n = len(probes)
+    return hits1 / n, hits3 / n, sum(reciprocal_ranks) / n
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="*", default=["Rana-Java-AI-IL.pdf"])
+    parser.add_argument("--probes", help="JSON file of {query, expect} probes")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--model", default="sentence-transformers/all-mpnet-base-v2")
+    args = parser.parse_args()
+
+    probes = json.load(open(args.probes)) if args.probes else DEFAULT_PROBES
+    texts = [read_pdf(f) for f in collect(args.paths)]
+    base = HuggingFaceEmbeddings(model_name=args.model)
+    base.embed_documents(["warm up"])
+
+    print(f"Corpus: {len(texts)} document(s), {len(probes)} probes")
+    print(f"{'strategy':<10}{'chunks':>8}{'avg_words':>11}{'embedded':>10}{'docs/sec':>10}"
+          f"{'hit@1':>8}{'hit@3':>8}{'MRR':>7}")
+    for strategy in STRATEGIES:
+        counter = CountingEmbeddings(base)
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            all_chunks, all_vectors = [], []
+            for text in texts:
+                chunks = chunk_text(text, counter, strategy=strategy)
+                all_chunks.extend(chunks)
+                all_vectors.extend(counter.embed_documents(chunks))
+        elapsed = time.perf_counter() - start
+
+        hit1, hit3, mrr = evaluate_retrieval(all_chunks, all_vectors, probes, base)
+        avg_words = sum(len(c.split()) for c in all_chunks) / max(len(all_chunks), 1)
+        docs_per_sec = len(texts) * args.repeat / elapsed
+        print(f"{strategy:<10}{len(all_chunks):>8}{avg_words:>11.0f}{counter.texts // args.repeat:>10}"
+              f"{docs_per_sec:>10.2f}{hit1:>8.2f}{hit3:>8.2f}{mrr:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# bench_embedding_backends.py
+"""
+Parity and throughput of the embedding backends against PyTorch.
+
+Usage:
+    python bench_embedding_backends.py                         # mpnet, chunks of Rana-Java-AI-IL.pdf
+    python bench_embedding_backends.py resumes/ --threads 4 --repeat 3
+
+For onnx (fp32) and onnx-int8 it reports, against the PyTorch vectors of the
+same chunks:
+  - min / mean cosine similarity per text
+  - top1_agree: share of chunks whose nearest neighbour (excluding itself)
+    is the same as with PyTorch, i.e. whether retrieval order survives
+and texts/sec for every backend.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from bench_pdf_extract import collect
+from embedding_backends import create_embeddings, OnnxEmbeddings
+from ingest_utils import read_pdf, split_sections
+
+
+def nearest(matrix):
+    sims = matrix @ matrix.T
+    np.fill_diagonal(sims, -np.inf)
+    return sims.argmax(axis=1)
+
+
+def unit(vectors):
+    matrix = np.asarray(vectors, dtype=np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="*", default=["Rana-Java-AI-IL.pdf"])
+    parser.add_argument("--model", default="sentence-transformers/all-mpnet-base-v2")
+    parser.add_argument("--threads", type=int, default=0, help="onnxruntime intra-op threads (0 = all cores)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    texts = [c for f in collect(args.paths) for c in split_sections(read_pdf(f))]
+    backends = {
+        "torch": create_embeddings(args.model, backend="torch", batch_size=args.batch_size),
+        "onnx": OnnxEmbeddings(args.model, quantize=False, intra_op_threads=args.threads,
+                               batch_size=args.batch_size),
+        "onnx-int8": OnnxEmbeddings(args.model, quantize=True, intra_op_threads=args.threads,
+                                    batch_size=args.batch_size),
+    }
+
+    print(f"{len(texts)} chunks, model {args.model}")
+    print(f"{'backend':<12}{'texts/sec':>12}{'speedup':>10}{'min_cos':>10}{'mean_cos':>10}{'top1_agree':>12}")
+    reference = None
+    baseline = None
+    for name, backend in backends.items():
+        backend.embed_documents(texts[:2])  # warm up
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            vectors = backend.embed_documents(texts)
+        rate = len(texts) * args.repeat / (time.perf_counter() - start)
+
+        matrix = unit(vectors)
+        if reference is None:
+            reference, baseline = matrix, rate
+        cosines = (matrix * reference).sum(axis=1)
+        agree = (nearest(matrix) == nearest(reference)).mean() if len(texts) > 1 else 1.0
+        print(f"{name:<12}{rate:>12.1f}{rate / baseline:>9.2f}x{cosines.min():>10.4f}"
+              f"{cosines.mean():>10.4f}{agree:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# bench_pdf_extract.py
+"""
+Compare PDF text backends on a corpus: pages/sec and fidelity vs pdfplumber.
+
+Usage:
+    python bench_pdf_extract.py                      # Rana-Java-AI-IL.pdf
+    python bench_pdf_extract.py resumes/ other.pdf --repeat 5
+
+Fidelity is measured against pdfplumber (the historical read_pdf output):
+  - char_ratio: difflib similarity of the whitespace-normalized text
+  - token_jaccard: overlap of the lowercase word sets
+"""
+import argparse
+import difflib
+import glob
+import os
+import time
+
+from ingest_utils import extract_page_texts, _join_pages
+
+BACKENDS = ["pdfplumber", "pdfium", "auto"]
+
+
+def collect(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "**", "*.pdf"), recursive=True)))
+        else:
+            files.append(path)
+    return files
+
+
+def normalize(text):
+    return " ".join(text.split())
+
+
+def fidelity(text, reference):
+    a, b = normalize(text), normalize(reference)
+    char_ratio = difflib.SequenceMatcher(None, a, b, autojunk=False).ratio() if a or b else 1.0
+    ta, tb = set(a.lower().split()), set(b.lower().split())
+    token_jaccard = len(ta & tb) / len(ta | tb) if ta | tb else 1.0
+    return char_ratio, token_jaccard
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="*", default=["Rana-Java-AI-IL.pdf"])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    files = collect(args.paths)
+    corpus = [(f, open(f, "rb").read()) for f in files]
+    print(f"Corpus: {len(corpus)} file(s)")
+
+    texts = {}
+    print(f"{'backend':<12}{'pages':>8}{'sec':>10}{'pages/sec':>12}{'char_ratio':>12}{'token_jacc':>12}")
+    for backend in BACKENDS:
+        pages = 0
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for name, data in corpus:
+                total, page_texts = extract_page_texts(data, backend=backend)
+                pages += total
+                texts[(backend, name)] = _join_pages(page_texts)
+        elapsed = time.perf_counter() - start
+
+        scores = [fidelity(texts[(backend, name)], texts[("pdfplumber", name)]) for name, _ in corpus]
+        char_ratio = sum(s[0] for s in scores) / len(scores)
+        token_jaccard = sum(s[1] for s in scores) / len(scores)
+        print(f"{backend:<12}{pages:>8}{elapsed:>10.2f}{pages / elapsed:>12.1f}{char_ratio:>12.3f}{token_jaccard:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+# bm25_index.py
+"""
+Incremental BM25 index over resume / JD chunks, kept next to Chroma.
+
+mpnet is weak on exact tokens (company names, certifications, years, tool
+names such as "Emaratech", "CKA", "2019"). This lexical index is written at
+ingest time together with the Chroma chunks and queried alongside vector
+search in /ask-hybrid (see hybrid_retrieval.py).
+
+One partition per (recruiter_id, job_id):
+
+    BM25_INDEX_DIR/<recruiter>/<job>.pkl     base: postings (term -> {chunk: tf}),
+                                             per-chunk lengths and term counts,
+                                             chunk text + metadata
+    BM25_INDEX_DIR/<recruiter>/<job>.delta   appended ("add", rows) / ("remove", where)
+                                             records since the base was written
+
+A write appends one record to the delta log, so its cost is the size of the
+change, not of the partition. Once the log outgrows BM25_COMPACT_RATIO of the
+base (and at least BM25_COMPACT_MIN_BYTES), the partition is rewritten as a
+new base and the log is removed, so rewrites are amortized over many writes.
+
+Loading a partition is one unpickle plus a replay of its log: nothing is
+re-tokenized at startup. Partitions are loaded on first use. Each process
+then replays only the records other processes (gunicorn workers, batch
+ingest) appended since its last read. Writers hold an exclusive file lock
+per partition and readers a shared one.
+
+Backfill from existing Chroma data (or repair after a failed write) with
+`python bm25_index.py --rebuild`.
+"""
+import argparse
+import fcntl
+import glob
+import heapq
+import logging
+import math
+import os
+import pickle
+import re
+import threading
+from collections import Counter
+
+from langchain_core.documents import Document
+
+from collection_router import id_slug
+from retrieval_scope import normalize_id
+from chunk_store import chunk_order
+
+logger = logging.getLogger(__name__)
+
+BM25_INDEX_DIR = os.getenv("BM25_INDEX_DIR", "bm25_index")
+BM25_K1 = 1.5
+BM25_B = 0.75
+INDEX_VERSION = 1
+BM25_COMPACT_RATIO = float(os.getenv("BM25_COMPACT_RATIO", 0.5))
+BM25_COMPACT_MIN_BYTES = int(os.getenv("BM25_COMPACT_MIN_BYTES", 1 << 20))
+
+# Keeps "c++", "c#", "node.js", "ci/cd"-style parts, "2019" and ids like "aws-saa" intact
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#]*(?:[.\-][a-z0-9+#]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be but by did do does for from had has have he her his how i if in into is it "
+    "its me my no not of on or our she so than that the their them then there these they this to was "
+    "we were what when where which who whom why will with you your".split()
+)
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def _empty_partition():
+    return {"version": INDEX_VERSION, "next_id": 0, "total_length": 0, "docs": {}, "postings": {}}
+
+
+def _apply(partition, op, payload):
+    """Apply one delta record in place; returns the number of chunks added / removed."""
+    if op == "add":
+        for text, metadata, terms in payload:
+            doc_id = partition["next_id"]
+            partition["next_id"] += 1
+            length = sum(terms.values())
+            partition["docs"][doc_id] = (text, dict(metadata), length, dict(terms))
+            partition["total_length"] += length
+            for term, tf in terms.items():
+                partition["postings"].setdefault(term, {})[doc_id] = tf
+        return len(payload)
+
+    doomed = [doc_id for doc_id, doc in partition["docs"].items()
+              if all(doc[1].get(key) == value for key, value in payload.items())]
+    for doc_id in doomed:
+        _, _, length, terms = partition["docs"].pop(doc_id)
+        partition["total_length"] -= length
+        for term in terms:
+            postings = partition["postings"][term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del partition["postings"][term]
+    return len(doomed)
+
+
+def _file_id(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _matches(metadata, scope):
+    # recruiter / job are implied by the partition; the rest narrows within it
+    return all(metadata.get(field) == value for field, value in scope.items()
+               if field not in ("recruiter_id", "job_id"))
+
+
+class BM25Index:
+    def __init__(self, root=BM25_INDEX_DIR):
+        self.root = root
+        self._cache = {}  # path -> {"base": file id, "delta": inode, "offset": bytes replayed, "partition"}
+        # Partitions are updated in place: _lock guards them (search / apply),
+        # _refresh_lock serializes replaying the logs within this process
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    # --- partitions ---
+    def _path(self, recruiter_id, job_id):
+        return os.path.join(self.root, id_slug(normalize_id(recruiter_id)), f"{id_slug(normalize_id(job_id))}.pkl")
+
+    def _paths_for(self, scope):
+        recruiter_id, job_id = scope.get("recruiter_id"), scope.get("job_id")
+        if recruiter_id and job_id:
+            return [self._path(recruiter_id, job_id)]
+        recruiter_dir = id_slug(normalize_id(recruiter_id)) if recruiter_id else "*"
+        return sorted(glob.glob(os.path.join(self.root, recruiter_dir, "*.pkl")))
+
+    def _load(self, path):
+        """Cached partition, caught up with the files on disk; None if it doesn't exist."""
+        if not os.path.exists(path):
+            with self._lock:
+                self._cache.pop(path, None)
+            return None
+        with open(path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH)
+            with self._refresh_lock:
+                entry = self._refresh(path)
+        return entry["partition"] if entry else None
+
+    def _refresh(self, path):
+        """Reload the base if it was rewritten, then replay unread log records. Caller holds the file lock."""
+        base_id = _file_id(path)
+        if base_id is None:
+            with self._lock:
+                self._cache.pop(path, None)
+            return None
+        delta_path = path + ".delta"
+        delta_id = _file_id(delta_path)
+        entry = self._cache.get(path)
+        if entry is None or entry["base"] != base_id or (
+                entry["delta"] is not None and (delta_id is None or delta_id[0] != entry["delta"])):
+            with open(path, "rb") as f:
+                partition = pickle.load(f)
+            if partition.get("version") != INDEX_VERSION:
+                logger.warning("Ignoring BM25 partition %s (version %s)", path, partition.get("version"))
+                return None
+            entry = {"base": base_id, "delta": None, "offset": 0, "partition": partition}
+
+        if delta_id is not None and delta_id[2] > entry["offset"]:
+            records, offset = [], entry["offset"]
+            with open(delta_path, "rb") as f:
+                f.seek(offset)
+                while True:
+                    try:
+                        records.append(pickle.load(f))
+                    except (EOFError, pickle.UnpicklingError, ValueError):
+                        break  # end of log, or a record torn by a crashed writer
+                    offset = f.tell()
+            with self._lock:
+                for op, payload in records:
+                    _apply(entry["partition"], op, payload)
+            entry["delta"], entry["offset"] = delta_id[0], offset
+
+        with self._lock:
+            self._cache[path] = entry
+        return entry
+
+    def _write_base(self, path, partition):
+        """Compact: write the whole partition as the new base and drop the log."""
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(partition, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        try:
+            os.remove(path + ".delta")
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self._cache[path] = {"base": _file_id(path), "delta": None, "offset": 0, "partition": partition}
+
+    def _update(self, recruiter_id, job_id, op, payload):
+        """
+        Append one record to the partition's log (under its file lock) and
+        apply it to the cached partition. Like the doc-hash index, a failed
+        write is logged, not raised: Chroma stays the source of truth and
+        `--rebuild` repairs the index.
+        """
+        try:
+            return self._locked_update(recruiter_id, job_id, op, payload)
+        except (OSError, pickle.PickleError) as e:
+            logger.warning("BM25 index update failed for %s/%s: %s", recruiter_id, job_id, e)
+            return 0
+
+    def _locked_update(self, recruiter_id, job_id, op, payload):
+        path = self._path(recruiter_id, job_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            with self._refresh_lock:
+                entry = self._refresh(path)
+                if entry is None:  # new partition: start with a base, no log
+                    partition = _empty_partition()
+                    result = _apply(partition, op, payload)
+                    self._write_base(path, partition)
+                    return result
+
+                delta_path = path + ".delta"
+                with open(delta_path, "ab") as f:
+                    f.truncate(entry["offset"])  # drop a record torn by a crashed writer
+                    f.write(pickle.dumps((op, payload), protocol=pickle.HIGHEST_PROTOCOL))
+                    f.flush()
+                    offset = f.tell()
+                with self._lock:
+                    result = _apply(entry["partition"], op, payload)
+                entry["delta"], entry["offset"] = _file_id(delta_path)[0], offset
+
+                if offset > max(BM25_COMPACT_MIN_BYTES, entry["base"][2] * BM25_COMPACT_RATIO):
+                    self._write_base(path, entry["partition"])
+        return result
+
+    # --- writes ---
+    def add(self, recruiter_id, job_id, texts, metadatas):
+        """Index chunks just written to Chroma for this job."""
+        if not texts:
+            return 0
+        rows = [(text, dict(metadata), dict(Counter(tokenize(text)))) for text, metadata in zip(texts, metadatas)]
+        return self._update(recruiter_id, job_id, "add", rows)
+
+    def remove(self, recruiter_id, job_id, **where):
+        """Drop this job's chunks whose metadata matches every key in `where` (e.g. doc_type="job")."""
+        if not os.path.exists(self._path(recruiter_id, job_id)):
+            return 0
+        return self._update(recruiter_id, job_id, "remove", where)
+
+    def drop(self, recruiter_id, job_id):
+        path = self._path(recruiter_id, job_id)
+        for leftover in (path, path + ".delta", path + ".lock"):
+            try:
+                os.remove(leftover)
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._cache.pop(path, None)
+
+    # --- search ---
+    def search(self, query, k=5, scope=None):
+        """
+        Top-k (Document, score) by BM25 within the scope. Corpus statistics
+        (N, avgdl, df) are taken over every partition the scope covers.
+        """
+        scope = scope or {}
+        terms = set(tokenize(query))
+        partitions = [p for p in (self._load(path) for path in self._paths_for(scope)) if p]
+        if not terms or not partitions:
+            return []
+
+        # Partitions are updated in place by other threads' writes / log replays
+        with self._lock:
+            return self._score(partitions, terms, k, scope)
+
+    @staticmethod
+    def _score(partitions, terms, k, scope):
+        n_docs = sum(len(p["docs"]) for p in partitions)
+        if not n_docs:
+            return []
+        avgdl = sum(p["total_length"] for p in partitions) / n_docs
+        idf = {}
+        for term in terms:
+            df = sum(len(p["postings"].get(term, ())) for p in partitions)
+            if df:
+                idf[term] = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+        scored = []
+        for index, partition in enumerate(partitions):
+            scores = Counter()
+            for term, term_idf in idf.items():
+                for doc_id, tf in partition["postings"].get(term, {}).items():
+                    length = partition["docs"][doc_id][2]
+                    norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avgdl)
+                    scores[doc_id] += term_idf * tf * (BM25_K1 + 1) / norm
+            for doc_id, score in scores.items():
+                if _matches(partition["docs"][doc_id][1], scope):
+                    scored.append((score, index, doc_id))
+
+        hits = []
+        for score, index, doc_id in heapq.nlargest(k, scored):
+            text, metadata = partitions[index]["docs"][doc_id][:2]
+            hits.append((Document(page_content=text, metadata=dict(metadata)), score))
+        return hits
+
+    def stats(self):
+        paths = self._paths_for({})
+        sizes = [(_file_id(p) or (0, 0, 0))[2] + (_file_id(p + ".delta") or (0, 0, 0))[2] for p in paths]
+        return {"partitions": len(paths), "bytes": sum(sizes)}
+
+
+def rebuild(index, router):
+    """Re-index every chunk stored in Chroma (one-off backfill / repair)."""
+    by_job = {}
+    for collection in router.collections():
+        data = collection.get(include=["documents", "metadatas"])
+        for text, metadata in zip(data["documents"], data["metadatas"]):
+            metadata = metadata or {}
+            if text and metadata.get("recruiter_id") and metadata.get("job_id"):
+                by_job.setdefault((metadata["recruiter_id"], metadata["job_id"]), []).append((text, metadata))
+
+    for (recruiter_id, job_id), rows in by_job.items():
+        rows.sort(key=lambda row: (row[1].get("doc_key", ""), chunk_order(row[1])))
+        index.drop(recruiter_id, job_id)
+        index.add(recruiter_id, job_id, [text for text, _ in rows], [metadata for _, metadata in rows])
+    return {"jobs": len(by_job), "chunks": sum(len(rows) for rows in by_job.values())}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rebuild", action="store_true", help="re-index all chunks from Chroma")
+    parser.add_argument("--persist-directory", default="chroma_db")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    index = BM25Index()
+    if args.rebuild:
+        from collection_router import CollectionRouter
+
+        print(rebuild(index, CollectionRouter(persist_directory=args.persist_directory)))
+    print(index.stats())
@@ -0,0 +1,133 @@
+# bulk_embed.py
+"""
+Cross-document batching for ingest.
+
+Adding resumes one `vectorstore.add_texts` call at a time sends the
+sentence-transformer a handful of chunks per call. `ChunkBatcher` collects
+chunks from many documents, embeds them in batches of EMBED_BATCH_SIZE,
+writes them to Chroma in bulk `add` calls with the precomputed embeddings,
+and routes the results back to the document each chunk came from.
+
+Whether that is faster depends on the model and hardware; measure docs/sec
+for both paths with bench_batch_ingest.py before tuning EMBED_BATCH_SIZE.
+"""
+import logging
+import os
+import uuid
+
+logger = logging.getLogger(__name__)
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 128))
+# Flush once this many chunks are pending, so a huge upload still reports progress
+INGEST_FLUSH_CHUNKS = int(os.getenv("INGEST_FLUSH_CHUNKS", 2048))
+
+
+def embed_in_batches(embeddings, texts, batch_size=None):
+    batch_size = batch_size or EMBED_BATCH_SIZE
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(embeddings.embed_documents(texts[start:start + batch_size]))
+    return vectors
+
+
+def bulk_add(collection, documents, vectors, metadatas, ids=None):
+    """Write precomputed embeddings, split to the client's max batch size."""
+    ids = ids or [str(uuid.uuid4()) for _ in documents]
+    try:
+        max_batch = collection._client.get_max_batch_size()
+    except Exception:
+        max_batch = 5000
+    for start in range(0, len(documents), max_batch):
+        end = start + max_batch
+        collection.add(
+            ids=ids[start:end],
+            documents=documents[start:end],
+            embeddings=vectors[start:end],
+            metadatas=metadatas[start:end],
+        )
+    return ids
+
+
+class ChunkBatcher:
+    """
+    Queue documents with `add(key, chunks, metadatas, doc_text=None)`, then
+    `flush()` to embed and store everything queued in one pass.
+
+    flush() returns {key: {"chunks": n, "doc_vector": vector or None}} or
+    {key: exception}, per document. If embedding fails every queued document
+    fails (nothing was written). If the bulk write fails, whatever part of it
+    landed is deleted and each document is written on its own, so one bad
+    document doesn't fail the others or leave orphaned chunks.
+    `doc_text` is embedded in the same batches but not written; callers use
+    it for the whole-document vector.
+    """
+
+    def __init__(self, embeddings, collection, batch_size=None, flush_chunks=None):
+        self.embeddings = embeddings
+        self.collection = collection
+        self.batch_size = batch_size or EMBED_BATCH_SIZE
+        self.flush_chunks = flush_chunks or INGEST_FLUSH_CHUNKS
+        self._docs = []
+
+    @property
+    def pending_chunks(self):
+        return sum(len(doc["chunks"]) for doc in self._docs)
+
+    def should_flush(self):
+        return self.pending_chunks >= self.flush_chunks
+
+    def add(self, key, chunks, metadatas, doc_text=None):
+        self._docs.append({"key": key, "chunks": chunks, "metadatas": metadatas, "doc_text": doc_text})
+
+    def flush(self):
+        docs, self._docs = self._docs, []
+        if not docs:
+            return {}
+
+        texts, metadatas = [], []
+        for doc in docs:
+            texts.extend(doc["chunks"])
+            metadatas.extend(doc["metadatas"])
+        doc_texts = [doc["doc_text"] for doc in docs if doc["doc_text"] is not None]
+
+        try:
+            vectors = embed_in_batches(self.embeddings, texts + doc_texts, self.batch_size)
+        except Exception as e:
+            logger.exception("Bulk embed of %d chunks failed", len(texts))
+            return {doc["key"]: e for doc in docs}
+
+        doc_vectors = iter(vectors[len(texts):])
+        results = {
+            doc["key"]: {
+                "chunks": len(doc["chunks"]),
+                "doc_vector": next(doc_vectors) if doc["doc_text"] is not None else None,
+            }
+            for doc in docs
+        }
+
+        ids = [str(uuid.uuid4()) for _ in texts]
+        try:
+            bulk_add(self.collection, texts, vectors[:len(texts)], metadatas, ids)
+            return results
+        except Exception:
+            logger.exception("Bulk write of %d chunks failed, retrying per document", len(texts))
+            self._delete(ids)
+
+        start = 0
+        for doc in docs:
+            end = start + len(doc["chunks"])
+            try:
+                bulk_add(self.collection, texts[start:end], vectors[start:end], metadatas[start:end], ids[start:end])
+            except Exception as e:
+                logger.exception("Writing chunks for %s failed", doc["key"])
+                self._delete(ids[start:end])
+                results[doc["key"]] = e
+            start = end
+        return results
+
+    def _delete(self, ids):
+        """Remove chunks of a failed write (ids that never landed are ignored)."""
+        try:
+            self.collection.delete(ids=ids)
+        except Exception as e:
+            logger.warning("Cleanup of %d chunks failed: %s", len(ids), e)
@@ -1,11 +1,11 @@
 # chroma_test.py
 print("Starting Chroma test...")
 
-from langchain.embeddings import HuggingFaceEmbeddings
+from embedding_backends import create_embeddings
 from langchain.vectorstores import Chroma
 
 # Initialize local embeddings (no API key needed)
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+embeddings = create_embeddings("sentence-transformers/all-MiniLM-L6-v2")
 
 # Initialize Chroma vectorstore
 vectorstore = Chroma(
@@ -0,0 +1,90 @@
+# chunk_store.py
+"""
+Exact chunk retrieval by metadata, for the evaluation endpoints.
+
+Evaluation needs *all* chunks of one document, in order. Pulling them with
+`similarity_search(query="", filter=..., k=10)` embedded an empty string,
+ranked by a meaningless distance and silently dropped chunks past k. These
+helpers use `collection.get(where=...)` (no embedding, no ANN) and order the
+chunks by chunk_index / chunk_id.
+
+Ingest writes a composite `doc_key` into every chunk's metadata so fetching
+one document is a single indexed equality match instead of a four-way `$and`:
+
+    doc_key   "<doc_type>|<recruiter_id>|<job_id>|file_name=<name>"   (batch resumes, the JD)
+              "<doc_type>|<recruiter_id>|<job_id>|applicant_id=<id>"  (/ingest_documents resumes)
+
+A document's chunks are written together, so a keyed lookup is all or
+nothing; chunks written before the key existed are found via the `$and`
+fallback. Job-wide fetches (every resume of a job) always use `$and`, since
+a job may mix keyed and legacy documents.
+"""
+from collections import defaultdict
+
+JD_NAME = "job_description"
+
+
+def doc_key(doc_type, recruiter_id, job_id, file_name=None, applicant_id=None):
+    name = f"file_name={file_name}" if file_name else f"applicant_id={applicant_id}"
+    return f"{doc_type}|{recruiter_id}|{job_id}|{name}"
+
+
+def key_metadata(doc_type, recruiter_id, job_id, file_name=None, applicant_id=None):
+    """Composite lookup key to merge into a chunk's metadata at ingest."""
+    if doc_type == "job":
+        file_name = JD_NAME
+    return {"doc_key": doc_key(doc_type, recruiter_id, job_id, file_name, applicant_id)}
+
+
+def chunk_order(metadata):
+    return metadata.get("chunk_index", metadata.get("chunk_id", 0))
+
+
+def _get(collection, where):
+    if collection is None:  # the job's shard was never written (collection_router)
+        return []
+    data = collection.get(where=where, include=["documents", "metadatas"])
+    return sorted(zip(data["documents"], data["metadatas"]), key=lambda row: chunk_order(row[1]))
+
+
+def fetch_chunks(collection, recruiter_id, job_id, doc_type, applicant_id=None, file_name=None):
+    """
+    All (text, metadata) chunks of one document, ordered by chunk index. For
+    doc_type "job" that is the job's JD; for resumes pass applicant_id or
+    file_name, or neither to get every resume chunk of the job.
+    """
+    if doc_type == "job":
+        file_name, applicant_id = JD_NAME, None
+    if file_name or applicant_id:
+        rows = _get(collection, {"doc_key": doc_key(doc_type, recruiter_id, job_id, file_name, applicant_id)})
+        if rows:
+            return rows
+
+    clauses = [
+        {"recruiter_id": {"$eq": recruiter_id}},
+        {"job_id": {"$eq": job_id}},
+        {"doc_type": {"$eq": doc_type}},
+    ]
+    if doc_type != "job":  # legacy JD chunks from /ingest_documents carry no file_name
+        if file_name:
+            clauses.append({"file_name": {"$eq": file_name}})
+        elif applicant_id:
+            clauses.append({"applicant_id": {"$eq": applicant_id}})
+    return _get(collection, {"$and": clauses})
+
+
+def fetch_text(collection, recruiter_id, job_id, doc_type, applicant_id=None, file_name=None):
+    """The document rebuilt from its chunks ("\\n"-joined, chunk order), or "" if none."""
+    rows = fetch_chunks(collection, recruiter_id, job_id, doc_type, applicant_id, file_name)
+    return "\n".join(text for text, _ in rows)
+
+
+def fetch_texts_by_file(collection, recruiter_id, job_id, doc_type="resume_v2"):
+    """{file_name: full text} for every document of a doc type in a job."""
+    by_file = defaultdict(list)
+    for text, metadata in fetch_chunks(collection, recruiter_id, job_id, doc_type):
+        file_name = metadata.get("file_name")
+        if not file_name or file_name == JD_NAME:
+            continue  # Skip if no filename or it's JD
+        by_file[file_name].append(text)
+    return {file_name: "\n".join(chunks) for file_name, chunks in by_file.items()}
@@ -0,0 +1,216 @@
+# collection_router.py
+"""
+Route resume / JD chunks to per-tenant Chroma collections.
+
+CHROMA_SHARD_MODE picks where a (recruiter_id, job_id) document lives:
+
+    none        everything in resume_v2 (the original single collection)
+    recruiter   resume_v2__<recruiter>               one collection per recruiter
+    job         resume_v2__<recruiter>__<job>        one collection per job
+
+A query then opens only the shard(s) its scope names, so `get(where=...)`
+and HNSW searches never touch other tenants' vectors, and in "job" mode
+dropping a job is a collection delete instead of a metadata scan.
+
+Shards are created on first write and recorded in a small SQLite catalog
+next to Chroma's own (chroma_db/shard_catalog.sqlite3), which answers "which
+shards does this recruiter have?" without listing every collection. Chunk
+metadata is unchanged, so the existing `where` filters keep working inside a
+shard. After changing the mode, run migrate_shards.py to re-home existing
+chunks (embeddings are copied, nothing is re-embedded).
+"""
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import chromadb
+from langchain.vectorstores import Chroma
+
+from retrieval_scope import normalize_id
+
+logger = logging.getLogger(__name__)
+
+SHARD_MODES = ("none", "recruiter", "job")
+CHROMA_SHARD_MODE = os.getenv("CHROMA_SHARD_MODE", "none").strip().lower()
+BASE_COLLECTION = "resume_v2"
+CATALOG_FILE = "shard_catalog.sqlite3"
+
+
+def id_slug(value):
+    """Collection-name-safe, collision-free form of an id (Chroma allows [a-zA-Z0-9._-])."""
+    value = str(value)
+    slug = re.sub(r"[^a-z0-9]+", "-", value.lower()).strip("-")[:32] or "id"
+    return f"{slug}-{hashlib.sha1(value.encode('utf-8')).hexdigest()[:8]}"
+
+
+def shard_name(recruiter_id=None, job_id=None, mode=CHROMA_SHARD_MODE, base=BASE_COLLECTION):
+    if mode == "none":
+        return base
+    recruiter_id, job_id = normalize_id(recruiter_id), normalize_id(job_id)
+    if not recruiter_id or (mode == "job" and not job_id):
+        raise ValueError(f"Shard mode '{mode}' needs recruiter_id{' and job_id' if mode == 'job' else ''}")
+    if mode == "recruiter":
+        return f"{base}__{id_slug(recruiter_id)}"
+    return f"{base}__{id_slug(recruiter_id)}__{id_slug(job_id)}"
+
+
+# --- 1️⃣ Catalog ---
+class ShardCatalog:
+    """Which shard collections exist, and for which recruiter / job."""
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS shards ("
+                " name TEXT PRIMARY KEY, mode TEXT NOT NULL,"
+                " recruiter_id TEXT, job_id TEXT, created_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS shards_by_recruiter ON shards (mode, recruiter_id)")
+
+    def _connect(self):
+        # One short-lived connection per call: safe across threads and gunicorn workers
+        return closing(sqlite3.connect(self.path, timeout=30, isolation_level=None))
+
+    def add(self, name, mode, recruiter_id=None, job_id=None):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO shards (name, mode, recruiter_id, job_id, created_at) VALUES (?, ?, ?, ?, ?)",
+                (name, mode, recruiter_id, job_id, time.time()),
+            )
+
+    def remove(self, name):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM shards WHERE name = ?", (name,))
+
+    def exists(self, name):
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM shards WHERE name = ?", (name,)).fetchone() is not None
+
+    def names(self, mode, recruiter_id=None):
+        query, params = "SELECT name FROM shards WHERE mode = ?", [mode]
+        if recruiter_id is not None:
+            query += " AND recruiter_id = ?"
+            params.append(recruiter_id)
+        with self._connect() as conn:
+            return [row[0] for row in conn.execute(query + " ORDER BY name", params)]
+
+    def entries(self):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT name, mode, recruiter_id, job_id, created_at FROM shards ORDER BY name")
+            return [dict(zip(("name", "mode", "recruiter_id", "job_id", "created_at"), row)) for row in rows]
+
+
+# --- 2️⃣ Router ---
+class CollectionRouter:
+    """
+    Hands out the LangChain Chroma store for a recruiter / job. Stores are
+    opened per call (a cheap get-or-create on the shared client), so a shard
+    dropped by another process (DB-Admin) is never served from a stale handle.
+    """
+
+    def __init__(self, embeddings=None, persist_directory="chroma_db", mode=None, base=BASE_COLLECTION):
+        self.mode = (mode or CHROMA_SHARD_MODE).lower()
+        if self.mode not in SHARD_MODES:
+            raise ValueError(f"CHROMA_SHARD_MODE must be one of {', '.join(SHARD_MODES)}, got '{self.mode}'")
+        self.embeddings = embeddings
+        self.base = base
+        os.makedirs(persist_directory, exist_ok=True)
+        self.client = chromadb.PersistentClient(path=persist_directory)
+        self.catalog = ShardCatalog(os.path.join(persist_directory, CATALOG_FILE))
+        self._base_store = None
+        self._lock = threading.Lock()
+
+    def shard_name(self, recruiter_id=None, job_id=None):
+        return shard_name(recruiter_id, job_id, self.mode, self.base)
+
+    def _open(self, name):
+        return Chroma(client=self.client, collection_name=name, embedding_function=self.embeddings)
+
+    def store(self, recruiter_id=None, job_id=None, create=True):
+        """The shard's store; with create=False, None if the shard was never written."""
+        if self.mode == "none":
+            with self._lock:
+                if self._base_store is None:
+                    self._base_store = self._open(self.base)
+            return self._base_store
+
+        name = self.shard_name(recruiter_id, job_id)
+        if not create and not self.catalog.exists(name):
+            return None
+        store = self._open(name)
+        if create:
+            recruiter_id, job_id = normalize_id(recruiter_id), normalize_id(job_id)
+            self.catalog.add(name, self.mode, recruiter_id, job_id if self.mode == "job" else None)
+        return store
+
+    def collection(self, recruiter_id=None, job_id=None, create=True):
+        store = self.store(recruiter_id, job_id, create)
+        return store._collection if store is not None else None
+
+    def stores_for(self, scope=None):
+        """Stores a scoped query has to visit: one shard when the scope names it."""
+        scope = scope or {}
+        if self.mode == "none":
+            return [self.store()]
+        recruiter_id, job_id = scope.get("recruiter_id"), scope.get("job_id")
+        if recruiter_id and (job_id or self.mode == "recruiter"):
+            store = self.store(recruiter_id, job_id, create=False)
+            return [store] if store is not None else []
+        recruiter_id = normalize_id(recruiter_id) if recruiter_id else None
+        return [self._open(name) for name in self.catalog.names(self.mode, recruiter_id)]
+
+    def collections(self):
+        """Every collection of the current mode (cross-tenant lookups only)."""
+        if self.mode == "none":
+            return [self.collection()]
+        return [self._open(name)._collection for name in self.catalog.names(self.mode)]
+
+    def similarity_search(self, query, k=4, scope=None, filter=None):
+        """similarity_search over the scope's shard(s); hits from several shards merge by distance."""
+        stores = self.stores_for(scope)
+        if not stores:
+            return []
+        if len(stores) == 1:
+            return stores[0].similarity_search(query, k=k, filter=filter)
+
+        vector = self.embeddings.embed_query(query)  # once, not per shard
+        hits = []
+        for store in stores:
+            hits.extend(store.similarity_search_by_vector_with_relevance_scores(vector, k=k, filter=filter))
+        hits.sort(key=lambda hit: hit[1])
+        return [doc for doc, _ in hits[:k]]
+
+    def drop(self, recruiter_id, job_id):
+        """
+        Remove every chunk of a job; returns the number removed. In "job"
+        mode that is a collection delete, otherwise a metadata delete in the shard.
+        """
+        if self.mode == "job":
+            name = self.shard_name(recruiter_id, job_id)
+            count = 0
+            try:
+                count = self.client.get_collection(name).count()
+                self.client.delete_collection(name)
+            except Exception as e:  # already gone; still clear the catalog entry
+                logger.info("Shard %s not deleted: %s", name, e)
+            self.catalog.remove(name)
+            return count
+
+        collection = self.collection(recruiter_id, job_id, create=False)
+        if collection is None:
+            return 0
+        recruiter_id, job_id = normalize_id(recruiter_id), normalize_id(job_id)
+        where = {"$and": [{"recruiter_id": {"$eq": recruiter_id}}, {"job_id": {"$eq": job_id}}]}
+        ids = collection.get(where=where, include=[])["ids"]
+        if ids:
+            collection.delete(ids=ids)
+        return len(ids)
+
+    def shards(self):
+        return self.catalog.entries()
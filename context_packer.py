@@ -0,0 +1,183 @@
+# context_packer.py
+"""
+Token-budgeted prompt context.
+
+Prompt evaluation time on llama3:8b grows with prompt length, and an
+unbounded resume / JD can overflow the model's context window. Everything
+that goes into a prompt is packed to a token budget here:
+
+    pack_chunks(texts, budget)       retrieved chunks, best first (/ask-hybrid)
+    pack_document(text, budget, terms=...)
+                                     a whole resume or JD (skill extraction)
+
+Both drop duplicate and overlapping pieces first (identical chunks linked
+into several jobs, overlapping token windows, page headers repeated on every
+page), then take pieces in relevance order until the budget is reached. A
+document is re-emitted in its original order; only the selection is by
+relevance (lines mentioning the JD's required skills first).
+
+Tokens are counted with tiktoken (CONTEXT_ENCODING, cl100k_base by default,
+a close proxy for llama3's tiktoken-based vocabulary). If the encoding can't
+be loaded (offline host without the tiktoken cache) a conservative estimate
+is used instead.
+"""
+import logging
+import os
+import re
+import threading
+
+from embedding_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_ENCODING = os.getenv("CONTEXT_ENCODING", "cl100k_base")
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", 1500))
+EVAL_RESUME_TOKENS = int(os.getenv("EVAL_RESUME_TOKENS", 3000))
+EVAL_JD_TOKENS = int(os.getenv("EVAL_JD_TOKENS", 1500))
+# A piece whose word shingles are at least this much contained in an earlier piece is dropped
+CONTEXT_DEDUP_OVERLAP = float(os.getenv("CONTEXT_DEDUP_OVERLAP", 0.8))
+SHINGLE_SIZE = 5
+
+_encoding = None
+_encoding_lock = threading.Lock()
+_ESTIMATE_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+
+                    _encoding = tiktoken.get_encoding(CONTEXT_ENCODING)
+                except Exception as e:
+                    logger.warning("tiktoken encoding %s unavailable, estimating tokens: %s", CONTEXT_ENCODING, e)
+                    _encoding = False
+    return _encoding
+
+
+def count_tokens(text):
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    # Err on the high side so a packed prompt never exceeds its budget
+    return max(len(_ESTIMATE_RE.findall(text)), (len(text) + 3) // 4)
+
+
+def truncate_tokens(text, max_tokens):
+    """Longest prefix of `text` within max_tokens."""
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding:
+        tokens = encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+    while text and count_tokens(text) > max_tokens:
+        text = text[:max(0, len(text) * max_tokens // count_tokens(text) - 1)]
+    return text
+
+
+def _shingles(text):
+    words = normalize_text(text).lower().split()
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def dedupe(texts, overlap=None, near_duplicates=True):
+    """
+    Indexes of `texts` to keep: drops empties, exact copies and (with
+    near_duplicates) pieces mostly contained in an earlier one.
+    """
+    overlap = CONTEXT_DEDUP_OVERLAP if overlap is None else overlap
+    kept, kept_shingles, seen = [], [], set()
+    for i, text in enumerate(texts):
+        key = normalize_text(text).lower()
+        if not key or key in seen:
+            continue
+        shingles = _shingles(text) if near_duplicates else set()
+        if len(shingles) > 1 and any(len(shingles & other) / len(shingles) >= overlap for other in kept_shingles):
+            continue
+        seen.add(key)
+        kept.append(i)
+        kept_shingles.append(shingles)
+    return kept
+
+
+def _pack(texts, order, budget, separator):
+    """Greedy fill in `order`; returns (selected indexes, {index: text}, tokens used, dropped count)."""
+    sep_tokens = count_tokens(separator)
+    selected, packed, used, dropped = [], {}, 0, 0
+    for i in order:
+        tokens = count_tokens(texts[i])
+        cost = tokens + (sep_tokens if selected else 0)
+        if used + cost <= budget:
+            selected.append(i)
+            packed[i] = texts[i]
+            used += cost
+        elif not selected:
+            # The most relevant piece alone is over budget: keep its head rather than nothing
+            packed[i] = truncate_tokens(texts[i], budget)
+            selected.append(i)
+            used = count_tokens(packed[i])
+        else:
+            dropped += 1  # a shorter, less relevant piece may still fit
+    return selected, packed, used, dropped
+
+
+def pack_chunks(texts, budget=None, separator="\n\n"):
+    """
+    Pack retrieved chunks (best first) into at most `budget` tokens.
+    Returns {"text", "chunks" (indexes into texts, in packed order), "tokens",
+    "duplicates", "over_budget"}.
+    """
+    budget = RAG_CONTEXT_TOKENS if budget is None else budget
+    order = dedupe(texts)
+    selected, packed, _, dropped = _pack(texts, order, budget, separator)
+    text = separator.join(packed[i] for i in selected)
+    return {
+        "text": text,
+        "chunks": selected,
+        "tokens": count_tokens(text),
+        "duplicates": len(texts) - len(order),
+        "over_budget": dropped,
+    }
+
+
+def pack_document(text, budget, terms=None):
+    """
+    Fit a resume / JD into `budget` tokens. A document within budget is
+    returned unchanged. Otherwise repeated lines are dropped and, if the rest
+    is still too long, lines mentioning any of `terms` (e.g. the JD's
+    required skills) are kept first, then the rest in document order.
+    The kept lines are returned in document order.
+    Returns {"text", "tokens", "original_tokens", "truncated"}.
+    """
+    text = text or ""
+    original_tokens = count_tokens(text)
+    if original_tokens <= budget:
+        return {"text": text, "tokens": original_tokens, "original_tokens": original_tokens, "truncated": False}
+
+    lines = text.split("\n")
+    keep = dedupe(lines, near_duplicates=False)  # whole documents: exact repeats only
+    # dedupe() drops blank lines; keep them as paragraph breaks
+    keep = sorted(set(keep) | {i for i, line in enumerate(lines) if not line.strip()})
+    deduped = "\n".join(lines[i] for i in keep)
+    deduped_tokens = count_tokens(deduped)
+    if deduped_tokens <= budget:
+        return {"text": deduped, "tokens": deduped_tokens, "original_tokens": original_tokens, "truncated": True}
+
+    terms = [normalize_text(str(t)).lower() for t in terms or [] if str(t).strip()]
+    if terms:
+        hits = {i: sum(term in lines[i].lower() for term in terms) for i in keep}
+        order = sorted(keep, key=lambda i: (-hits[i], i))
+    else:
+        order = keep
+    selected, packed, _, _ = _pack(lines, order, budget, "\n")
+    packed_text = "\n".join(packed[i] for i in sorted(selected))
+    return {"text": packed_text, "tokens": count_tokens(packed_text), "original_tokens": original_tokens,
+            "truncated": True}
@@ -0,0 +1,343 @@
+# doc_hashes.py
+"""
+Content-hash index for deduplicated ingest.
+
+Every chunk carries `file_sha256` (raw upload bytes) and `text_sha256`
+(whitespace-normalized extracted text) in its metadata. The same hashes are
+kept in Redis so "have we already ingested this?" is a single HGET:
+
+    doc_hash:<recruiter_id>:<job_id>   field "<doc_type>:file:<sha>" / "<doc_type>:text:<sha>"
+    doc_hash:global                    field "<doc_type>:text:<sha>" -> where a copy lives
+
+    doc_hash:warmed                    set once the index holds every document in Chroma
+
+A Redis miss is trusted: a new document costs no Chroma query. Only when
+Redis errors, or the index is not warmed (first deploy, Redis flushed), does
+a lookup fall back to a metadata `where` query in Chroma (no embedding, no
+ANN search). The first lookup that finds the index cold starts a background
+`warm()`, which backfills the hashes from chunk metadata and sets the marker;
+`python doc_hashes.py --warm` does the same from the command line.
+
+A Redis hit is only trusted once Chroma confirms the chunks are still there
+(a limit=1 metadata get), so entries left behind by a deleted job never turn
+a re-upload into a "skipped".
+Collections come from a CollectionRouter, so linking copies chunks across
+shards when the source lives in another recruiter's / job's collection.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import threading
+import uuid
+
+import redis
+
+from embedding_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+def file_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def text_hash(text):
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class DocumentHashIndex:
+    GLOBAL_KEY = "doc_hash:global"
+    WARM_KEY = "doc_hash:warmed"
+    WARMING_KEY = "doc_hash:warming"  # one warm-up at a time across workers
+    WARMING_TTL = 3600
+
+    def __init__(self, redis_client, router):
+        self.redis = redis_client
+        self.router = router
+
+    @staticmethod
+    def _job_key(recruiter_id, job_id):
+        return f"doc_hash:{recruiter_id}:{job_id}"
+
+    # --- lookups ---
+    def _lookup(self, key, fields):
+        """
+        (values, trusted) for `fields` of a hash. trusted=False (Redis error or
+        index not warmed yet) means a miss still has to be checked in Chroma.
+        """
+        try:
+            pipe = self.redis.pipeline()
+            pipe.exists(self.WARM_KEY)
+            pipe.hmget(key, fields)
+            warmed, values = pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Doc hash index unavailable, using Chroma metadata: %s", e)
+            return [None] * len(fields), False
+        if not warmed:
+            self._start_warm()
+        return values, bool(warmed)
+
+    def _chroma_lookup(self, where, collections):
+        for collection in collections:
+            if collection is None:
+                continue
+            data = collection.get(where={"$and": where}, limit=1, include=["metadatas"])
+            if not data["metadatas"]:
+                continue
+            meta = data["metadatas"][0]
+            return {
+                "recruiter_id": meta.get("recruiter_id"),
+                "job_id": meta.get("job_id"),
+                "file_name": meta.get("file_name") or meta.get("applicant_id"),
+                "text_sha256": meta.get("text_sha256"),
+            }
+        return None
+
+    def _still_stored(self, entry, doc_type):
+        """Whether the chunks a Redis entry points at still exist in Chroma."""
+        where = [
+            {"recruiter_id": {"$eq": entry.get("recruiter_id")}},
+            {"job_id": {"$eq": entry.get("job_id")}},
+            {"doc_type": {"$eq": doc_type}},
+            {"text_sha256": {"$eq": entry.get("text_sha256")}},
+        ]
+        collection = self.router.collection(entry.get("recruiter_id"), entry.get("job_id"), create=False)
+        return self._chroma_lookup(where, [collection]) is not None
+
+    def find(self, recruiter_id, job_id, doc_type, file_sha256=None, text_sha256=None):
+        """Return the entry for an identical document already ingested for this job, else None."""
+        fields = []
+        if file_sha256:
+            fields.append(f"{doc_type}:file:{file_sha256}")
+        if text_sha256:
+            fields.append(f"{doc_type}:text:{text_sha256}")
+        key = self._job_key(recruiter_id, job_id)
+        values, trusted = self._lookup(key, fields)
+        stale = []
+        for field, value in zip(fields, values):
+            if value is None:
+                continue
+            entry = json.loads(value)
+            if self._still_stored(entry, doc_type):
+                return entry
+            stale.append(field)
+        if stale:
+            logger.info("Dropping %d stale doc hash(es) for %s/%s", len(stale), recruiter_id, job_id)
+            try:
+                self.redis.hdel(key, *stale)
+            except redis.RedisError as e:
+                logger.warning("Failed to drop stale doc hashes for %s/%s: %s", recruiter_id, job_id, e)
+        if trusted:
+            return None
+
+        # Not warmed / Redis down: metadata query on the job's shard
+        scope = [
+            {"recruiter_id": {"$eq": recruiter_id}},
+            {"job_id": {"$eq": job_id}},
+            {"doc_type": {"$eq": doc_type}},
+        ]
+        collections = [self.router.collection(recruiter_id, job_id, create=False)]
+        if file_sha256:
+            entry = self._chroma_lookup(scope + [{"file_sha256": {"$eq": file_sha256}}], collections)
+            if entry:
+                return entry
+        if text_sha256:
+            return self._chroma_lookup(scope + [{"text_sha256": {"$eq": text_sha256}}], collections)
+        return None
+
+    def find_anywhere(self, doc_type, text_sha256):
+        """Locate an identical document ingested for any job (for linking instead of re-embedding)."""
+        field = f"{doc_type}:text:{text_sha256}"
+        (value,), trusted = self._lookup(self.GLOBAL_KEY, [field])
+        if value is not None:
+            entry = json.loads(value)
+            if self._still_stored(entry, doc_type):
+                return entry
+            try:
+                self.redis.hdel(self.GLOBAL_KEY, field)
+            except redis.RedisError as e:
+                logger.warning("Failed to drop stale doc hash %s: %s", field, e)
+        if trusted:
+            return None
+        # Not warmed / Redis down: scan every collection's metadata
+        return self._chroma_lookup([
+            {"doc_type": {"$eq": doc_type}},
+            {"text_sha256": {"$eq": text_sha256}},
+        ], self.router.collections())
+
+    # --- writes ---
+    def _record(self, pipe, recruiter_id, job_id, doc_type, file_name, text_sha256, file_sha256=None, chunks=0):
+        entry = {
+            "recruiter_id": recruiter_id,
+            "job_id": job_id,
+            "file_name": file_name,
+            "text_sha256": text_sha256,
+            "chunks": chunks,
+        }
+        value = json.dumps(entry)
+        mapping = {f"{doc_type}:text:{text_sha256}": value}
+        if file_sha256:
+            mapping[f"{doc_type}:file:{file_sha256}"] = value
+        pipe.hset(self._job_key(recruiter_id, job_id), mapping=mapping)
+        pipe.hset(self.GLOBAL_KEY, f"{doc_type}:text:{text_sha256}", value)
+
+    def record(self, recruiter_id, job_id, doc_type, file_name, text_sha256, file_sha256=None, chunks=0):
+        try:
+            pipe = self.redis.pipeline()
+            self._record(pipe, recruiter_id, job_id, doc_type, file_name, text_sha256, file_sha256, chunks)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Failed to record doc hash for %s: %s", file_name, e)
+
+    # --- warm-up ---
+    def warm(self, page_size=1000):
+        """Backfill the index from chunk metadata in every collection, then mark it warmed."""
+        docs = {}
+        for collection in self.router.collections():
+            offset = 0
+            while True:
+                data = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+                for meta in data["metadatas"]:
+                    meta = meta or {}
+                    key = tuple(meta.get(field) for field in ("recruiter_id", "job_id", "doc_type", "text_sha256"))
+                    if not all(key):
+                        continue
+                    doc = docs.setdefault(key, {
+                        "file_name": meta.get("file_name") or meta.get("applicant_id"),
+                        "file_sha256": meta.get("file_sha256"),
+                        "chunks": 0,
+                    })
+                    doc["chunks"] += 1
+                if len(data["ids"]) < page_size:
+                    break
+                offset += page_size
+
+        pipe = self.redis.pipeline(transaction=False)
+        for (recruiter_id, job_id, doc_type, text_sha256), doc in docs.items():
+            self._record(pipe, recruiter_id, job_id, doc_type, doc["file_name"], text_sha256,
+                         doc["file_sha256"], doc["chunks"])
+        pipe.set(self.WARM_KEY, 1)
+        pipe.execute()
+        return {"documents": len(docs)}
+
+    def _start_warm(self):
+        try:
+            if not self.redis.set(self.WARMING_KEY, 1, nx=True, ex=self.WARMING_TTL):
+                return  # another worker is on it
+        except redis.RedisError:
+            return
+        threading.Thread(target=self._warm_in_background, name="doc-hash-warm", daemon=True).start()
+
+    def _warm_in_background(self):
+        try:
+            logger.info("Doc hash index warmed: %s", self.warm())
+        except Exception:
+            logger.exception("Doc hash index warm-up failed; lookups keep using Chroma")
+        finally:
+            try:
+                self.redis.delete(self.WARMING_KEY)
+            except redis.RedisError:
+                pass
+
+    def forget(self, recruiter_id, job_id, doc_type):
+        """Drop this job's entries for a doc type (e.g. before replacing its JD)."""
+        try:
+            key = self._job_key(recruiter_id, job_id)
+            fields = [f for f in self.redis.hkeys(key) if f.decode("utf-8").startswith(f"{doc_type}:")]
+            if fields:
+                self.redis.hdel(key, *fields)
+        except redis.RedisError as e:
+            logger.warning("Failed to clear doc hashes for %s/%s: %s", recruiter_id, job_id, e)
+
+    def forget_job(self, recruiter_id, job_id):
+        """Drop every entry of a deleted job, including global entries pointing at it."""
+        key = self._job_key(recruiter_id, job_id)
+        try:
+            owned = []
+            for field in self.redis.hkeys(key):
+                field = field.decode("utf-8")
+                if ":text:" not in field:
+                    continue
+                current = self.redis.hget(self.GLOBAL_KEY, field)
+                if current is not None:
+                    current = json.loads(current)
+                    if (current.get("recruiter_id"), current.get("job_id")) == (recruiter_id, job_id):
+                        owned.append(field)
+            pipe = self.redis.pipeline()
+            if owned:
+                pipe.hdel(self.GLOBAL_KEY, *owned)
+            pipe.delete(key)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Failed to clear doc hashes for %s/%s: %s", recruiter_id, job_id, e)
+
+    # --- linking ---
+    def link(self, source, recruiter_id, job_id, doc_type, metadata_overrides):
+        """
+        Copy the chunks (with their stored embeddings) of an identical document
+        into this job. No chunking, no embedding. Returns the copied chunk
+        texts and their metadata ([], [] if the source is gone).
+        """
+        source_collection = self.router.collection(source["recruiter_id"], source["job_id"], create=False)
+        if source_collection is None:
+            return [], []
+        data = source_collection.get(
+            where={"$and": [
+                {"recruiter_id": {"$eq": source["recruiter_id"]}},
+                {"job_id": {"$eq": source["job_id"]}},
+                {"doc_type": {"$eq": doc_type}},
+                {"text_sha256": {"$eq": source["text_sha256"]}},
+            ]},
+            include=["documents", "metadatas", "embeddings"]
+        )
+        if not data["ids"]:
+            return [], []
+
+        # Chunk order, one copy per chunk index if the source job holds duplicates
+        rows = sorted(
+            zip(data["documents"], data["metadatas"], data["embeddings"]),
+            key=lambda row: row[1].get("chunk_index", row[1].get("chunk_id", 0))
+        )
+        seen = set()
+        unique_rows = []
+        for row in rows:
+            idx = row[1].get("chunk_index", row[1].get("chunk_id", 0))
+            if idx not in seen:
+                seen.add(idx)
+                unique_rows.append(row)
+        rows = unique_rows
+
+        metadatas = []
+        for _, meta, _ in rows:
+            meta = {**meta, "recruiter_id": recruiter_id, "job_id": job_id}
+            for key, value in metadata_overrides.items():
+                if value is None:
+                    meta.pop(key, None)
+                else:
+                    meta[key] = value
+            metadatas.append(meta)
+
+        self.router.collection(recruiter_id, job_id).add(
+            ids=[str(uuid.uuid4()) for _ in rows],
+            documents=[row[0] for row in rows],
+            embeddings=[row[2] for row in rows],
+            metadatas=metadatas,
+        )
+        return [row[0] for row in rows], metadatas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--warm", action="store_true", help="backfill the Redis index from Chroma metadata")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
+    parser.add_argument("--persist-directory", default="chroma_db")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    if args.warm:
+        from collection_router import CollectionRouter
+
+        index = DocumentHashIndex(redis.from_url(args.redis_url),
+                                  CollectionRouter(persist_directory=args.persist_directory))
+        print(index.warm())
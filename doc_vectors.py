@@ -0,0 +1,112 @@
+# doc_vectors.py
+"""
+One whole-document vector per resume / JD, kept in a dedicated Chroma collection.
+
+Chunk vectors in `resume_v2` are for retrieval; scoring a resume against a JD
+needs one vector per document. Ingest writes a "doc" record here so
+/evaluate_batch_summary can score a whole job with a single matrix-vector
+product, and /evaluate_resume can score one applicant, instead of embedding
+the resumes and the JD again.
+
+Resumes from /batch_ingest are keyed by file_name, those from
+/ingest_documents by applicant_id; the record id says which
+("resume_v2:<recruiter>:<job>:file:<name>" / ":applicant:<id>").
+"""
+import numpy as np
+
+DOC_COLLECTION = "resume_v2_docs"
+
+
+# Which metadata field a resume record is keyed by -> its id prefix
+KEY_PREFIXES = {"file_name": "file", "applicant_id": "applicant"}
+
+
+def doc_vector_id(doc_type, recruiter_id, job_id, name, key=None):
+    if key is None:
+        return f"{doc_type}:{recruiter_id}:{job_id}:{name}"
+    return f"{doc_type}:{recruiter_id}:{job_id}:{KEY_PREFIXES[key]}:{name}"
+
+
+def store_doc_vector(doc_store, text, doc_type, recruiter_id, job_id, file_name=None, applicant_id=None, vector=None):
+    """
+    Embed the full document text once and upsert it as a single record.
+    `text` should be the chunks joined with "\\n", i.e. exactly what the
+    evaluation endpoints rebuild from the vectorstore.
+    """
+    key = "file_name" if file_name else "applicant_id" if applicant_id else None
+    name = file_name or applicant_id or "job_description"
+    if vector is None:
+        vector = doc_store.embeddings.embed_documents([text])[0]
+
+    metadata = {
+        "doc_type": doc_type,
+        "recruiter_id": recruiter_id,
+        "job_id": job_id,
+    }
+    if key != "applicant_id":
+        metadata["file_name"] = name
+    if applicant_id:
+        metadata["applicant_id"] = applicant_id
+
+    doc_store._collection.upsert(
+        ids=[doc_vector_id(doc_type, recruiter_id, job_id, name, key)],
+        embeddings=[vector],
+        documents=[text],
+        metadatas=[metadata],
+    )
+    return vector
+
+
+def fetch_doc_vectors(doc_store, recruiter_id, job_id, doc_type, key="file_name"):
+    """Return {file_name (or `key`): (text, vector)} for every doc record of a job."""
+    data = doc_store._collection.get(
+        where={
+            "$and": [
+                {"recruiter_id": {"$eq": recruiter_id}},
+                {"job_id": {"$eq": job_id}},
+                {"doc_type": {"$eq": doc_type}}
+            ]
+        },
+        include=["documents", "metadatas", "embeddings"]
+    )
+    records = {}
+    for record_id, doc, meta, emb in zip(data["ids"], data["documents"], data["metadatas"], data["embeddings"]):
+        name = meta.get(key)
+        if name is None:
+            continue
+        # A record under the current id wins over a legacy (unprefixed) one
+        if name in records and record_id != doc_vector_id(doc_type, recruiter_id, job_id, name, key):
+            continue
+        records[name] = (doc, np.asarray(emb, dtype=np.float32))
+    return records
+
+
+def resolve_doc_vectors(doc_store, recruiter_id, job_id, doc_type, texts_by_name, key="file_name"):
+    """
+    Map each {name: text} to its stored vector; names are file_names, or
+    applicant_ids with key="applicant_id". Records that are missing or
+    whose text no longer matches the chunks (legacy data, re-ingest) are
+    embedded once and written back, so the next evaluation is a pure lookup.
+    """
+    stored = fetch_doc_vectors(doc_store, recruiter_id, job_id, doc_type, key)
+    vectors = {}
+    for name, text in texts_by_name.items():
+        record = stored.get(name)
+        if record is not None and record[0] == text:
+            vectors[name] = record[1]
+            continue
+        vector = store_doc_vector(
+            doc_store, text, doc_type, recruiter_id, job_id,
+            **({key: name} if doc_type != "job" else {})
+        )
+        vectors[name] = np.asarray(vector, dtype=np.float32)
+    return vectors
+
+
+def delete_doc_vectors(doc_store, recruiter_id, job_id):
+    """Remove every doc record (resumes and JD) of a job; returns the number removed."""
+    where = {"$and": [{"recruiter_id": {"$eq": recruiter_id}}, {"job_id": {"$eq": job_id}}]}
+    ids = doc_store._collection.get(where=where, include=[])["ids"]
+    if ids:
+        doc_store._collection.delete(ids=ids)
+    return len(ids)
@@ -0,0 +1,194 @@
+# embedding_backends.py
+"""
+Embedding backends. Construct embeddings with `create_embeddings(model_name)`
+instead of `HuggingFaceEmbeddings(...)` so the backend is picked by config:
+
+    EMBEDDINGS_BACKEND=torch   sentence-transformers / PyTorch (default)
+    EMBEDDINGS_BACKEND=onnx    exported ONNX graph on onnxruntime (CPU)
+
+The ONNX model is exported from the sentence-transformers checkpoint on first
+use and cached under ONNX_MODEL_DIR/<model>/:
+
+    model.onnx         fp32 transformer (input_ids, attention_mask -> token states)
+    model.int8.onnx    dynamically quantized weights (ONNX_QUANTIZE=1)
+    tokenizer files + embedding_config.json (max_seq_length, pooling, normalize)
+
+Pooling and normalization follow the sentence-transformers pipeline. Run
+bench_embedding_backends.py on the target host to compare fp32 / int8
+vectors and throughput against PyTorch before switching backends.
+"""
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDINGS_BACKEND = os.getenv("EMBEDDINGS_BACKEND", "torch").lower()
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "onnx_models")
+ONNX_QUANTIZE = os.getenv("ONNX_QUANTIZE", "0").lower() in ("1", "true", "yes")
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", 0))  # 0 = onnxruntime default (all cores)
+ONNX_INTER_OP_THREADS = int(os.getenv("ONNX_INTER_OP_THREADS", 1))
+ONNX_BATCH_SIZE = int(os.getenv("ONNX_BATCH_SIZE", 32))
+
+_export_lock = threading.Lock()
+
+
+def _model_dir(model_name, root=None):
+    return os.path.join(root or ONNX_MODEL_DIR, model_name.replace("/", "__"))
+
+
+def export_onnx(model_name, root=None, quantize=False):
+    """
+    Export a sentence-transformers model to ONNX (and optionally int8) once.
+    Returns the directory holding the files. Needs torch + sentence-transformers;
+    serving the exported model afterwards does not.
+    """
+    out_dir = _model_dir(model_name, root)
+    fp32_path = os.path.join(out_dir, "model.onnx")
+    int8_path = os.path.join(out_dir, "model.int8.onnx")
+
+    with _export_lock:
+        if not os.path.exists(fp32_path):
+            import torch
+            from sentence_transformers import SentenceTransformer
+
+            logger.info("Exporting %s to ONNX in %s", model_name, out_dir)
+            os.makedirs(out_dir, exist_ok=True)
+            st_model = SentenceTransformer(model_name, device="cpu")
+            transformer = st_model[0]
+            pooling = st_model[1]
+            normalize = any(type(module).__name__ == "Normalize" for module in st_model)
+
+            transformer.tokenizer.save_pretrained(out_dir)
+            with open(os.path.join(out_dir, "embedding_config.json"), "w") as f:
+                json.dump({
+                    "model_name": model_name,
+                    "max_seq_length": st_model.max_seq_length,
+                    "pooling": pooling.get_pooling_mode_str(),
+                    "normalize": normalize,
+                }, f)
+
+            sample = transformer.tokenizer(["export sample"], return_tensors="pt")
+            input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+            tmp_path = fp32_path + ".tmp"
+            torch.onnx.export(
+                transformer.auto_model.eval(),
+                tuple(sample[name] for name in input_names),
+                tmp_path,
+                input_names=input_names,
+                output_names=["token_embeddings"],
+                dynamic_axes={
+                    **{name: {0: "batch", 1: "sequence"} for name in input_names},
+                    "token_embeddings": {0: "batch", 1: "sequence"},
+                },
+                opset_version=17,
+                do_constant_folding=True,
+                dynamo=False,
+            )
+            os.replace(tmp_path, fp32_path)
+
+        if quantize and not os.path.exists(int8_path):
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+
+            logger.info("Quantizing %s to int8", fp32_path)
+            tmp_path = int8_path + ".tmp"
+            quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+            os.replace(tmp_path, int8_path)
+
+    return out_dir
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    LangChain Embeddings on onnxruntime, with the same pooling and
+    normalization as HuggingFaceEmbeddings for the same model.
+    """
+
+    def __init__(self, model_name, model_dir=None, quantize=None, intra_op_threads=None,
+                 inter_op_threads=None, batch_size=None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.quantize = ONNX_QUANTIZE if quantize is None else quantize
+        self.batch_size = batch_size or ONNX_BATCH_SIZE
+        path = export_onnx(model_name, root=model_dir, quantize=self.quantize)
+
+        with open(os.path.join(path, "embedding_config.json")) as f:
+            config = json.load(f)
+        self.max_length = config["max_seq_length"]
+        self.pooling = config["pooling"]
+        self.normalize = config["normalize"]
+        if self.pooling not in ("mean", "cls"):
+            raise ValueError(f"Unsupported pooling mode for ONNX backend: {self.pooling}")
+
+        self.tokenizer = AutoTokenizer.from_pretrained(path)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = ONNX_INTRA_OP_THREADS if intra_op_threads is None else intra_op_threads
+        options.inter_op_num_threads = ONNX_INTER_OP_THREADS if inter_op_threads is None else inter_op_threads
+        model_file = "model.int8.onnx" if self.quantize else "model.onnx"
+        self.session = ort.InferenceSession(
+            os.path.join(path, model_file), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    @property
+    def variant(self):
+        return "onnx-int8" if self.quantize else "onnx"
+
+    def _encode(self, texts):
+        encoded = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np"
+        )
+        feeds = {name: encoded[name].astype(np.int64) for name in self.input_names}
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        if self.pooling == "cls":
+            vectors = token_embeddings[:, 0]
+        else:
+            mask = encoded["attention_mask"][..., None].astype(np.float32)
+            vectors = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        if self.normalize:
+            vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        # Length-sorted batches keep padding (wasted compute) small
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._encode([texts[i] for i in batch])):
+                vectors[i] = vector.tolist()
+        return vectors
+
+    def embed_query(self, text):
+        return self._encode([text])[0].tolist()
+
+
+def create_embeddings(model_name, backend=None, batch_size=None):
+    """Build the configured embeddings backend for `model_name`."""
+    backend = (backend or EMBEDDINGS_BACKEND).lower()
+    if backend == "onnx":
+        return OnnxEmbeddings(model_name, batch_size=batch_size)
+    if backend == "torch":
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        encode_kwargs = {"batch_size": batch_size} if batch_size else {}
+        return HuggingFaceEmbeddings(model_name=model_name, encode_kwargs=encode_kwargs)
+    raise ValueError(f"Unknown EMBEDDINGS_BACKEND: {backend}")
+
+
+def cache_model_name(model_name, embeddings):
+    """Embedding-cache namespace: ONNX / int8 vectors must not mix with PyTorch ones."""
+    variant = getattr(embeddings, "variant", None)
+    return f"{model_name}@{variant}" if variant else model_name
@@ -0,0 +1,255 @@
+# embedding_cache.py
+"""
+Content-addressed cache in front of a LangChain embeddings object.
+
+Vectors are keyed on sha256(model name + namespace + normalized text), so the
+same sentence embedded by the SemanticChunker, by vectorstore.add_texts and by
+compute_embedding_similarity only goes through the transformer once.
+
+Two tiers:
+  - in-process LRU (OrderedDict) for hot vectors
+  - on-disk store: append-only float32 matrix read through np.memmap, plus a
+    key -> row index file. Shared by every worker process on the host.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+def normalize_text(text):
+    """Collapse whitespace so trivially different copies share one key."""
+    return " ".join(text.split())
+
+
+def embedding_key(model_name, text, namespace="doc"):
+    payload = f"{model_name}\x00{namespace}\x00{normalize_text(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LRUVectorCache:
+    """Thread-safe in-process LRU of key -> vector."""
+
+    def __init__(self, max_entries=50000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            vector = self._data.get(key)
+            if vector is not None:
+                self._data.move_to_end(key)
+            return vector
+
+    def put(self, key, vector):
+        with self._lock:
+            self._data[key] = vector
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DiskVectorStore:
+    """
+    Append-only float32 vector file + key index, safe across processes.
+
+    Layout in `path`:
+      meta.json    {"dim": 768}
+      vectors.f32  rows of `dim` float32 values
+      keys.idx     "<key> <row>\\n" per stored vector
+      .lock        flock target for appends
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._meta_path = os.path.join(path, "meta.json")
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._keys_path = os.path.join(path, "keys.idx")
+        self._lock_path = os.path.join(path, ".lock")
+
+        self._lock = threading.Lock()
+        self._index = {}
+        self._keys_offset = 0
+        self._mmap = None
+        self._mmap_rows = 0
+        self.dim = None
+        self._load_dim()
+
+    # --- index maintenance ---
+    def _load_dim(self):
+        """Read dim from meta.json; another process may create the store after we opened it."""
+        if self.dim is None and os.path.exists(self._meta_path):
+            with open(self._meta_path) as f:
+                self.dim = json.load(f)["dim"]
+        return self.dim
+
+    def _refresh_index(self):
+        """Pick up rows appended by other processes since the last read."""
+        # meta.json is written before any key, so a missing dim means nothing is stored yet
+        if self._load_dim() is None or not os.path.exists(self._keys_path):
+            return
+        with open(self._keys_path, "rb") as f:
+            f.seek(self._keys_offset)
+            tail = f.read()
+        # Only consume complete lines; a concurrent writer may be mid-append
+        end = tail.rfind(b"\n") + 1
+        for line in tail[:end].splitlines():
+            key, row = line.decode("ascii").split()
+            self._index[key] = int(row)
+        self._keys_offset += end
+
+    def _matrix(self, min_rows):
+        if self._mmap is None or self._mmap_rows < min_rows:
+            rows = os.path.getsize(self._vectors_path) // (self.dim * 4)
+            self._mmap = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+            self._mmap_rows = rows
+        return self._mmap
+
+    # --- public API ---
+    def get_many(self, keys):
+        """Return {key: vector} for the keys present on disk."""
+        with self._lock:
+            missing = [k for k in keys if k not in self._index]
+            if missing:
+                self._refresh_index()
+            rows = {k: self._index[k] for k in keys if k in self._index}
+            if not rows:
+                return {}
+            matrix = self._matrix(max(rows.values()) + 1)
+            return {k: np.array(matrix[row]) for k, row in rows.items()}
+
+    def put_many(self, items):
+        """Append (key, vector) pairs that are not stored yet."""
+        if not items:
+            return
+        with self._lock, open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._refresh_index()
+                if self._load_dim() is None:
+                    self.dim = len(items[0][1])
+                    tmp = f"{self._meta_path}.{os.getpid()}.tmp"
+                    with open(tmp, "w") as f:
+                        json.dump({"dim": self.dim}, f)
+                    os.replace(tmp, self._meta_path)
+
+                new_items = [(k, v) for k, v in items if k not in self._index]
+                if not new_items:
+                    return
+
+                start_row = (os.path.getsize(self._vectors_path) // (self.dim * 4)
+                             if os.path.exists(self._vectors_path) else 0)
+                block = np.asarray([v for _, v in new_items], dtype=np.float32)
+                with open(self._vectors_path, "ab") as f:
+                    f.write(block.tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                # Keys are written after the vectors so readers never see a row that isn't there yet
+                lines = "".join(f"{k} {start_row + i}\n" for i, (k, _) in enumerate(new_items))
+                with open(self._keys_path, "a") as f:
+                    f.write(lines)
+                self._refresh_index()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def __len__(self):
+        with self._lock:
+            self._refresh_index()
+            return len(self._index)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Drop-in wrapper for any LangChain Embeddings object.
+
+    Usage:
+        embeddings = CachedEmbeddings(HuggingFaceEmbeddings(model_name=name), model_name=name)
+    """
+
+    def __init__(self, base, model_name, cache_dir=None, max_memory_entries=50000):
+        self.base = base
+        self.model_name = model_name
+        self.memory = LRUVectorCache(max_memory_entries)
+        self.disk = None
+        if cache_dir:
+            slug = model_name.replace("/", "__")
+            self.disk = DiskVectorStore(os.path.join(cache_dir, slug))
+
+        self._stats_lock = threading.Lock()
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+    def _lookup(self, texts, namespace, embed_fn):
+        keys = [embedding_key(self.model_name, t, namespace) for t in texts]
+        found = {}
+
+        # 1️⃣ Memory tier
+        for key in set(keys):
+            vector = self.memory.get(key)
+            if vector is not None:
+                found[key] = vector
+        hits_memory = len(found)
+
+        # 2️⃣ Disk tier
+        pending = [k for k in set(keys) if k not in found]
+        hits_disk = 0
+        if pending and self.disk is not None:
+            from_disk = self.disk.get_many(pending)
+            hits_disk = len(from_disk)
+            for key, vector in from_disk.items():
+                vector = vector.tolist()
+                self.memory.put(key, vector)
+                found[key] = vector
+
+        # 3️⃣ Model, once per distinct missing text
+        to_embed = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in to_embed:
+                to_embed[key] = text
+        if to_embed:
+            vectors = embed_fn(list(to_embed.values()))
+            new_items = list(zip(to_embed.keys(), vectors))
+            for key, vector in new_items:
+                vector = [float(x) for x in vector]
+                self.memory.put(key, vector)
+                found[key] = vector
+            if self.disk is not None:
+                self.disk.put_many(new_items)
+
+        with self._stats_lock:
+            self.hits_memory += hits_memory
+            self.hits_disk += hits_disk
+            self.misses += len(to_embed)
+
+        return [found[k] for k in keys]
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        return self._lookup(texts, "doc", self.base.embed_documents)
+
+    def embed_query(self, text):
+        return self._lookup([text], "query", lambda ts: [self.base.embed_query(ts[0])])[0]
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "model_name": self.model_name,
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "memory_entries": len(self.memory),
+                "disk_entries": len(self.disk) if self.disk is not None else 0,
+            }
@@ -0,0 +1,33 @@
+# gunicorn.conf.py
+"""
+    gunicorn -c gunicorn.conf.py app:app
+
+PRELOAD_APP=1 imports the app once in the master. Combined with
+PRELOAD_MODELS=embeddings,whisper the model weights are loaded before fork
+and shared copy-on-write by every worker instead of loaded once per worker.
+"""
+import gc
+import os
+
+import model_loader
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5002")
+workers = int(os.getenv("GUNICORN_WORKERS", 2))
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+preload_app = os.getenv("PRELOAD_APP", "0").lower() in ("1", "true", "yes")
+
+if preload_app:
+    # Don't start torch / OpenMP thread pools in the master; they don't survive fork
+    model_loader.WARMUP_INFERENCE = False
+
+
+def when_ready(server):
+    if preload_app:
+        # Keep preloaded objects out of GC passes so their pages stay shared
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        model_loader.warm_up(model_loader.loaded_models(), inference=True)
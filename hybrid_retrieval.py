@@ -0,0 +1,85 @@
+# hybrid_retrieval.py
+"""
+Run several retrievers in parallel and fuse their rankings with reciprocal
+rank fusion (RRF): score(chunk) = sum over lists of 1 / (RRF_K + rank).
+
+RRF only looks at ranks, so BM25 scores and Chroma distances never have to
+be put on a common scale. A chunk found by both retrievers beats one found by
+either alone; exact-token hits (company names, years) that mpnet misses still
+come through from BM25.
+
+Every stage is timed; callers get {"vector": ms, "bm25": ms, "fusion": ms,
+"retrieval": ms} alongside the fused chunks.
+"""
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+RRF_K = int(os.getenv("RRF_K", 60))
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", 20))  # per retriever, before fusion
+HYBRID_TOP_K = int(os.getenv("HYBRID_TOP_K", 5))
+BM25_ENABLED = os.getenv("BM25_ENABLED", "1").lower() not in ("0", "false", "no")
+
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("HYBRID_WORKERS", 8)), thread_name_prefix="retrieval")
+
+
+def _ms(start):
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+def chunk_key(doc):
+    """Identity of a chunk across retrievers (both return the same text + metadata)."""
+    metadata = doc.metadata or {}
+    owner = metadata.get("doc_key") or "|".join(
+        str(metadata.get(field, "")) for field in ("doc_type", "recruiter_id", "job_id", "file_name", "applicant_id")
+    )
+    return owner, doc.page_content
+
+
+def rrf_fuse(ranked_lists, k=None, rrf_k=None):
+    """Fuse lists of Documents (best first) into one list of at most k."""
+    rrf_k = RRF_K if rrf_k is None else rrf_k
+    scores, docs = {}, {}
+    for ranked in ranked_lists:
+        for rank, doc in enumerate(ranked, start=1):
+            key = chunk_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            docs.setdefault(key, doc)
+    fused = sorted(scores, key=scores.get, reverse=True)
+    return [docs[key] for key in fused[:k or HYBRID_TOP_K]]
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    return fn(), _ms(start)
+
+
+def hybrid_search(retrievers, k=None):
+    """
+    `retrievers` maps a stage name to a zero-argument callable returning a
+    ranked list of Documents. All run concurrently; a failing retriever is
+    logged and contributes nothing (the request fails only if all fail).
+    Returns (fused documents, timings in ms).
+    """
+    start = time.perf_counter()
+    futures = {name: _executor.submit(_timed, fn) for name, fn in retrievers.items()}
+
+    ranked_lists, timings, errors = [], {}, []
+    for name, future in futures.items():
+        try:
+            docs, timings[name] = future.result()
+            ranked_lists.append(docs)
+        except Exception as e:
+            logger.exception("%s retrieval failed", name)
+            errors.append(e)
+    if errors and len(errors) == len(futures):
+        raise errors[0]
+
+    fusion_start = time.perf_counter()
+    fused = rrf_fuse(ranked_lists, k)
+    timings["fusion"] = _ms(fusion_start)
+    timings["retrieval"] = _ms(start)
+    return fused, timings
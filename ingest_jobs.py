@@ -0,0 +1,184 @@
+# ingest_jobs.py
+"""
+Background job queue for /batch_ingest.
+
+The endpoint reads the uploads into memory, registers an ingest job and
+returns immediately; a thread pool does the parsing, chunking and
+embedding. Job state lives in a Redis hash so any worker process can
+answer the status endpoint:
+
+    ingest_job:<ingest_job_id>
+        meta        JSON: recruiter_id, job_id, status, total_files, timestamps, error
+        file:<i>    JSON: file_name, status, chunks, error, duplicate_of
+        heartbeat   time the owning process last confirmed the job is queued / running
+
+The process that accepted a job refreshes its heartbeat every
+INGEST_HEARTBEAT_S until the job ends. A queued / running job whose
+heartbeat is older than INGEST_JOB_STALE_S belonged to a process that
+died or restarted; the status endpoint marks it failed ("orphaned").
+
+Without Redis the state is kept in-process (fine for local testing with a
+single worker).
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 2))
+INGEST_JOB_TTL = int(os.getenv("INGEST_JOB_TTL", 24 * 3600))
+INGEST_HEARTBEAT_S = float(os.getenv("INGEST_HEARTBEAT_S", 15))
+INGEST_JOB_STALE_S = float(os.getenv("INGEST_JOB_STALE_S", 120))
+
+
+class IngestJobQueue:
+    KEY_PREFIX = "ingest_job:"
+
+    def __init__(self, redis_client=None, max_workers=INGEST_WORKERS, ttl=INGEST_JOB_TTL,
+                 heartbeat_s=INGEST_HEARTBEAT_S, stale_s=INGEST_JOB_STALE_S):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.heartbeat_s = heartbeat_s
+        self.stale_s = stale_s
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._local = {}
+        self._lock = threading.Lock()
+        self._active = set()  # jobs submitted here and not finished yet
+        self._heartbeat_thread = None
+
+    # --- storage ---
+    def _key(self, ingest_job_id):
+        return self.KEY_PREFIX + ingest_job_id
+
+    def _hset(self, ingest_job_id, mapping):
+        encoded = {field: json.dumps(value) for field, value in mapping.items()}
+        if self.redis is not None:
+            try:
+                key = self._key(ingest_job_id)
+                pipe = self.redis.pipeline()
+                pipe.hset(key, mapping=encoded)
+                pipe.expire(key, self.ttl)
+                pipe.execute()
+                return
+            except redis.RedisError as e:
+                logger.warning("Ingest job state falling back to local memory: %s", e)
+        with self._lock:
+            self._local.setdefault(ingest_job_id, {}).update(encoded)
+
+    def _hgetall(self, ingest_job_id):
+        raw = None
+        if self.redis is not None:
+            try:
+                raw = self.redis.hgetall(self._key(ingest_job_id))
+                raw = {k.decode("utf-8"): v.decode("utf-8") for k, v in raw.items()}
+            except redis.RedisError as e:
+                logger.warning("Ingest job state unavailable in Redis: %s", e)
+                raw = None
+        if not raw:
+            with self._lock:
+                raw = dict(self._local.get(ingest_job_id, {}))
+        return {field: json.loads(value) for field, value in raw.items()}
+
+    def _update_meta(self, ingest_job_id, **fields):
+        meta = self._hgetall(ingest_job_id).get("meta", {})
+        meta.update(fields)
+        self._hset(ingest_job_id, {"meta": meta})
+
+    # --- heartbeat ---
+    def _beat(self):
+        while True:
+            time.sleep(self.heartbeat_s)
+            with self._lock:
+                active = list(self._active)
+            for ingest_job_id in active:
+                # Its own field: a read-modify-write of meta could undo a status change
+                self._hset(ingest_job_id, {"heartbeat": time.time()})
+
+    def _start_heartbeat(self):
+        with self._lock:
+            if self._heartbeat_thread is None:
+                self._heartbeat_thread = threading.Thread(target=self._beat, name="ingest-heartbeat", daemon=True)
+                self._heartbeat_thread.start()
+
+    # --- public API ---
+    def create(self, recruiter_id, job_id, file_names):
+        ingest_job_id = uuid.uuid4().hex
+        mapping = {
+            "meta": {
+                "ingest_job_id": ingest_job_id,
+                "recruiter_id": recruiter_id,
+                "job_id": job_id,
+                "status": "queued",
+                "total_files": len(file_names),
+                "created_at": time.time(),
+            }
+        }
+        for idx, name in enumerate(file_names):
+            mapping[f"file:{idx}"] = {"file_name": name, "status": "pending", "chunks": 0}
+        mapping["heartbeat"] = mapping["meta"]["created_at"]
+        self._hset(ingest_job_id, mapping)
+        return ingest_job_id
+
+    def update_file(self, ingest_job_id, index, **fields):
+        state = self._hgetall(ingest_job_id).get(f"file:{index}", {})
+        state.update(fields)
+        self._hset(ingest_job_id, {f"file:{index}": state})
+
+    def submit(self, ingest_job_id, fn, *args, **kwargs):
+        """
+        Run fn(*args, progress=callback, **kwargs) on the pool.
+        `callback(index, **fields)` records per-file progress.
+        """
+        def progress(index, **fields):
+            self.update_file(ingest_job_id, index, **fields)
+
+        def run():
+            self._update_meta(ingest_job_id, status="running", started_at=time.time())
+            try:
+                fn(*args, progress=progress, **kwargs)
+                self._update_meta(ingest_job_id, status="completed", finished_at=time.time())
+            except Exception as e:
+                logger.exception("Ingest job %s failed", ingest_job_id)
+                self._update_meta(ingest_job_id, status="failed", error=str(e), finished_at=time.time())
+            finally:
+                with self._lock:
+                    self._active.discard(ingest_job_id)
+
+        with self._lock:
+            self._active.add(ingest_job_id)
+        self._start_heartbeat()
+        return self.executor.submit(run)
+
+    def status(self, ingest_job_id):
+        """Return the job summary with per-file progress, or None if unknown."""
+        state = self._hgetall(ingest_job_id)
+        meta = state.get("meta")
+        if meta is None:
+            return None
+
+        heartbeat = state.get("heartbeat", meta.get("created_at", 0))
+        if meta["status"] in ("queued", "running") and time.time() - heartbeat > self.stale_s:
+            logger.warning("Ingest job %s has no heartbeat since %.0fs, marking it orphaned",
+                           ingest_job_id, time.time() - heartbeat)
+            meta.update(status="failed", error="orphaned: the worker running this job stopped",
+                        finished_at=time.time())
+            self._hset(ingest_job_id, {"meta": meta})
+
+        files = [state[f"file:{idx}"] for idx in range(meta["total_files"]) if f"file:{idx}" in state]
+        done = [f for f in files if f["status"] in ("success", "failed", "skipped")]
+        return {
+            **meta,
+            "completed_files": len(done),
+            "processed_count": sum(1 for f in files if f["status"] == "success"),
+            "failed_count": sum(1 for f in files if f["status"] == "failed"),
+            "skipped_count": sum(1 for f in files if f["status"] == "skipped"),
+            "total_chunks": sum(f.get("chunks", 0) for f in files),
+            "files": files,
+        }
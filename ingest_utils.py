@@ -1,28 +1,357 @@
 # ingest_utils.py
 import pdfplumber
-from langchain_experimental.text_splitter import SemanticChunker
+import pypdfium2 as pdfium
 import re
+import io
+import os
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# --- PDF parsing pool config ---
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", os.cpu_count() or 1))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", 8))
+
+# --- PDF text backend: "auto" (pdfium, pdfplumber for bad pages), "pdfium", "pdfplumber" ---
+PDF_BACKEND = os.getenv("PDF_BACKEND", "auto")
+
+# pdfium is not thread-safe; serialize calls within a process
+_pdfium_lock = threading.Lock()
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+# --- Page text extractors ---
+def _looks_garbled(text):
+    """Empty pages, unmapped glyphs ((cid:NN), U+FFFD) or mostly non-letter output."""
+    stripped = "".join(text.split())
+    if not stripped:
+        return True
+    bad = text.count("\ufffd") + text.count("(cid:")
+    if bad / len(stripped) > 0.02:
+        return True
+    letters = sum(c.isalpha() for c in stripped)
+    return letters / len(stripped) < 0.4
+
+def _extract_pages_pdfplumber(pdf_bytes, start, end, only=None):
+    """Returns (total_pages, {page_index: text}) for pages start..end-1 (or just `only`)."""
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        pages = pdf.pages
+        end = len(pages) if end is None else min(end, len(pages))
+        indexes = only if only is not None else range(start, end)
+        return len(pages), {i: pages[i].extract_text() or "" for i in indexes}
+
+def _extract_pages_pdfium(pdf_bytes, start, end):
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(pdf_bytes)
+        try:
+            total = len(pdf)
+            end = total if end is None else min(end, total)
+            texts = {}
+            for i in range(start, end):
+                page = pdf[i]
+                textpage = page.get_textpage()
+                text = textpage.get_text_range()
+                textpage.close()
+                page.close()
+                texts[i] = text.replace("\r\n", "\n").replace("\r", "\n").strip()
+            return total, texts
+        finally:
+            pdf.close()
+
+def extract_page_texts(pdf_bytes, start=0, end=None, backend=None):
+    """
+    Returns (total_pages, [text of pages start..end-1]) using the configured backend.
+    "auto" runs pdfium first and re-extracts only empty/garbled pages with pdfplumber.
+    """
+    backend = backend or PDF_BACKEND
+    if backend == "pdfplumber":
+        total, texts = _extract_pages_pdfplumber(pdf_bytes, start, end)
+    elif backend == "pdfium":
+        total, texts = _extract_pages_pdfium(pdf_bytes, start, end)
+    elif backend == "auto":
+        total, texts = _extract_pages_pdfium(pdf_bytes, start, end)
+        bad_pages = [i for i, t in texts.items() if _looks_garbled(t)]
+        if bad_pages:
+            texts.update(_extract_pages_pdfplumber(pdf_bytes, start, end, only=bad_pages)[1])
+    else:
+        raise ValueError(f"Unknown PDF backend: {backend}")
+    return total, [texts[i] for i in sorted(texts)]
 
 # --- Read PDF ---
-def read_pdf(pdf_file):
-    text = ""
-    with pdfplumber.open(pdf_file) as pdf:
-        for page in pdf.pages:
-            t = page.extract_text()
-            if t:
-                text += t + "\n"
-    return text.strip()
+def read_pdf(pdf_file, backend=None):
+    if isinstance(pdf_file, (str, os.PathLike)):
+        with open(pdf_file, "rb") as f:
+            pdf_bytes = f.read()
+    else:
+        pdf_bytes = pdf_file.read()
+    return _join_pages(extract_page_texts(pdf_bytes, backend=backend)[1])
+
+def _join_pages(page_texts):
+    """Join per-page texts the way read_pdf always has: non-empty pages, newline separated."""
+    return "".join(t + "\n" for t in page_texts if t).strip()
+
+def _extract_page_range(pdf_bytes, start, end, backend=None):
+    """Worker task: returns (total_pages, [text of pages start..end-1])."""
+    return extract_page_texts(pdf_bytes, start, end, backend=backend)
+
+def _get_pdf_pool(max_workers):
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            # forkserver: children start from a clean process instead of forking the
+            # Flask worker with its model weights and running threads
+            ctx = multiprocessing.get_context("forkserver")
+            ctx.set_forkserver_preload(["ingest_utils"])
+            _pdf_pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=ctx)
+            atexit.register(_pdf_pool.shutdown, wait=False, cancel_futures=True)
+        return _pdf_pool
+
+def _reset_pdf_pool():
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is not None:
+            _pdf_pool.shutdown(wait=False, cancel_futures=True)
+        _pdf_pool = None
+
+def read_pdfs(pdf_sources, max_workers=None, pages_per_task=None, return_exceptions=False, backend=None):
+    """
+    Parse many PDFs in parallel on a process pool.
+
+    Each PDF is split into page ranges of `pages_per_task` so large documents
+    are spread across workers too. Returns one text per source, in input order,
+    identical to read_pdf with the same backend. With return_exceptions=True a PDF that fails to
+    parse yields its exception instead of aborting the whole batch.
+    """
+    blobs = [src if isinstance(src, bytes) else src.read() for src in pdf_sources]
+    workers = max_workers or PDF_WORKERS
+    per_task = pages_per_task or PDF_PAGES_PER_TASK
+
+    if workers <= 1 or not blobs:
+        results = []
+        for data in blobs:
+            try:
+                results.append(read_pdf(io.BytesIO(data), backend=backend))
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+        return results
+
+    pool = _get_pdf_pool(workers)
+    try:
+        # Phase 1: first page range of every file (also tells us the page count)
+        first = [pool.submit(_extract_page_range, data, 0, per_task, backend) for data in blobs]
+        pages = [None] * len(blobs)
+        rest = []
+        for i, future in enumerate(first):
+            try:
+                total, texts = future.result()
+            except BrokenProcessPool:
+                raise
+            except Exception as e:
+                pages[i] = e
+                continue
+            pages[i] = [texts]
+            # Phase 2: remaining ranges of large files
+            for start in range(per_task, total, per_task):
+                rest.append((i, pool.submit(_extract_page_range, blobs[i], start, start + per_task, backend)))
+
+        for i, future in rest:
+            if isinstance(pages[i], Exception):
+                continue
+            try:
+                pages[i].append(future.result()[1])
+            except BrokenProcessPool:
+                raise
+            except Exception as e:
+                pages[i] = e
+    except BrokenProcessPool:
+        _reset_pdf_pool()
+        raise
+
+    results = []
+    for item in pages:
+        if isinstance(item, Exception):
+            if not return_exceptions:
+                raise item
+            results.append(item)
+        else:
+            results.append(_join_pages([t for block in item for t in block]))
+    return results
+
+# --- Chunking config ---
+# "sections" (heading-aware, no embeddings), "tokens" (fixed word windows), "semantic" (SemanticChunker).
+# The default used to be semantic; set CHUNK_STRATEGY=semantic to keep the old chunk boundaries.
+CHUNK_STRATEGY = os.getenv("CHUNK_STRATEGY", "sections")
+CHUNK_MAX_WORDS = int(os.getenv("CHUNK_MAX_WORDS", 200))  # stays under mpnet's 384 word-piece limit
+CHUNK_OVERLAP_WORDS = int(os.getenv("CHUNK_OVERLAP_WORDS", 30))
+CHUNK_MIN_WORDS = int(os.getenv("CHUNK_MIN_WORDS", 40))
+
+# Top-level resume / JD headings (matched case-insensitively, trailing ":" ignored)
+SECTION_HEADINGS = {
+    "summary", "professional summary", "profile", "objective", "about me",
+    "experience", "work experience", "professional experience", "employment history",
+    "education", "certifications", "certification", "education & certification",
+    "education and certifications", "skills", "technical skills", "technical expertise",
+    "core competencies", "projects", "key projects", "achievements", "awards", "languages",
+    "requirements", "qualifications", "preferred qualifications", "key responsibilities",
+    "about the role", "about us", "what you'll do", "what we offer", "benefits", "nice to have",
+}
+
+_semantic_chunkers = {}
+
+def _semantic_chunker(embeddings):
+    """One SemanticChunker per embeddings object instead of one per call."""
+    entry = _semantic_chunkers.get(id(embeddings))
+    if entry is None or entry[0] is not embeddings:
+        # Imported here: only the "semantic" strategy needs langchain_experimental
+        from langchain_experimental.text_splitter import SemanticChunker
+        entry = (embeddings, SemanticChunker(
+            embeddings=embeddings,
+            breakpoint_threshold_type="percentile",
+            breakpoint_threshold_amount=90
+        ))
+        _semantic_chunkers[id(embeddings)] = entry
+    return entry[1]
+
+def _is_heading(line):
+    stripped = line.strip()
+    if not stripped or len(stripped) > 60 or len(stripped.split()) > 6:
+        return False
+    if stripped.rstrip(":").strip().lower() in SECTION_HEADINGS:
+        return True
+    letters = [c for c in stripped if c.isalpha()]
+    return len(letters) >= 3 and all(c.isupper() for c in letters)
+
+def _window_lines(lines, max_words, overlap_words):
+    """
+    Pack (text, is_heading) lines into chunks of at most max_words. Each
+    continuation chunk starts with the most recent heading plus ~overlap_words
+    of trailing context. Over-long single lines are split on words.
+    """
+    pieces = []
+    for text, is_heading in lines:
+        words = text.split()
+        for start in range(0, max(len(words), 1), max_words):
+            pieces.append((" ".join(words[start:start + max_words]), is_heading))
+
+    chunks = []
+    current = []
+    current_words = 0
+    heading = None
+    for text, is_heading in pieces:
+        n = len(text.split())
+        if current_words + n > max_words and current:
+            chunks.append("\n".join(current))
+            overlap = []
+            overlap_count = 0
+            for prev in reversed(current):
+                overlap_count += len(prev.split())
+                if overlap_count > overlap_words or prev == heading:
+                    break
+                overlap.insert(0, prev)
+            current = ([heading] if heading and not is_heading else []) + overlap
+            current_words = sum(len(p.split()) for p in current)
+        if is_heading:
+            heading = text
+        current.append(text)
+        current_words += n
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+def split_sections(text, max_words=None, overlap_words=None, min_words=None):
+    """
+    Heading-aware splitter for resumes and JDs. Lines such as "WORK EXPERIENCE:"
+    or "Education" start a new section; sections below min_words are merged
+    into the next one; long sections are windowed on line boundaries.
+    """
+    max_words = max_words or CHUNK_MAX_WORDS
+    overlap_words = CHUNK_OVERLAP_WORDS if overlap_words is None else overlap_words
+    min_words = CHUNK_MIN_WORDS if min_words is None else min_words
+
+    sections = [[]]
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        is_heading = _is_heading(line)
+        if is_heading and sections[-1]:
+            sections.append([])
+        sections[-1].append((line.strip(), is_heading))
+
+    # Merge tiny sections (contact header, one-line headings) into the following one
+    merged = []
+    pending = []
+    for lines in sections:
+        lines = pending + lines
+        if sum(len(t.split()) for t, _ in lines) < min_words:
+            pending = lines
+            continue
+        merged.append(lines)
+        pending = []
+    if pending:
+        if merged:
+            merged[-1].extend(pending)
+        else:
+            merged.append(pending)
+
+    chunks = []
+    for lines in merged:
+        if lines:
+            chunks.extend(_window_lines(lines, max_words, overlap_words))
+    return chunks
+
+def split_token_windows(text, max_words=None, overlap_words=None):
+    """Fixed-size word windows with overlap; ignores document structure."""
+    max_words = max_words or CHUNK_MAX_WORDS
+    overlap_words = CHUNK_OVERLAP_WORDS if overlap_words is None else overlap_words
+    words = text.split()
+    step = max(max_words - overlap_words, 1)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + max_words]))
+        if start + max_words >= len(words):
+            break
+    return chunks
 
 # --- Chunk text ---
-def chunk_text(text, embeddings):
-    chunker = SemanticChunker(
-        embeddings=embeddings,
-        breakpoint_threshold_type="percentile",
-        breakpoint_threshold_amount=90
-    )
-    return chunker.split_text(text)
+def chunk_text(text, embeddings, strategy=None):
+    strategy = strategy or CHUNK_STRATEGY
+    if strategy == "sections":
+        return split_sections(text)
+    if strategy == "tokens":
+        return split_token_windows(text)
+    if strategy == "semantic":
+        return _semantic_chunker(embeddings).split_text(text)
+    raise ValueError(f"Unknown chunking strategy: {strategy}")
+
+# --- Detect resume / JD section of a chunk ---
+def detect_section(chunk):
+    chunk_lower = chunk.lower()
+    if "experience" in chunk_lower or "responsibilities" in chunk_lower:
+        return "experience"
+    elif "education" in chunk_lower or "certification" in chunk_lower:
+        return "education"
+    elif "technical" in chunk_lower or "expertise" in chunk_lower or "skills" in chunk_lower:
+        return "skills"
+    elif "summary" in chunk_lower:
+        return "summary"
+    return "general"
 
 # --- Extract metadata ---
+def year_metadata(chunk):
+    """
+    Years mentioned in a chunk: the `years` summary string plus one boolean
+    `year_YYYY` flag per year, so a year can be a Chroma `where` filter.
+    """
+    years = sorted(set(re.findall(r'\b(19\d{2}|20\d{2})\b', chunk)))
+    if not years:
+        return {}
+    return {"years": ",".join(years), **{f"year_{year}": True for year in years}}
+
 def extract_metadata(chunk, idx, doc_type, recruiter_id, applicant_id=None, job_id=None):
     metadata = {
         "chunk_id": idx,
@@ -30,11 +359,10 @@ def extract_metadata(chunk, idx, doc_type, recruiter_id, applicant_id=None, job_
         "recruiter_id": recruiter_id,
         "applicant_id": applicant_id,
         "job_id": job_id,
-        "chunk_length": len(chunk)
+        "chunk_length": len(chunk),
+        "section": detect_section(chunk)
     }
     # Optional: extract years
-    years = re.findall(r'\b(19\d{2}|20\d{2})\b', chunk)
-    if years:
-        metadata["years"] = ",".join(sorted(set(years)))
-    
+    metadata.update(year_metadata(chunk))
+
     return metadata
\ No newline at end of file
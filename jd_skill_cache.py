@@ -0,0 +1,65 @@
+# jd_skill_cache.py
+"""
+Per-job cache of the LLM-extracted JD skill list.
+
+The "extract required_skills" prompt only depends on the JD, so it is run
+once per (recruiter_id, job_id, JD content hash) and shared by
+/evaluate_resume, /evaluate_batch_summary and /get_resume_skill_details.
+Re-ingesting a JD drops every cached entry for that job.
+"""
+import hashlib
+import json
+import logging
+import os
+
+import redis
+
+from matching_skill_extraction import extract_jd_skills
+
+logger = logging.getLogger(__name__)
+
+JD_SKILLS_TTL = int(os.getenv("JD_SKILLS_TTL", 7 * 24 * 3600))
+
+
+class JDSkillCache:
+    def __init__(self, redis_client, ttl=JD_SKILLS_TTL):
+        self.redis = redis_client
+        self.ttl = ttl
+
+    @staticmethod
+    def _prefix(recruiter_id, job_id):
+        return f"jd_skills:{str(recruiter_id).lower()}:{str(job_id).lower()}:"
+
+    def key(self, recruiter_id, job_id, jd_text):
+        jd_hash = hashlib.sha256(jd_text.encode("utf-8")).hexdigest()
+        return self._prefix(recruiter_id, job_id) + jd_hash
+
+    def get_or_extract(self, recruiter_id, job_id, jd_text):
+        """Return the JD's required skills, running the LLM only on a cache miss."""
+        key = self.key(recruiter_id, job_id, jd_text)
+        try:
+            cached = self.redis.get(key)
+            if cached is not None:
+                return json.loads(cached)
+        except redis.RedisError as e:
+            logger.warning("JD skill cache unavailable, extracting directly: %s", e)
+            return extract_jd_skills(jd_text)
+
+        skills = extract_jd_skills(jd_text)
+
+        # An empty list usually means the LLM call failed; don't pin that for a week
+        if skills:
+            try:
+                self.redis.set(key, json.dumps(skills), ex=self.ttl)
+            except redis.RedisError as e:
+                logger.warning("Failed to cache JD skills for %s: %s", key, e)
+        return skills
+
+    def invalidate(self, recruiter_id, job_id):
+        """Drop cached skills for every JD version of this job."""
+        try:
+            keys = list(self.redis.scan_iter(match=self._prefix(recruiter_id, job_id) + "*"))
+            if keys:
+                self.redis.delete(*keys)
+        except redis.RedisError as e:
+            logger.warning("Failed to invalidate JD skills for %s/%s: %s", recruiter_id, job_id, e)
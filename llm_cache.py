@@ -0,0 +1,135 @@
+# llm_cache.py
+"""
+Response cache for non-streaming Ollama calls.
+
+Prompts in this app are fixed templates at low temperature, so an identical
+(model, prompt, options) request gets a reusable answer. Entries live in
+Redis (shared by all workers) with a TTL and a size cap; when Redis is
+unreachable the cache falls back to a bounded in-process dict.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 24 * 3600))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 10000))
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+
+# After a Redis failure, serve from the local dict for this long before retrying
+REDIS_RETRY_AFTER = 30
+
+
+class LLMResponseCache:
+    KEY_PREFIX = "llm_cache:"
+    INDEX_KEY = "llm_cache:index"  # sorted set of keys by insert time, for size-bounded eviction
+
+    def __init__(self, redis_client=None, ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self._local = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._redis_down_until = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @classmethod
+    def key(cls, model, prompt, options=None):
+        payload = json.dumps({"model": model, "prompt": prompt, "options": options or {}}, sort_keys=True)
+        return cls.KEY_PREFIX + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    # --- backends ---
+    def _redis_available(self):
+        return self.redis is not None and time.monotonic() >= self._redis_down_until
+
+    def _redis_failed(self, e):
+        logger.warning("LLM cache falling back to local memory: %s", e)
+        with self._lock:
+            self.errors += 1
+            self._redis_down_until = time.monotonic() + REDIS_RETRY_AFTER
+
+    def _local_get(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return value
+
+    def _local_set(self, key, value):
+        with self._lock:
+            self._local[key] = (time.monotonic() + self.ttl, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    # --- public API ---
+    def get(self, key):
+        value = None
+        if self._redis_available():
+            try:
+                raw = self.redis.get(key)
+                value = raw.decode("utf-8") if raw is not None else None
+            except redis.RedisError as e:
+                self._redis_failed(e)
+                value = self._local_get(key)
+        else:
+            value = self._local_get(key)
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        if self._redis_available():
+            try:
+                pipe = self.redis.pipeline()
+                pipe.set(key, value, ex=self.ttl)
+                pipe.zadd(self.INDEX_KEY, {key: time.time()})
+                pipe.zcard(self.INDEX_KEY)
+                size = pipe.execute()[-1]
+                overflow = size - self.max_entries
+                if overflow > 0:
+                    evicted = [k for k, _ in self.redis.zpopmin(self.INDEX_KEY, overflow)]
+                    if evicted:
+                        self.redis.delete(*evicted)
+                return
+            except redis.RedisError as e:
+                self._redis_failed(e)
+        self._local_set(key, value)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "enabled": LLM_CACHE_ENABLED,
+                "backend": "redis" if self._redis_available() else "local",
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "redis_errors": self.errors,
+                "local_entries": len(self._local),
+            }
+
+
+llm_cache = LLMResponseCache(
+    redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"), socket_connect_timeout=0.5)
+)
@@ -0,0 +1,286 @@
+# llm_client.py
+"""
+Shared Ollama client for every module that talks to the LLM.
+
+- one pooled requests.Session (keep-alive, no TCP handshake per call)
+- httpx.AsyncClient for async callers, one per event loop, closed when the loop shuts down
+  (agenerate / agenerate_stream are library API: the Flask app and the voice
+  stream worker threads use the sync generate / generate_stream)
+- retries with exponential backoff + full jitter on connection errors / 429 / 5xx
+- per-host semaphore so no process sends more than Ollama has parallel slots for
+
+`query_ollama` lives here (not in app.py) so matching_skill_extraction and
+ats_evaluate_utills can import it without importing the Flask app.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from llm_cache import llm_cache, LLM_CACHE_ENABLED
+
+logger = logging.getLogger(__name__)
+
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3:8b")
+LLM_HOST_CONCURRENCY = int(os.getenv("LLM_HOST_CONCURRENCY", os.getenv("OLLAMA_NUM_PARALLEL", 4)))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", 0.5))
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", 16))
+
+RETRY_STATUS = {429, 502, 503, 504}
+
+DEFAULT_OPTIONS = {"temperature": 0.1, "top_p": 0.9, "num_predict": 300}
+
+
+class RetryableStatus(Exception):
+    pass
+
+
+def _backoff(attempt):
+    """Full jitter: sleep a random amount up to base * 2^attempt."""
+    return random.uniform(0, LLM_RETRY_BASE_DELAY * (2 ** attempt))
+
+
+class OllamaClient:
+    def __init__(self, url=OLLAMA_URL, model=OLLAMA_MODEL, host_concurrency=LLM_HOST_CONCURRENCY,
+                 max_retries=LLM_MAX_RETRIES, pool_size=LLM_POOL_SIZE):
+        self.url = url
+        self.model = model
+        self.host_concurrency = host_concurrency
+        self.max_retries = max_retries
+        self.pool_size = pool_size
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._host_slots = {}
+        self._slots_lock = threading.Lock()
+        # event loop -> (httpx.AsyncClient, {host: asyncio.Semaphore}, closer task).
+        # A plain dict: the closer task references its loop, so weak keys would never
+        # expire. Entries go when the closer runs at loop shutdown, or in the
+        # closed-loop sweep in _async_state for loops closed without that shutdown.
+        self._async_clients = {}
+
+    # --- helpers ---
+    def _payload(self, prompt, model, options, stream):
+        return {
+            "model": model or self.model,
+            "prompt": prompt,
+            "stream": stream,
+            "options": {**DEFAULT_OPTIONS, **(options or {})},
+        }
+
+    @contextmanager
+    def _host_slot(self, url):
+        host = urlparse(url).netloc
+        with self._slots_lock:
+            slot = self._host_slots.setdefault(host, threading.BoundedSemaphore(self.host_concurrency))
+        with slot:
+            yield
+
+    def _post(self, url, payload, timeout, stream=False):
+        """POST with retries; returns an open requests.Response."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(url, json=payload, timeout=timeout, stream=stream)
+                if response.status_code in RETRY_STATUS:
+                    response.close()
+                    raise RetryableStatus(f"Ollama returned {response.status_code}")
+                response.raise_for_status()
+                return response
+            except (requests.ConnectionError, RetryableStatus) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = _backoff(attempt)
+                logger.warning("Ollama call failed (%s), retry %d in %.2fs", e, attempt + 1, delay)
+                time.sleep(delay)
+
+    # --- sync API ---
+    def generate(self, prompt, model=None, options=None, timeout=40, url=None):
+        """Non-streaming generate; returns the response text."""
+        url = url or self.url
+        payload = self._payload(prompt, model, options, stream=False)
+        with self._host_slot(url):
+            response = self._post(url, payload, timeout)
+            return response.json().get("response", "")
+
+    def generate_stream(self, prompt, model=None, options=None, timeout=30, url=None):
+        """Yield tokens as Ollama produces them. Holds a host slot until the stream ends."""
+        url = url or self.url
+        payload = self._payload(prompt, model, options, stream=True)
+        with self._host_slot(url):
+            response = self._post(url, payload, timeout, stream=True)
+            with response:
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    try:
+                        chunk_data = json.loads(line.decode("utf-8"))
+                    except json.JSONDecodeError:
+                        continue
+                    token = chunk_data.get("response", "")
+                    if token:
+                        yield token
+                    if chunk_data.get("done"):
+                        break
+
+    # --- async API ---
+    def _async_state(self):
+        loop = asyncio.get_running_loop()
+        state = self._async_clients.get(loop)
+        if state is None:
+            # Loops closed without a shutdown that cancels their tasks: release their entry
+            for closed in [other for other in list(self._async_clients) if other.is_closed()]:
+                self._async_clients.pop(closed, None)
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+            )
+            state = (client, {}, loop.create_task(self._close_on_shutdown(loop, client)))
+            self._async_clients[loop] = state
+        return state
+
+    async def _close_on_shutdown(self, loop, client):
+        """Parked until the loop shuts down (asyncio.run cancels pending tasks), then closes the client."""
+        try:
+            await asyncio.Event().wait()
+        finally:
+            self._async_clients.pop(loop, None)
+            # Not when the sweep drops a closed loop's task: nothing can await there
+            if not loop.is_closed():
+                await client.aclose()
+
+    def _async_slot(self, url):
+        client, slots, _ = self._async_state()
+        return client, slots.setdefault(urlparse(url).netloc, asyncio.Semaphore(self.host_concurrency))
+
+    def _async_retry_delay(self, error, attempt):
+        """Backoff before the next attempt, or None if `error` should propagate."""
+        # A read timeout means Ollama is busy generating; retrying only adds load
+        read_timeout = isinstance(error, httpx.TimeoutException) and not isinstance(error, httpx.ConnectTimeout)
+        if attempt == self.max_retries or read_timeout:
+            return None
+        delay = _backoff(attempt)
+        logger.warning("Ollama call failed (%s), retry %d in %.2fs", error, attempt + 1, delay)
+        return delay
+
+    async def agenerate(self, prompt, model=None, options=None, timeout=40, url=None):
+        """Async non-streaming generate; returns the response text."""
+        url = url or self.url
+        payload = self._payload(prompt, model, options, stream=False)
+        client, slot = self._async_slot(url)
+
+        async with slot:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = await client.post(url, json=payload, timeout=timeout)
+                    if response.status_code in RETRY_STATUS:
+                        raise RetryableStatus(f"Ollama returned {response.status_code}")
+                    response.raise_for_status()
+                    return response.json().get("response", "")
+                except (httpx.TransportError, RetryableStatus) as e:
+                    delay = self._async_retry_delay(e, attempt)
+                    if delay is None:
+                        raise
+                    await asyncio.sleep(delay)
+
+    async def agenerate_stream(self, prompt, model=None, options=None, timeout=30, url=None):
+        """Async token stream. Failures before the first token are retried like agenerate."""
+        url = url or self.url
+        payload = self._payload(prompt, model, options, stream=True)
+        client, slot = self._async_slot(url)
+
+        async with slot:
+            streamed = False
+            for attempt in range(self.max_retries + 1):
+                try:
+                    async with client.stream("POST", url, json=payload, timeout=timeout) as response:
+                        if response.status_code in RETRY_STATUS:
+                            raise RetryableStatus(f"Ollama returned {response.status_code}")
+                        response.raise_for_status()
+                        async for line in response.aiter_lines():
+                            if not line:
+                                continue
+                            try:
+                                chunk_data = json.loads(line)
+                            except json.JSONDecodeError:
+                                continue
+                            token = chunk_data.get("response", "")
+                            if token:
+                                streamed = True
+                                yield token
+                            if chunk_data.get("done"):
+                                break
+                    return
+                except (httpx.TransportError, RetryableStatus) as e:
+                    # Tokens already sent can't be taken back: only retry a stream that never started
+                    delay = None if streamed else self._async_retry_delay(e, attempt)
+                    if delay is None:
+                        raise
+                    await asyncio.sleep(delay)
+
+
+llm_client = OllamaClient()
+
+
+def query_ollama(prompt, ollama_url=None):
+    """
+    Queries Ollama for LLM evaluation and ensures a JSON dict is always returned.
+    """
+
+    instruction = (
+        "You are a resume evaluator. Analyze the resume against the job description "
+        "and return the result strictly as a JSON object with the following fields:\n"
+        " - llm_score (integer 0-100)\n"
+        " - matched_skills (list of strings)\n"
+        " - missing_skills (list of strings)\n\n"
+        "Do not include any text outside the JSON."
+    )
+
+    full_prompt = f"{instruction}\n\n{prompt}"
+    cache_key = llm_cache.key(llm_client.model, full_prompt, DEFAULT_OPTIONS)
+
+    try:
+        output = llm_cache.get(cache_key) if LLM_CACHE_ENABLED else None
+
+        if output is None:
+            output = llm_client.generate(full_prompt, options=DEFAULT_OPTIONS, timeout=40, url=ollama_url)
+            if output and LLM_CACHE_ENABLED:
+                llm_cache.set(cache_key, output)
+
+        # Try strict JSON parsing first
+        try:
+            parsed = json.loads(output)
+            return parsed
+        except json.JSONDecodeError:
+            pass
+
+        # Fallback: extract score using regex if not JSON
+        score_match = re.search(r"(\d{1,3})\s*%", output)
+        llm_score = int(score_match.group(1)) if score_match else 0
+
+        return {
+            "llm_score": llm_score,
+            "matched_skills": [],
+            "missing_skills": []
+        }
+
+    except Exception as e:
+        logger.warning("query_ollama failed: %s", e)
+        return {
+            "llm_score": 0,
+            "matched_skills": [],
+            "missing_skills": []
+        }
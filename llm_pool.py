@@ -0,0 +1,39 @@
+# llm_pool.py
+"""
+Bounded fan-out for blocking LLM calls.
+
+Ollama only decodes OLLAMA_NUM_PARALLEL requests at once per model; sending
+more just queues them server-side and burns client timeouts. The pool size
+defaults to the same setting so the client never oversubscribes the server.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+LLM_MAX_WORKERS = int(os.getenv("LLM_MAX_WORKERS", os.getenv("OLLAMA_NUM_PARALLEL", 4)))
+
+
+def map_bounded(fn, items, max_workers=None):
+    """
+    Run fn(item) for every item on a thread pool of at most `max_workers`.
+
+    Returns a list of (result, error) tuples in input order. A failing item
+    gets (None, "<error message>") and does not abort the rest of the batch.
+    """
+    items = list(items)
+    if not items:
+        return []
+    workers = max(1, min(max_workers or LLM_MAX_WORKERS, len(items)))
+
+    def call(item):
+        try:
+            return fn(item), None
+        except Exception as e:
+            logger.exception("LLM call failed")
+            return None, str(e)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm") as pool:
+        # executor.map preserves input order
+        return list(pool.map(call, items))
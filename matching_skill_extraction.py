@@ -1,11 +1,14 @@
-def extract_and_compare_skills(resume_text: str, jd_text: str):
+from llm_client import query_ollama
+from context_packer import pack_document, EVAL_JD_TOKENS, EVAL_RESUME_TOKENS
+
+
+def extract_jd_skills(jd_text: str):
     """
-    Uses LLM to extract skills from JD only, then checks resume.
-    Two-step process to prevent hallucination.
+    Uses LLM to extract the required skills written in the JD.
+    The result only depends on the JD, so callers cache it per job (see jd_skill_cache.py).
+    The JD is packed to EVAL_JD_TOKENS so the prompt size is bounded.
     """
-    from app import query_ollama
-    
-    # ✅ STEP 1: Extract skills from JD ONLY
+    jd_text = pack_document(jd_text, EVAL_JD_TOKENS)["text"]
     jd_extraction_prompt = f"""
     Extract ONLY the technical skills and requirements explicitly mentioned in this Job Description.
     
@@ -25,17 +28,32 @@ def extract_and_compare_skills(resume_text: str, jd_text: str):
     """
     
     jd_skills_response = query_ollama(jd_extraction_prompt)
-    jd_required_skills = jd_skills_response.get("required_skills", [])
+    return jd_skills_response.get("required_skills", [])
+
+
+def extract_and_compare_skills(resume_text: str, jd_text: str, jd_required_skills=None):
+    """
+    Uses LLM to extract skills from JD only, then checks resume.
+    Two-step process to prevent hallucination.
+    Pass jd_required_skills (e.g. from JDSkillCache) to skip step 1.
+    The resume is packed to EVAL_RESUME_TOKENS, lines naming a required
+    skill first; the packed size is returned as context_tokens.
+    """
+    # ✅ STEP 1: Extract skills from JD ONLY
+    if jd_required_skills is None:
+        jd_required_skills = extract_jd_skills(jd_text)
     
     if not jd_required_skills:
         return {
             "llm_score": 0,
             "keyword_score": 0,
             "matched_skills": [],
-            "missing_skills": []
+            "missing_skills": [],
+            "context_tokens": 0
         }
     
     # ✅ STEP 2: Check which JD skills are in resume
+    resume = pack_document(resume_text, EVAL_RESUME_TOKENS, terms=jd_required_skills)
     comparison_prompt = f"""
     You have a list of required skills from a Job Description.
     Check which of these skills are mentioned in the Resume.
@@ -56,7 +74,7 @@ def extract_and_compare_skills(resume_text: str, jd_text: str):
     - Check for synonyms (e.g., "Postgres" matches "PostgreSQL")
     
     RESUME:
-    {resume_text}
+    {resume["text"]}
     """
     
     comparison_response = query_ollama(comparison_prompt)
@@ -78,6 +96,8 @@ def extract_and_compare_skills(resume_text: str, jd_text: str):
         "keyword_score": keyword_score,
         "matched_skills": matched_skills,
         "missing_skills": missing_clean,
+        "context_tokens": resume["tokens"],
+        "resume_truncated": resume["truncated"],
     }
 
 def extract_and_compare_skills_with_flag(resume_text: str, jd_text: str, only_llm: bool = False):
@@ -87,9 +107,7 @@ def extract_and_compare_skills_with_flag(resume_text: str, jd_text: str, only_ll
     If only_llm=True, skips keyword/skill extraction for speed.
     """
 
-    from app import query_ollama
-
-    # LLM prompt for structured skill evaluation
+    # LLM prompt for structured skill evaluation (both documents packed to their token budgets)
     prompt = f"""
     You are an expert resume evaluator.
     Extract skills from the Job Description (JD) and Resume, then compare them.
@@ -103,10 +121,10 @@ def extract_and_compare_skills_with_flag(resume_text: str, jd_text: str, only_ll
     }}
 
     JOB DESCRIPTION:
-    {jd_text}
+    {pack_document(jd_text, EVAL_JD_TOKENS)["text"]}
 
     RESUME:
-    {resume_text}
+    {pack_document(resume_text, EVAL_RESUME_TOKENS)["text"]}
     """
 
     llm_response = query_ollama(prompt)
@@ -0,0 +1,117 @@
+# migrate_shards.py
+"""
+Re-home existing chunks into the shards of CHROMA_SHARD_MODE (collection_router.py).
+
+    CHROMA_SHARD_MODE=job python migrate_shards.py --dry-run          # chunks per target shard
+    CHROMA_SHARD_MODE=job python migrate_shards.py                    # copy resume_v2 -> per-job shards
+    CHROMA_SHARD_MODE=job python migrate_shards.py --delete-source    # ... and remove them from resume_v2
+    CHROMA_SHARD_MODE=job python migrate_shards.py --source resume_v2__<recruiter shard>
+
+The source collection is read page by page together with its stored
+embeddings and upserted into the target shard under the same ids, so nothing
+is re-embedded and an interrupted run can simply be repeated. Source chunks
+are only deleted (with --delete-source) after every page has been copied.
+Chunk metadata is unchanged, and the Redis doc-hash index is keyed by
+recruiter / job, so it stays valid.
+"""
+import argparse
+import json
+import logging
+import os
+from collections import defaultdict
+
+from collection_router import BASE_COLLECTION, CollectionRouter
+
+logger = logging.getLogger(__name__)
+
+MIGRATE_PAGE_SIZE = int(os.getenv("MIGRATE_PAGE_SIZE", 1000))
+
+
+def _max_batch(collection):
+    try:
+        return collection._client.get_max_batch_size()
+    except Exception:
+        return 5000
+
+
+def _upsert(collection, ids, documents, metadatas, embeddings):
+    max_batch = _max_batch(collection)
+    for start in range(0, len(ids), max_batch):
+        end = start + max_batch
+        collection.upsert(
+            ids=ids[start:end],
+            documents=documents[start:end],
+            metadatas=metadatas[start:end],
+            embeddings=embeddings[start:end],
+        )
+
+
+def migrate(router, source=BASE_COLLECTION, page_size=MIGRATE_PAGE_SIZE, dry_run=False, delete_source=False):
+    """Copy every chunk of `source` into its shard. Returns per-shard counts."""
+    source_collection = router.client.get_collection(source)
+    counts = defaultdict(int)
+    moved_ids = []
+    skipped = 0
+    offset = 0
+
+    while True:
+        page = source_collection.get(
+            include=["documents", "metadatas", "embeddings"], limit=page_size, offset=offset
+        )
+        if not page["ids"]:
+            break
+        offset += len(page["ids"])
+
+        groups = defaultdict(lambda: ([], [], [], []))  # (recruiter_id, job_id) -> ids, docs, metas, vectors
+        for row in zip(page["ids"], page["documents"], page["metadatas"], page["embeddings"]):
+            meta = row[2] or {}
+            recruiter_id, job_id = meta.get("recruiter_id"), meta.get("job_id")
+            if not recruiter_id or (router.mode == "job" and not job_id):
+                skipped += 1  # no tenant to route by; left in the source
+                continue
+            group = groups[(recruiter_id, job_id if router.mode == "job" else None)]
+            for column, value in zip(group, row):
+                column.append(value)
+
+        for (recruiter_id, job_id), (ids, documents, metadatas, vectors) in groups.items():
+            name = router.shard_name(recruiter_id, job_id)
+            if name == source:
+                continue
+            counts[name] += len(ids)
+            if dry_run:
+                continue
+            _upsert(router.collection(recruiter_id, job_id), ids, documents, metadatas, vectors)
+            moved_ids.extend(ids)
+        logger.info("Copied %d chunks from %s", offset, source)
+
+    if delete_source and moved_ids:
+        max_batch = _max_batch(source_collection)
+        for start in range(0, len(moved_ids), max_batch):
+            source_collection.delete(ids=moved_ids[start:start + max_batch])
+
+    return {
+        "mode": router.mode,
+        "source": source,
+        "dry_run": dry_run,
+        "chunks": sum(counts.values()),
+        "skipped": skipped,
+        "deleted_from_source": len(moved_ids) if delete_source else 0,
+        "shards": dict(counts),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--persist-directory", default="chroma_db")
+    parser.add_argument("--source", default=BASE_COLLECTION)
+    parser.add_argument("--page-size", type=int, default=MIGRATE_PAGE_SIZE)
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--delete-source", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    router = CollectionRouter(persist_directory=args.persist_directory)
+    if router.mode == "none" and args.source == router.base:
+        parser.error("CHROMA_SHARD_MODE is 'none': set it to 'recruiter' or 'job' to migrate")
+    result = migrate(router, args.source, args.page_size, args.dry_run, args.delete_source)
+    print(json.dumps(result, indent=2))
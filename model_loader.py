@@ -0,0 +1,194 @@
+# model_loader.py
+"""
+Lazy model loading.
+
+Importing the app no longer loads mpnet, Whisper, torch or transformers.
+Heavy objects are registered here as factories and built on first use:
+
+    get_embeddings()    cached mpnet embeddings (see embedding_backends / embedding_cache)
+    get_whisper()       transformers ASR pipeline
+    (or clients for model_server.py when MODEL_SERVER_URL is set)
+    get(name)           anything registered with register(name, factory)
+
+`LazyProxy(name)` / `LazyEmbeddings()` stand in for the real object at module
+level, so the endpoints use `shards = LazyProxy("resume_shards")` as if it
+were already built.
+
+Warm-up:
+    PRELOAD_MODELS=embeddings,whisper   (or "all") loads and runs one inference
+    when app.py is imported; list "reranker" too when RERANK_ENABLED. With gunicorn and PRELOAD_APP=1 (gunicorn.conf.py)
+    the weights load once in the master and the workers share them
+    copy-on-write; each worker then runs its own warm-up inference.
+"""
+import logging
+import os
+import threading
+import time
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-mpnet-base-v2")
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "embedding_cache")
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", 50000))
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "openai/whisper-small")
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "")
+# Use the shared model server (model_server.py) instead of in-process models
+MODEL_SERVER_URL = os.getenv("MODEL_SERVER_URL", "")
+USE_MODEL_SERVER = bool(MODEL_SERVER_URL)
+MODEL_NAMES = ("embeddings", "whisper")
+# gunicorn.conf.py turns this off in a preloading master: weights load before
+# fork, the first inference (which starts torch's thread pools) runs per worker
+WARMUP_INFERENCE = True
+
+_factories = {}
+_instances = {}
+_locks = {}
+_registry_lock = threading.Lock()
+load_times = {}
+
+
+def register(name, factory):
+    """Register a zero-argument factory; it runs once, on first get(name)."""
+    with _registry_lock:
+        _factories[name] = factory
+        _locks.setdefault(name, threading.Lock())
+
+
+def get(name):
+    instance = _instances.get(name)
+    if instance is not None:
+        return instance
+    with _locks[name]:
+        if name not in _instances:
+            start = time.perf_counter()
+            _instances[name] = _factories[name]()
+            load_times[name] = round(time.perf_counter() - start, 3)
+            logger.info("Loaded %s in %.2fs", name, load_times[name])
+    return _instances[name]
+
+
+def is_loaded(name):
+    return name in _instances
+
+
+class LazyProxy:
+    """Forwards attribute access to get(name), building it on first use."""
+
+    def __init__(self, name):
+        object.__setattr__(self, "_name", name)
+
+    def __getattr__(self, attr):
+        return getattr(get(self._name), attr)
+
+    def __repr__(self):
+        state = "loaded" if is_loaded(self._name) else "not loaded"
+        return f"<LazyProxy {self._name} ({state})>"
+
+
+class LazyEmbeddings(Embeddings):
+    """Embeddings facade that loads the model on the first embed call."""
+
+    def __init__(self, name="embeddings"):
+        self._name = name
+
+    def embed_documents(self, texts):
+        return get(self._name).embed_documents(texts)
+
+    def embed_query(self, text):
+        return get(self._name).embed_query(text)
+
+    def __getattr__(self, attr):
+        if attr.startswith("__"):
+            raise AttributeError(attr)
+        return getattr(get(self._name), attr)
+
+
+# --- 1️⃣ Built-in models ---
+def _build_embeddings():
+    if USE_MODEL_SERVER:
+        from model_server import SidecarEmbeddings
+        return SidecarEmbeddings(MODEL_SERVER_URL)
+
+    from bulk_embed import EMBED_BATCH_SIZE
+    from embedding_backends import create_embeddings, cache_model_name
+    from embedding_cache import CachedEmbeddings
+
+    # EMBEDDINGS_BACKEND=onnx runs the exported ONNX model (optionally int8) instead of PyTorch
+    base = create_embeddings(EMBEDDING_MODEL, batch_size=EMBED_BATCH_SIZE)
+    # Content-addressed cache: chunker, add_texts and scoring share one forward pass per text
+    return CachedEmbeddings(
+        base,
+        model_name=cache_model_name(EMBEDDING_MODEL, base),
+        cache_dir=EMBEDDING_CACHE_DIR,
+        max_memory_entries=EMBEDDING_CACHE_SIZE,
+    )
+
+
+def _build_whisper():
+    if USE_MODEL_SERVER:
+        from model_server import SidecarASR
+        return SidecarASR(MODEL_SERVER_URL)
+
+    from transformers import pipeline
+
+    return pipeline("automatic-speech-recognition", model=WHISPER_MODEL)
+
+
+register("embeddings", _build_embeddings)
+register("whisper", _build_whisper)
+
+
+def get_embeddings():
+    return get("embeddings")
+
+
+def get_whisper():
+    return get("whisper")
+
+
+# --- 2️⃣ Warm-up ---
+def _warm(name, inference):
+    instance = get(name)
+    if not inference:
+        return
+    start = time.perf_counter()
+    if name == "embeddings":
+        instance.embed_query("warm up")
+    elif name == "whisper":
+        import numpy as np
+        instance({"raw": np.zeros(16000, dtype=np.float32), "sampling_rate": 16000})
+    elif name == "reranker":
+        instance.predict([("warm up", "warm up")], show_progress_bar=False)
+    load_times[f"{name}_warmup"] = round(time.perf_counter() - start, 3)
+
+
+def warm_up(names=None, inference=None):
+    """Load (and run one inference on) the given models; defaults to MODEL_NAMES."""
+    inference = WARMUP_INFERENCE if inference is None else inference
+    for name in MODEL_NAMES if names is None else names:
+        try:
+            _warm(name, inference)
+        except Exception:
+            logger.exception("Warm-up of %s failed", name)
+
+
+def preload_from_env():
+    """Honour PRELOAD_MODELS ("all" or a comma-separated list of names)."""
+    value = PRELOAD_MODELS.strip().lower()
+    if not value:
+        return
+    warm_up(None if value == "all" else [n.strip() for n in value.split(",") if n.strip()])
+
+
+def loaded_models():
+    return [name for name in MODEL_NAMES if is_loaded(name)]
+
+
+def status():
+    return {
+        "loaded": sorted(_instances),
+        "registered": sorted(_factories),
+        "load_seconds": dict(load_times),
+    }
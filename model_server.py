@@ -0,0 +1,346 @@
+# model_server.py
+"""
+Optional model-serving sidecar: one process holds mpnet and Whisper for every
+Flask / gunicorn worker on the host.
+
+Run:
+    python model_server.py                                   # http://127.0.0.1:8765
+    python model_server.py --socket /tmp/model_server.sock   # Unix socket
+
+Point the app at it with MODEL_SERVER_URL=http://127.0.0.1:8765 (or
+unix:///tmp/model_server.sock); model_loader then hands out SidecarEmbeddings
+/ SidecarASR instead of loading the models in-process.
+
+Requests from all workers go through a MicroBatcher per model: the first
+request opens a batch, which is run when it holds MAX_BATCH items or
+MAX_WAIT_MS has passed, whichever comes first. One thread per model runs the
+batches, so Whisper never sees concurrent calls.
+
+    POST /embed        {"texts": [...]}                    -> {"vectors": [[...], ...]}
+    POST /transcribe   audio file bytes                    -> {"text": "..."}
+                       or float32 PCM + X-Sampling-Rate header
+    GET  /health       loaded models, batcher stats, embedding cache stats
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import httpx
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from audio_utils import ASR_CHUNK_LENGTH_S, transcribe
+
+logger = logging.getLogger(__name__)
+
+MODEL_SERVER_URL = os.getenv("MODEL_SERVER_URL", "")
+MODEL_SERVER_TIMEOUT = float(os.getenv("MODEL_SERVER_TIMEOUT", 120))
+EMBED_MAX_BATCH = int(os.getenv("MODEL_SERVER_EMBED_MAX_BATCH", 128))
+EMBED_MAX_WAIT_MS = float(os.getenv("MODEL_SERVER_EMBED_MAX_WAIT_MS", 10))
+ASR_MAX_BATCH = int(os.getenv("MODEL_SERVER_ASR_MAX_BATCH", 8))
+ASR_MAX_WAIT_MS = float(os.getenv("MODEL_SERVER_ASR_MAX_WAIT_MS", 50))
+
+
+# --- 1️⃣ Micro-batching ---
+class MicroBatcher:
+    """
+    Collects `submit(items)` calls from many threads into one `fn(all_items)`
+    call. `fn` must return one result per item, in order. If a merged batch
+    fails, each request in it is retried on its own, so one bad input only
+    fails the caller that sent it.
+    """
+
+    def __init__(self, fn, max_batch, max_wait_ms, name="batcher"):
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        threading.Thread(target=self._run, name=name, daemon=True).start()
+
+    def submit(self, items):
+        if not items:
+            return []
+        future = Future()
+        self._queue.put((list(items), future))
+        return future.result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for request_items, _ in batch for item in request_items]
+            try:
+                results = self.fn(items)
+            except Exception as e:
+                logger.exception("%s batch of %d failed", self.name, len(items))
+                if len(batch) == 1:
+                    batch[0][1].set_exception(e)
+                else:
+                    self._run_each(batch)
+                continue
+
+            offset = 0
+            for request_items, future in batch:
+                future.set_result(results[offset:offset + len(request_items)])
+                offset += len(request_items)
+
+            with self._stats_lock:
+                self.batches += 1
+                self.items += len(items)
+                self.largest_batch = max(self.largest_batch, len(items))
+
+    def _run_each(self, batch):
+        for request_items, future in batch:
+            try:
+                future.set_result(self.fn(request_items))
+            except Exception as e:
+                future.set_exception(e)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch": round(self.items / self.batches, 2) if self.batches else 0,
+                "largest_batch": self.largest_batch,
+                "queued": self._queue.qsize(),
+            }
+
+
+# --- 2️⃣ Server ---
+class ModelService:
+    """Loads models on first use and owns one batcher per model."""
+
+    def __init__(self, embed_max_batch=EMBED_MAX_BATCH, embed_max_wait_ms=EMBED_MAX_WAIT_MS,
+                 asr_max_batch=ASR_MAX_BATCH, asr_max_wait_ms=ASR_MAX_WAIT_MS):
+        import model_loader
+
+        model_loader.USE_MODEL_SERVER = False  # this process *is* the model server
+        self.model_loader = model_loader
+        self.embed_batcher = MicroBatcher(self._embed, embed_max_batch, embed_max_wait_ms, "embed")
+        self.asr_batcher = MicroBatcher(self._transcribe, asr_max_batch, asr_max_wait_ms, "asr")
+
+    def _embed(self, texts):
+        return self.model_loader.get_embeddings().embed_documents(texts)
+
+    def _transcribe(self, inputs):
+        whisper = self.model_loader.get_whisper()
+        texts = [None] * len(inputs)
+        short = []
+        for i, audio in enumerate(inputs):
+            # Long decoded recordings get the pipeline's own chunked batching
+            if isinstance(audio, dict) and ASR_CHUNK_LENGTH_S and \
+                    len(audio["raw"]) > ASR_CHUNK_LENGTH_S * audio["sampling_rate"]:
+                texts[i] = transcribe(whisper, audio["raw"], audio["sampling_rate"])
+            else:
+                short.append(i)
+        if short:
+            # The pipeline pops "raw" / "sampling_rate" from dict inputs: hand it copies so
+            # the batcher can retry the same requests one by one if the batch fails
+            batch = [dict(inputs[i]) if isinstance(inputs[i], dict) else inputs[i] for i in short]
+            outputs = whisper(batch, batch_size=len(short))
+            for i, output in zip(short, outputs):
+                texts[i] = output["text"]
+        return texts
+
+    def health(self):
+        health = {
+            "status": "ok",
+            "models": self.model_loader.status(),
+            "embed_batcher": self.embed_batcher.stats(),
+            "asr_batcher": self.asr_batcher.stats(),
+        }
+        if self.model_loader.is_loaded("embeddings"):
+            health["embedding_cache"] = self.model_loader.get_embeddings().stats()
+        return health
+
+
+class ModelRequestHandler(BaseHTTPRequestHandler):
+    service = None  # set by serve()
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, self.service.health())
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if self.path not in ("/embed", "/transcribe"):
+            self._send_json(404, {"error": "Not found"})
+            return
+
+        body = self._body()
+        try:
+            if self.path == "/embed":
+                texts = json.loads(body)["texts"]
+            else:
+                sampling_rate = self.headers.get("X-Sampling-Rate")
+                if sampling_rate:
+                    audio = {"raw": np.frombuffer(body, dtype=np.float32), "sampling_rate": int(sampling_rate)}
+                else:
+                    audio = body
+        except (KeyError, ValueError) as e:
+            self._send_json(400, {"error": f"Bad request: {e}"})
+            return
+
+        try:
+            if self.path == "/embed":
+                self._send_json(200, {"vectors": self.service.embed_batcher.submit(texts)})
+            else:
+                self._send_json(200, {"text": self.service.asr_batcher.submit([audio])[0]})
+        except Exception as e:
+            logger.exception("Model server request failed")
+            self._send_json(500, {"error": str(e)})
+
+    def address_string(self):
+        # Unix socket peers have no (host, port)
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class ModelHTTPServer(ThreadingHTTPServer):
+    request_queue_size = 128  # every worker may connect at once
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def serve(host="127.0.0.1", port=8765, socket_path=None, preload=True, **batch_options):
+    ModelRequestHandler.service = ModelService(**batch_options)
+    if preload:
+        ModelRequestHandler.service.model_loader.warm_up()
+
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = ThreadingUnixHTTPServer(socket_path, ModelRequestHandler)
+        logger.info("Model server listening on unix://%s", socket_path)
+    else:
+        server = ModelHTTPServer((host, port), ModelRequestHandler)
+        logger.info("Model server listening on http://%s:%d", host, port)
+    server.serve_forever()
+
+
+# --- 3️⃣ Clients (same interface as the in-process models) ---
+def _http_client(url):
+    """httpx client + base URL for http://host:port or unix:///path.sock."""
+    parsed = urlparse(url)
+    if parsed.scheme == "unix":
+        transport = httpx.HTTPTransport(uds=parsed.path)
+        return httpx.Client(transport=transport, timeout=MODEL_SERVER_TIMEOUT), "http://model-server"
+    return httpx.Client(timeout=MODEL_SERVER_TIMEOUT), url.rstrip("/")
+
+
+class SidecarEmbeddings(Embeddings):
+    """
+    LangChain Embeddings backed by the model server. Queries are embedded like
+    documents (identical for symmetric models such as mpnet).
+    """
+
+    def __init__(self, url=None):
+        self.client, self.base_url = _http_client(url or MODEL_SERVER_URL)
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        response = self.client.post(f"{self.base_url}/embed", json={"texts": list(texts)})
+        response.raise_for_status()
+        return response.json()["vectors"]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    def stats(self):
+        response = self.client.get(f"{self.base_url}/health")
+        response.raise_for_status()
+        health = response.json()
+        return {"model_server": self.base_url, **health.get("embedding_cache", {}),
+                "batcher": health["embed_batcher"]}
+
+
+class SidecarASR:
+    """
+    Callable like the transformers ASR pipeline: accepts a file path, audio
+    bytes or {"raw": float32 array, "sampling_rate": int}; returns {"text": ...}.
+    Long recordings are chunked by the server (ASR_CHUNK_LENGTH_S), so
+    chunk_length_s / batch_size are accepted and left to it; any other
+    pipeline option raises TypeError instead of being silently dropped.
+    """
+
+    SERVER_HANDLED_KWARGS = frozenset(("chunk_length_s", "batch_size"))
+
+    def __init__(self, url=None):
+        self.client, self.base_url = _http_client(url or MODEL_SERVER_URL)
+
+    def __call__(self, inputs, **kwargs):
+        unsupported = set(kwargs) - self.SERVER_HANDLED_KWARGS
+        if unsupported:
+            raise TypeError(f"SidecarASR does not support: {', '.join(sorted(unsupported))}")
+        headers = {}
+        if isinstance(inputs, dict):
+            body = np.asarray(inputs["raw"], dtype=np.float32).tobytes()
+            headers["X-Sampling-Rate"] = str(inputs["sampling_rate"])
+        elif isinstance(inputs, (bytes, bytearray)):
+            body = bytes(inputs)
+        else:
+            with open(inputs, "rb") as f:
+                body = f.read()
+        response = self.client.post(f"{self.base_url}/transcribe", content=body, headers=headers)
+        response.raise_for_status()
+        return {"text": response.json()["text"]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=os.getenv("MODEL_SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("MODEL_SERVER_PORT", 8765)))
+    parser.add_argument("--socket", default=os.getenv("MODEL_SERVER_SOCKET"))
+    parser.add_argument("--no-preload", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    serve(args.host, args.port, socket_path=args.socket, preload=not args.no_preload)
@@ -0,0 +1,191 @@
+# reranker.py
+"""
+Optional cross-encoder rerank stage for /ask-hybrid.
+
+Hybrid retrieval over-fetches RERANK_CANDIDATES fused chunks; a small local
+cross-encoder (ms-marco-MiniLM-L-6-v2 by default) scores each (question,
+chunk) pair and only the best RERANK_TOP_N go into the prompt. Fewer,
+better chunks make a shorter prompt and a faster Ollama generation.
+
+Latency is bounded by RERANK_BUDGET_MS of wall-clock time from the start of
+rerank(), including time spent waiting for another request's predict call.
+Candidates are scored in fused order, in batches sized from the measured
+per-pair throughput so a batch fits in what is left before the deadline (at
+most RERANK_BATCH_SIZE). Once the deadline passes the remaining candidates
+keep their fused order behind the scored ones; if it passes before anything
+is scored, the fused order is returned unchanged. Scores are cached per
+(normalized question, chunk id), so a repeated or re-asked question only
+scores chunks it hasn't seen.
+
+Enable with RERANK_ENABLED=1. The model is never loaded on the request
+path: the first request starts a background load and is answered in fused
+order, as is every request until the model is ready (add "reranker" to
+PRELOAD_MODELS to load it at startup).
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+
+import model_loader
+from embedding_cache import LRUVectorCache, normalize_text
+from hybrid_retrieval import chunk_key
+
+logger = logging.getLogger(__name__)
+
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "0").lower() in ("1", "true", "yes")
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", 20))
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", 4))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", 16))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", 300))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", 20000))
+RERANK_MAX_LENGTH = 512
+# Batch size while throughput is still unmeasured
+RERANK_PROBE_BATCH = 4
+
+
+def _build_cross_encoder():
+    from sentence_transformers import CrossEncoder
+
+    return CrossEncoder(RERANK_MODEL, max_length=RERANK_MAX_LENGTH)
+
+
+model_loader.register("reranker", _build_cross_encoder)
+
+
+def chunk_id(doc):
+    owner, text = chunk_key(doc)
+    return hashlib.sha1(f"{owner}\x00{text}".encode("utf-8")).hexdigest()
+
+
+class Reranker:
+    def __init__(self, top_n=RERANK_TOP_N, batch_size=RERANK_BATCH_SIZE, budget_ms=RERANK_BUDGET_MS,
+                 cache_size=RERANK_CACHE_SIZE, model=None):
+        self.top_n = top_n
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        self.cache = LRUVectorCache(max_entries=cache_size)
+        self._model = model
+        # CrossEncoder.predict is not safe to call from several threads at once
+        self._predict_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._loading = False
+        self.seconds_per_pair = None  # moving average of predict time per (query, chunk) pair
+        self.hits = 0
+        self.scored = 0
+        self.over_budget = 0
+        self.not_ready = 0
+
+    @property
+    def model(self):
+        return self._model if self._model is not None else model_loader.get("reranker")
+
+    def ready(self):
+        """True once the model is loaded; otherwise start loading it in the background."""
+        if self._model is not None or model_loader.is_loaded("reranker"):
+            return True
+        with self._load_lock:
+            if not self._loading:
+                self._loading = True
+                threading.Thread(target=self._load, name="reranker-load", daemon=True).start()
+        return False
+
+    def _load(self):
+        try:
+            model = model_loader.get("reranker")
+            with self._predict_lock:  # first inference warms torch; keep it off concurrent requests
+                model.predict([("warm up", "warm up")], show_progress_bar=False)
+        except Exception:
+            logger.exception("Loading reranker %s failed; answering in fused order", RERANK_MODEL)
+
+    def _batch_size(self, remaining_s):
+        """Largest batch expected to finish within remaining_s (0: not even one pair fits)."""
+        if self.seconds_per_pair is None:
+            return min(self.batch_size, RERANK_PROBE_BATCH)
+        return min(self.batch_size, int(remaining_s / self.seconds_per_pair))
+
+    def _score_within(self, query, docs, deadline):
+        """
+        Scores for the longest prefix of `docs` expected to finish by `deadline`
+        (a perf_counter time). [] if the deadline passes first, lock wait included.
+        """
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0 or not self._predict_lock.acquire(timeout=remaining):
+            return []
+        try:
+            batch = docs[:self._batch_size(deadline - time.perf_counter())]
+            if not batch:
+                return []
+            start = time.perf_counter()
+            scores = self.model.predict(
+                [(query, doc.page_content) for doc in batch], batch_size=len(batch), show_progress_bar=False
+            )
+            elapsed = time.perf_counter() - start
+        finally:
+            self._predict_lock.release()
+        per_pair = elapsed / len(batch)
+        self.seconds_per_pair = per_pair if self.seconds_per_pair is None else \
+            0.8 * self.seconds_per_pair + 0.2 * per_pair
+        return [float(score) for score in scores]
+
+    def rerank(self, query, docs, top_n=None, info=None):
+        """
+        Best `top_n` of `docs` (given in fused order) by cross-encoder score.
+        `info`, if a dict, receives scored / cached / skipped counts.
+        """
+        start = time.perf_counter()
+        deadline = start + self.budget_ms / 1000
+        top_n = top_n or self.top_n
+        if len(docs) <= 1:
+            return list(docs)
+        if not self.ready():
+            self.not_ready += 1
+            if info is not None:
+                info.update({"scored": 0, "cached": 0, "skipped": len(docs), "model_loading": True})
+            return list(docs[:top_n])
+
+        query_key = normalize_text(query).lower()
+        keys = [f"{query_key}\x00{chunk_id(doc)}" for doc in docs]
+        scores = [self.cache.get(key) for key in keys]
+        cached = sum(score is not None for score in scores)
+        self.hits += cached
+
+        pending = [i for i, score in enumerate(scores) if score is None]
+        scored_now = 0
+        while scored_now < len(pending):
+            batch = pending[scored_now:]
+            batch_scores = self._score_within(query, [docs[i] for i in batch], deadline)
+            if not batch_scores:
+                self.over_budget += 1
+                break
+            for i, score in zip(batch, batch_scores):
+                scores[i] = score
+                self.cache.put(keys[i], score)
+            scored_now += len(batch_scores)
+        self.scored += scored_now
+
+        if pending and not scored_now:
+            ranked = list(range(len(docs)))  # deadline passed before scoring: fused order unchanged
+        else:
+            # Scored candidates by score; anything the deadline didn't reach keeps its fused order after them
+            ranked = sorted((i for i, s in enumerate(scores) if s is not None), key=lambda i: -scores[i])
+            ranked += [i for i, s in enumerate(scores) if s is None]
+        if info is not None:
+            info.update({"scored": scored_now, "cached": cached, "skipped": len(docs) - scored_now - cached,
+                         "rerank_ms": round((time.perf_counter() - start) * 1000, 2)})
+        return [docs[i] for i in ranked[:top_n]]
+
+    def stats(self):
+        return {
+            "enabled": RERANK_ENABLED,
+            "model": RERANK_MODEL,
+            "loaded": model_loader.is_loaded("reranker") or self._model is not None,
+            "cache_entries": len(self.cache),
+            "cache_hits": self.hits,
+            "scored": self.scored,
+            "over_budget": self.over_budget,
+            "not_ready": self.not_ready,
+            "ms_per_pair": round(self.seconds_per_pair * 1000, 3) if self.seconds_per_pair is not None else None,
+        }
@@ -0,0 +1,42 @@
+# retrieval_scope.py
+"""
+Tenant scoping for vector search.
+
+/ask-hybrid, /voice-query and the voice WebSocket accept recruiter_id,
+job_id, file_name (and applicant_id) to narrow retrieval. They are turned
+into a Chroma `where` filter so the search only visits that tenant's
+vectors instead of the whole resume_v2 collection. Years are matched via
+the boolean `year_YYYY` flags written at ingest (ingest_utils.year_metadata).
+
+recruiter_id / job_id go through normalize_id() everywhere they enter: at
+ingest (stored metadata), in shard / BM25 routing and here at query time, so
+"Job-7" and "job-7" always name the same job.
+"""
+
+SCOPE_FIELDS = ("recruiter_id", "job_id", "file_name", "applicant_id")
+TENANT_FIELDS = ("recruiter_id", "job_id")
+
+
+def normalize_id(value):
+    """Canonical form of a recruiter_id / job_id (trimmed, lowercased); "" for None."""
+    return str(value if value is not None else "").strip().lower()
+
+
+def request_scope(data):
+    """recruiter_id / job_id / file_name / applicant_id from a request payload (ids normalized)."""
+    scope = {}
+    for field in SCOPE_FIELDS:
+        value = (data.get(field) or "").strip()
+        if value:
+            scope[field] = normalize_id(value) if field in TENANT_FIELDS else value
+    return scope
+
+
+def scope_filter(scope=None, year=None):
+    """Chroma `where` for the scope (and a year_YYYY flag), or None for an unscoped search."""
+    clauses = [{field: {"$eq": value}} for field, value in (scope or {}).items()]
+    if year:
+        clauses.append({f"year_{year}": {"$eq": True}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
@@ -0,0 +1,43 @@
+# streaming.py
+"""
+Helpers to send a generator of event dicts as a streamed Flask response.
+
+Default wire format is NDJSON (one JSON object per line). Clients that send
+`Accept: text/event-stream` get Server-Sent Events instead.
+"""
+import json
+
+from flask import Response, stream_with_context
+
+
+def wants_stream(request):
+    """True if the caller asked for a streamed answer (?stream=1 or "stream": true in the JSON body)."""
+    if request.args.get("stream", "").lower() in ("1", "true"):
+        return True
+    if request.form.get("stream", "").lower() in ("1", "true"):
+        return True
+    data = request.get_json(silent=True) or {}
+    return bool(data.get("stream"))
+
+
+def _ndjson(event):
+    return json.dumps(event) + "\n"
+
+
+def _sse(event):
+    return f"event: {event.get('type', 'message')}\ndata: {json.dumps(event)}\n\n"
+
+
+def event_stream_response(events, request):
+    fmt = _sse if "text/event-stream" in request.headers.get("Accept", "") else _ndjson
+    mimetype = "text/event-stream" if fmt is _sse else "application/x-ndjson"
+
+    def generate():
+        for event in events:
+            yield fmt(event)
+
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    # Stop nginx-style proxies from buffering the whole answer
+    response.headers["X-Accel-Buffering"] = "no"
+    response.headers["Cache-Control"] = "no-cache"
+    return response
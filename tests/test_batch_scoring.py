@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from ats_evaluate_utills import compute_embedding_similarity, compute_keyword_score
+from batch_scoring import CohortScorer
+
+JD = "Senior Python engineer: Kubernetes, Docker, Terraform and PostgreSQL on AWS"
+COHORT = [
+    "Python engineer running Kubernetes and Docker clusters with Terraform",
+    "senior python developer, postgresql tuning, docker",
+    "Java Spring Boot microservices on Azure",  # no JD term
+    "",                                          # empty resume
+    "PYTHON python Python kubernetes",           # case and repeats
+]
+
+
+class FakeEmbeddings:
+    """Deterministic bag-of-characters vectors standing in for the sentence-transformer."""
+
+    def embed_documents(self, texts):
+        vectors = []
+        for text in texts:
+            vec = np.zeros(26)
+            for ch in text.lower():
+                if "a" <= ch <= "z":
+                    vec[ord(ch) - ord("a")] += 1
+            vectors.append(vec.tolist())
+        return vectors
+
+
+def test_keyword_scores_match_per_resume_helper():
+    scores = CohortScorer(JD).keyword_scores(COHORT)
+    assert scores == [compute_keyword_score(text, JD) for text in COHORT]
+    assert scores[2] == 0 and scores[3] == 0
+
+
+@pytest.mark.parametrize("jd_text", ["", "C#, Go and AWS"])
+def test_jd_without_keyword_terms_scores_zero(jd_text):
+    scorer = CohortScorer(jd_text)
+    assert scorer.jd_terms == []
+    assert scorer.keyword_scores(COHORT) == [compute_keyword_score(text, jd_text) for text in COHORT]
+    assert scorer.keyword_scores(COHORT) == [0] * len(COHORT)
+
+
+def test_embedding_similarities_match_per_resume_helper():
+    embeddings = FakeEmbeddings()
+    resumes = [text for text in COHORT if text]
+    jd_vector = embeddings.embed_documents([JD])[0]
+    scorer = CohortScorer(JD, jd_vector)
+
+    batched = scorer.embedding_similarities(embeddings.embed_documents(resumes))
+    expected = [compute_embedding_similarity(text, JD, embeddings) for text in resumes]
+    assert batched == pytest.approx(expected)
+
+
+def test_score_keeps_input_order_and_defaults_similarity():
+    scored = CohortScorer(JD).score(COHORT)
+    assert [s["keyword_score"] for s in scored] == [compute_keyword_score(text, JD) for text in COHORT]
+    assert all(s["embedding_similarity"] == 0.0 for s in scored)
+
+
+def test_embedding_similarities_need_a_jd_vector():
+    with pytest.raises(ValueError):
+        CohortScorer(JD).embedding_similarities([[1.0, 0.0]])
@@ -0,0 +1,88 @@
+import pytest
+
+from context_packer import count_tokens, dedupe, pack_chunks, pack_document
+
+
+def words(prefix, n):
+    return " ".join(f"{prefix}{i}" for i in range(n))
+
+
+# --- budget boundary ---
+@pytest.mark.parametrize("budget", [5, 20, 37, 60, 200])
+def test_pack_chunks_never_exceeds_budget(budget):
+    chunks = [words("a", 10), words("b", 25), words("c", 4), words("d", 40)]
+    packed = pack_chunks(chunks, budget=budget)
+    assert count_tokens(packed["text"]) <= budget
+    assert packed["tokens"] == count_tokens(packed["text"])
+
+
+def test_pack_chunks_skips_what_does_not_fit_and_keeps_smaller_ones():
+    chunks = [words("a", 10), words("b", 200), words("c", 5)]
+    budget = count_tokens(chunks[0]) + count_tokens("\n\n") + count_tokens(chunks[2])
+
+    packed = pack_chunks(chunks, budget=budget)
+    assert packed["chunks"] == [0, 2]
+    assert packed["over_budget"] == 1
+    assert packed["text"] == chunks[0] + "\n\n" + chunks[2]
+
+
+def test_pack_chunks_truncates_an_oversized_first_chunk():
+    chunk = words("w", 300)
+    packed = pack_chunks([chunk, words("x", 3)], budget=50)
+    assert packed["chunks"] == [0]
+    assert chunk.startswith(packed["text"]) and packed["text"]
+    assert count_tokens(packed["text"]) <= 50
+
+
+# --- near-duplicate removal ---
+def test_near_duplicate_and_exact_copies_are_dropped():
+    base = words("skill", 30)
+    overlapping = base + " extra"          # all of its shingles but one are in base
+    copy = "  " + base.upper() + "  "       # same text after normalization
+    distinct = words("other", 30)
+
+    assert dedupe([base, overlapping, copy, distinct, ""]) == [0, 3]
+    packed = pack_chunks([base, overlapping, copy, distinct], budget=1000)
+    assert packed["chunks"] == [0, 3]
+    assert packed["duplicates"] == 2
+
+
+def test_short_pieces_are_only_dropped_as_exact_copies():
+    assert dedupe(["python aws", "python aws docker", "Python AWS"]) == [0, 1]
+
+
+# --- order preservation ---
+def test_pack_chunks_keeps_relevance_order():
+    chunks = [words("c", 5), words("a", 5), words("b", 5)]
+    packed = pack_chunks(chunks, budget=1000)
+    assert packed["chunks"] == [0, 1, 2]
+    assert packed["text"].split("\n\n") == chunks
+
+
+def test_pack_document_within_budget_is_unchanged():
+    text = "Header\n\nPython\nPython\n"
+    packed = pack_document(text, budget=1000)
+    assert packed == {"text": text, "tokens": count_tokens(text), "original_tokens": count_tokens(text),
+                      "truncated": False}
+
+
+def test_pack_document_keeps_term_lines_first_but_in_document_order():
+    lines = [words("intro", 20), "Kubernetes operator work", words("filler", 20), "Terraform modules", words("tail", 20)]
+    text = "\n".join(lines)
+    budget = count_tokens("\n".join([lines[1], lines[3]])) + 2
+
+    packed = pack_document(text, budget=budget, terms=["terraform", "kubernetes"])
+    assert packed["truncated"]
+    assert packed["text"] == "Kubernetes operator work\nTerraform modules"
+    assert packed["tokens"] <= budget < packed["original_tokens"]
+
+
+def test_pack_document_drops_repeated_lines_before_selecting():
+    header = "ACME Corp - Confidential"
+    body = [words(f"p{i}_", 8) for i in range(3)]
+    text = "\n".join([header, body[0], header, body[1], header, body[2]])
+    deduped = "\n".join([header] + body)
+
+    packed = pack_document(text, budget=count_tokens(deduped))
+    assert packed["truncated"]
+    assert packed["text"] == deduped
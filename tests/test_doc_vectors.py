@@ -0,0 +1,72 @@
+import uuid
+
+import chromadb
+import numpy as np
+import pytest
+
+from doc_vectors import doc_vector_id, fetch_doc_vectors, resolve_doc_vectors, store_doc_vector
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        return [[float(len(t)), 1.0, 0.0] for t in texts]
+
+
+class DocStore:
+    """The two attributes of the LangChain Chroma store doc_vectors uses."""
+
+    def __init__(self):
+        self.embeddings = CountingEmbeddings()
+        self._collection = chromadb.EphemeralClient().create_collection(f"docs_{uuid.uuid4().hex}")
+
+
+@pytest.fixture
+def store():
+    return DocStore()
+
+
+def test_ids_say_which_field_the_name_came_from(store):
+    store_doc_vector(store, "resume a", "resume_v2", "rec1", "job1", file_name="a.pdf")
+    store_doc_vector(store, "resume b", "resume_v2", "rec1", "job1", applicant_id="app7")
+    store_doc_vector(store, "the jd", "job", "rec1", "job1")
+
+    assert sorted(store._collection.get()["ids"]) == [
+        "job:rec1:job1:job_description",
+        "resume_v2:rec1:job1:applicant:app7",
+        "resume_v2:rec1:job1:file:a.pdf",
+    ]
+    assert doc_vector_id("resume_v2", "rec1", "job1", "x", "applicant_id") == "resume_v2:rec1:job1:applicant:x"
+
+
+def test_applicant_vectors_are_resolved_without_reembedding(store):
+    store_doc_vector(store, "resume b", "resume_v2", "rec1", "job1", applicant_id="app7")
+    store.embeddings.calls = 0
+
+    vectors = resolve_doc_vectors(store, "rec1", "job1", "resume_v2", {"app7": "resume b"}, key="applicant_id")
+    assert store.embeddings.calls == 0
+    np.testing.assert_allclose(vectors["app7"], [8.0, 1.0, 0.0])
+    # applicant records don't show up as files in /evaluate_batch_summary
+    assert fetch_doc_vectors(store, "rec1", "job1", "resume_v2") == {}
+
+
+def test_stale_applicant_vector_is_rewritten_under_the_applicant_id(store):
+    vectors = resolve_doc_vectors(store, "rec1", "job1", "resume_v2", {"app7": "new text"}, key="applicant_id")
+    assert store.embeddings.calls == 1
+    assert store._collection.get()["ids"] == ["resume_v2:rec1:job1:applicant:app7"]
+    np.testing.assert_allclose(vectors["app7"], [8.0, 1.0, 0.0])
+
+
+def test_current_record_wins_over_legacy_id(store):
+    legacy = {"doc_type": "resume_v2", "recruiter_id": "rec1", "job_id": "job1", "file_name": "a.pdf"}
+    store._collection.add(ids=["resume_v2:rec1:job1:a.pdf"], embeddings=[[0.0, 0.0, 1.0]],
+                          documents=["old text"], metadatas=[legacy])
+    store_doc_vector(store, "new text", "resume_v2", "rec1", "job1", file_name="a.pdf")
+    store.embeddings.calls = 0
+
+    vectors = resolve_doc_vectors(store, "rec1", "job1", "resume_v2", {"a.pdf": "new text"})
+    assert store.embeddings.calls == 0
+    np.testing.assert_allclose(vectors["a.pdf"], [8.0, 1.0, 0.0])
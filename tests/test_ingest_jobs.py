@@ -0,0 +1,40 @@
+import threading
+import time
+
+from ingest_jobs import IngestJobQueue
+
+
+def test_job_left_by_a_dead_process_is_marked_orphaned():
+    previous = IngestJobQueue(stale_s=0.05)
+    ingest_job_id = previous.create("rec1", "job1", ["a.pdf"])  # never submitted: its process died
+
+    assert previous.status(ingest_job_id)["status"] == "queued"
+    time.sleep(0.1)
+    status = previous.status(ingest_job_id)
+    assert status["status"] == "failed"
+    assert status["error"].startswith("orphaned")
+    assert previous.status(ingest_job_id)["status"] == "failed"
+
+
+def test_heartbeat_keeps_a_long_job_alive():
+    queue = IngestJobQueue(heartbeat_s=0.02, stale_s=0.1)
+    release = threading.Event()
+
+    def ingest(progress):
+        progress(0, status="success", chunks=3)
+        release.wait(5)
+
+    ingest_job_id = queue.create("rec1", "job1", ["a.pdf"])
+    future = queue.submit(ingest_job_id, ingest)
+    time.sleep(0.3)  # well past stale_s
+    assert queue.status(ingest_job_id)["status"] == "running"
+
+    release.set()
+    future.result(timeout=5)
+    status = queue.status(ingest_job_id)
+    assert status["status"] == "completed"
+    assert status["processed_count"] == 1 and status["total_chunks"] == 3
+
+    # a finished job is never reported as orphaned
+    time.sleep(0.2)
+    assert queue.status(ingest_job_id)["status"] == "completed"
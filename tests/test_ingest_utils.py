@@ -0,0 +1,133 @@
+import numpy as np
+import pytest
+
+import ingest_utils
+from ingest_utils import chunk_text, detect_section, extract_metadata, split_sections
+
+RESUME = """JANE DOE
+jane.doe@example.com | +971 50 000 0000 | Dubai
+
+SUMMARY
+Backend engineer who builds reliable payment and identity platforms for
+government and banking clients. Comfortable owning services end to end,
+from design reviews and capacity planning to on-call rotations, incident
+write-ups and mentoring junior engineers across two distributed teams.
+
+WORK EXPERIENCE
+Senior Backend Engineer, Emaratech, 2019 - 2023
+Built the visa processing APIs in Java and Spring Boot, cutting average
+response time from 900 ms to 250 ms. Moved twelve services to Kubernetes
+on Azure and introduced contract tests for every public endpoint.
+Backend Engineer, Acme Payments, 2016 - 2019
+Maintained the card settlement pipeline and its nightly reconciliation jobs.
+
+EDUCATION
+B.Sc. Computer Science, University of Sharjah, 2012 - 2016
+Graduated with honours; final year project on fraud detection with graph
+features, supervised by the head of the data mining research group, and
+presented at the regional student research conference in Abu Dhabi that
+spring alongside six other undergraduate teams from the region.
+
+TECHNICAL SKILLS
+Java, Spring Boot, Python, PostgreSQL, Redis, Kafka, Docker, Kubernetes,
+Terraform, Azure, GitHub Actions, Prometheus, Grafana, OpenTelemetry,
+REST and gRPC API design, domain driven design, load testing with k6 and
+Gatling, secure coding practices and threat modelling for public services.
+"""
+
+
+def metadata_for(chunks):
+    return [extract_metadata(c, i, "resume_v2", "rec1", "app1", "job1") for i, c in enumerate(chunks)]
+
+
+# --- section detection ---
+def test_detect_section_on_sample_resume():
+    chunks = split_sections(RESUME, max_words=200, overlap_words=30, min_words=40)
+    assert [detect_section(c) for c in chunks] == ["summary", "experience", "education", "skills"]
+    assert chunks[0].startswith("JANE DOE")  # contact header merged into the next section
+    assert chunks[1].startswith("WORK EXPERIENCE")
+
+
+def test_detect_section_falls_back_to_general():
+    assert detect_section("Languages: English, Arabic") == "general"
+    assert detect_section("Key responsibilities include on-call") == "experience"
+
+
+# --- strategies ---
+def test_sections_strategy_chunks_and_metadata(monkeypatch):
+    monkeypatch.setattr(ingest_utils, "CHUNK_MIN_WORDS", 40)
+    chunks = chunk_text(RESUME, None, strategy="sections")
+    metadata = metadata_for(chunks)
+
+    assert len(chunks) == 4
+    assert [m["section"] for m in metadata] == ["summary", "experience", "education", "skills"]
+    experience = metadata[1]
+    assert experience["years"] == "2016,2019,2023"
+    assert experience["year_2019"] is True and experience["year_2023"] is True
+    assert "year_2012" not in experience
+    assert metadata[2]["years"] == "2012,2016"
+    assert not any(key.startswith("year") for key in metadata[3])
+
+
+def test_sections_strategy_windows_long_sections_under_their_heading():
+    body = "\n".join(f"Delivered project {i} in 2020 for a banking client" for i in range(60))
+    chunks = split_sections("WORK EXPERIENCE\n" + body, max_words=100, overlap_words=20, min_words=40)
+
+    assert len(chunks) > 1
+    assert all(len(c.split()) <= 100 + 2 for c in chunks)  # window plus the repeated heading
+    assert all(c.startswith("WORK EXPERIENCE") for c in chunks)
+    assert all(m["section"] == "experience" and m["year_2020"] for m in metadata_for(chunks))
+
+
+def test_tokens_strategy_chunk_count_and_overlap(monkeypatch):
+    monkeypatch.setattr(ingest_utils, "CHUNK_MAX_WORDS", 200)
+    monkeypatch.setattr(ingest_utils, "CHUNK_OVERLAP_WORDS", 30)
+    words = [f"w{i}" for i in range(500)] + ["2021"]
+    chunks = chunk_text(" ".join(words), None, strategy="tokens")
+
+    # windows start at 0, 170, 340
+    assert len(chunks) == 3
+    assert chunks[1].split()[:30] == chunks[0].split()[-30:]
+    assert chunks[-1].split()[-1] == "2021"
+    metadata = metadata_for(chunks)
+    assert [m["section"] for m in metadata] == ["general"] * 3
+    assert [m.get("year_2021", False) for m in metadata] == [False, False, True]
+
+
+class TopicEmbeddings:
+    """One axis per topic word, so sentences on different topics are far apart."""
+
+    TOPICS = ["kubernetes", "university"]
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+    def _embed(self, text):
+        vec = np.array([text.lower().count(topic) for topic in self.TOPICS], dtype=float) + 0.01
+        return (vec / np.linalg.norm(vec)).tolist()
+
+
+def test_semantic_strategy_chunks_and_metadata():
+    pytest.importorskip("langchain_experimental.text_splitter")
+    embeddings = TopicEmbeddings()
+    text = " ".join(
+        [f"Ran kubernetes cluster {i} in production during 2021." for i in range(6)]
+        + [f"Studied at the university in term {i} of the 2014 education program." for i in range(6)]
+    )
+    chunks = chunk_text(text, embeddings, strategy="semantic")
+
+    assert len(chunks) >= 2
+    assert " ".join(chunks).split() == text.split()
+    metadata = metadata_for(chunks)
+    assert metadata[0]["year_2021"] and metadata[-1]["year_2014"]
+    assert metadata[-1]["section"] == "education"
+    # one SemanticChunker per embeddings object
+    assert ingest_utils._semantic_chunker(embeddings) is ingest_utils._semantic_chunker(embeddings)
+
+
+def test_unknown_strategy_is_rejected():
+    with pytest.raises(ValueError):
+        chunk_text(RESUME, None, strategy="paragraphs")
@@ -0,0 +1,49 @@
+import threading
+
+import numpy as np
+
+from model_server import ModelService
+
+
+class FakeWhisper:
+    """Behaves like the transformers ASR pipeline: consumes dict inputs, fails the whole batch on a bad clip."""
+
+    def __call__(self, inputs, batch_size=None):
+        outputs = []
+        for audio in inputs:
+            raw = audio.pop("raw")
+            audio.pop("sampling_rate")
+            if not len(raw):
+                raise ValueError("empty clip")
+            outputs.append({"text": f"{len(raw)} samples"})
+        return outputs
+
+
+class FakeLoader:
+    def get_whisper(self):
+        return FakeWhisper()
+
+
+def test_bad_clip_only_fails_its_own_request():
+    service = ModelService(asr_max_batch=8, asr_max_wait_ms=200)
+    service.model_loader = FakeLoader()
+    clips = {"a": 100, "bad": 0, "c": 300}
+    results, start = {}, threading.Barrier(len(clips))
+
+    def submit(name, size):
+        start.wait()
+        try:
+            results[name] = service.asr_batcher.submit([{"raw": np.zeros(size, dtype=np.float32),
+                                                         "sampling_rate": 16000}])[0]
+        except ValueError as e:
+            results[name] = e
+
+    threads = [threading.Thread(target=submit, args=item) for item in clips.items()]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results["a"] == "100 samples"
+    assert results["c"] == "300 samples"
+    assert isinstance(results["bad"], ValueError)
@@ -0,0 +1,88 @@
+import math
+
+import pytest
+from langchain_core.documents import Document
+
+import bm25_index
+from bm25_index import BM25Index, tokenize
+from collection_router import shard_name
+from hybrid_retrieval import rrf_fuse
+from retrieval_scope import normalize_id, request_scope
+
+SCOPE = {"recruiter_id": "rec1", "job_id": "job1"}
+
+
+def doc(text, **metadata):
+    return Document(page_content=text, metadata=metadata)
+
+
+# --- tokenize ---
+def test_tokenize_keeps_technical_tokens():
+    assert tokenize("C++, C#, Node.js and CI/CD since 2019") == ["c++", "c#", "node.js", "ci", "cd", "since", "2019"]
+
+
+def test_tokenize_drops_stopwords_and_lowercases():
+    assert tokenize("The AWS-SAA certification of the team") == ["aws-saa", "certification", "team"]
+
+
+# --- BM25 scoring ---
+@pytest.fixture
+def index(tmp_path):
+    return BM25Index(root=str(tmp_path))
+
+
+def test_bm25_score_matches_formula(index):
+    texts = ["kubernetes docker", "java spring", "python django"]
+    index.add("rec1", "job1", texts, [{"doc_type": "resume_v2", "file_name": f"f{i}"} for i in range(3)])
+
+    (hit, score), = index.search("kubernetes", k=5, scope=SCOPE)
+
+    n_docs, df, tf, length, avgdl = 3, 1, 1, 2, 2.0
+    idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+    norm = tf + bm25_index.BM25_K1 * (1 - bm25_index.BM25_B + bm25_index.BM25_B * length / avgdl)
+    assert hit.metadata["file_name"] == "f0"
+    assert score == pytest.approx(idf * tf * (bm25_index.BM25_K1 + 1) / norm)
+
+
+def test_bm25_ranks_exact_token_and_filters_scope(index):
+    index.add("rec1", "job1", ["worked at emaratech 2019", "worked at acme", "emaratech emaratech lead"],
+              [{"doc_type": "resume_v2"}, {"doc_type": "resume_v2"}, {"doc_type": "job"}])
+
+    ranked = [d.page_content for d, _ in index.search("emaratech", k=5, scope=SCOPE)]
+    assert ranked == ["emaratech emaratech lead", "worked at emaratech 2019"]
+
+    resumes = index.search("emaratech", k=5, scope={**SCOPE, "doc_type": "resume_v2"})
+    assert [d.page_content for d, _ in resumes] == ["worked at emaratech 2019"]
+
+
+def test_bm25_remove_and_reload_from_log(index, tmp_path):
+    index.add("rec1", "job1", ["old jd terraform"], [{"doc_type": "job"}])
+    index.add("rec1", "job1", ["resume terraform"], [{"doc_type": "resume_v2"}])
+    index.remove("rec1", "job1", doc_type="job")
+
+    other_process = BM25Index(root=str(tmp_path))
+    assert [d.page_content for d, _ in other_process.search("terraform", scope=SCOPE)] == ["resume terraform"]
+
+
+# --- reciprocal rank fusion ---
+def test_rrf_prefers_chunks_found_by_both_retrievers():
+    a, b, c = doc("a", doc_key="1"), doc("b", doc_key="1"), doc("c", doc_key="2")
+    fused = rrf_fuse([[a, b], [c, b]], k=3, rrf_k=60)
+    assert [d.page_content for d in fused] == ["b", "a", "c"]
+
+
+def test_rrf_merges_same_chunk_and_respects_k():
+    vector_hit, bm25_hit = doc("same text", doc_key="1"), doc("same text", doc_key="1")
+    fused = rrf_fuse([[vector_hit, doc("x", doc_key="1")], [bm25_hit]], k=1)
+    assert fused == [vector_hit]
+
+
+# --- tenant id normalization ---
+def test_mixed_case_job_id_routes_and_matches_its_own_chunks(index):
+    recruiter_id, job_id = normalize_id(" Rec-A "), normalize_id("Job-7")  # as stored at ingest
+    index.add(recruiter_id, job_id, ["kafka streams"], [{"recruiter_id": recruiter_id, "job_id": job_id}])
+
+    scope = request_scope({"recruiter_id": "REC-a", "job_id": "job-7"})
+    assert scope == {"recruiter_id": "rec-a", "job_id": "job-7"}
+    assert [d.page_content for d, _ in index.search("kafka", scope=scope)] == ["kafka streams"]
+    assert shard_name("Rec-A", "Job-7", mode="job") == shard_name("rec-a", "job-7", mode="job")
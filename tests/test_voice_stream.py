@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+import voice_stream
+from voice_stream import ASR_SAMPLING_RATE, FrameDecoder, UtteranceSegmenter
+
+SR = ASR_SAMPLING_RATE
+
+
+def tone(seconds, amplitude=0.2, rate=SR):
+    t = np.arange(int(seconds * rate)) / rate
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def silence(seconds):
+    return np.zeros(int(seconds * SR), dtype=np.float32)
+
+
+def split_bytes(data, sizes):
+    """Cut `data` into frames of the given sizes (cycled), so frames straddle samples."""
+    frames, start, i = [], 0, 0
+    while start < len(data):
+        frames.append(data[start:start + sizes[i % len(sizes)]])
+        start += sizes[i % len(sizes)]
+        i += 1
+    return frames
+
+
+# --- FrameDecoder ---
+@pytest.mark.parametrize("encoding,rate", [("pcm_s16le", 44100), ("pcm_s16le", 8000), ("pcm_f32le", 48000)])
+def test_split_frames_resample_like_one_shot(encoding, rate):
+    samples = tone(0.5, rate=rate) + tone(0.5, amplitude=0.05, rate=rate)[::-1]
+    if encoding == "pcm_s16le":
+        data = (samples * 32767).astype("<i2").tobytes()
+    else:
+        data = samples.astype("<f4").tobytes()
+
+    one_shot = FrameDecoder(encoding, rate).decode(data)
+    decoder = FrameDecoder(encoding, rate)
+    streamed = np.concatenate([decoder.decode(f) for f in split_bytes(data, [1, 333, 4097, 2, 1000])])
+
+    assert len(streamed) == len(one_shot)
+    assert abs(len(one_shot) - len(samples) * SR / rate) <= 1
+    np.testing.assert_allclose(streamed, one_shot, atol=1e-6)
+
+
+def test_native_rate_passes_samples_through():
+    samples = (tone(0.1) * 32767).astype("<i2")
+    decoder = FrameDecoder("pcm_s16le", SR)
+    out = np.concatenate([decoder.decode(f) for f in split_bytes(samples.tobytes(), [7, 100])])
+    np.testing.assert_allclose(out, samples / 32768.0)
+
+
+# --- UtteranceSegmenter ---
+def feed_in_pieces(segmenter, audio, piece=1234):
+    events = []
+    for start in range(0, len(audio), piece):
+        events.extend(segmenter.feed(audio[start:start + piece]))
+    return events
+
+
+def test_silence_speech_silence_emits_partials_then_one_final():
+    segmenter = UtteranceSegmenter()
+    events = feed_in_pieces(segmenter, np.concatenate([silence(0.5), tone(2.5), silence(1.0)]))
+    kinds = [kind for kind, _ in events]
+
+    # a partial every VOICE_PARTIAL_INTERVAL_MS of the open utterance, one final once the silence is long enough
+    interval = voice_stream.VOICE_PARTIAL_INTERVAL_MS / 1000
+    assert kinds[-1] == "final" and set(kinds[:-1]) == {"partial"}
+    assert len(kinds) - 1 >= int(2.5 // interval)
+    _, final_audio = events[-1]
+    for _, partial_audio in events[:-1]:
+        np.testing.assert_array_equal(partial_audio, final_audio[:len(partial_audio)])
+    preroll = voice_stream.VOICE_PREROLL_MS / 1000
+    end_silence = voice_stream.VOICE_END_SILENCE_MS / 1000
+    assert len(final_audio) / SR == pytest.approx(preroll + 2.5 + end_silence, abs=0.1)
+    assert segmenter.flush() == []
+
+
+def test_second_utterance_and_flush():
+    segmenter = UtteranceSegmenter()
+    events = feed_in_pieces(segmenter, np.concatenate([tone(0.6), silence(1.0), tone(0.6)]))
+    # first utterance: one partial VOICE_PARTIAL_INTERVAL_MS after onset, then its final;
+    # the second is still open and shorter than a partial interval
+    assert [kind for kind, _ in events] == ["partial", "final"]
+
+    # stream ends mid-utterance: flush closes it
+    assert [kind for kind, _ in segmenter.flush()] == ["final"]
+
+
+def test_short_blip_is_not_an_utterance():
+    segmenter = UtteranceSegmenter()
+    events = feed_in_pieces(segmenter, np.concatenate([silence(0.3), tone(0.1), silence(1.0)]))
+    assert events == []
+    assert segmenter.flush() == []
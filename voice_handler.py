@@ -2,13 +2,13 @@ import os
 import io
 from flask import Blueprint, request, jsonify, make_response
 from flask_cors import CORS
-from transformers import pipeline
-from transformers import pipeline
-from pydub import AudioSegment
 import os
+from streaming import wants_stream, event_stream_response
+from model_loader import get_whisper
+from audio_utils import decode_audio, transcribe, AudioDecodeError
+from retrieval_scope import request_scope
 
-# Initialize Whisper once
-whisper_asr = pipeline("automatic-speech-recognition", model="openai/whisper-small")
+# Whisper loads on the first voice query (or at startup with PRELOAD_MODELS=whisper)
 
 
 # Create Blueprint once
@@ -32,27 +32,26 @@ def voice_query():
 
     filename = audio_file.filename
     file_extension = filename.split('.')[-1] if '.' in filename else 'webm'
-    temp_path = f"temp_audio.{file_extension}"
-    audio_file.save(temp_path)
 
-    # Convert webm to wav if needed
-    if file_extension == "webm":
-        audio = AudioSegment.from_file(temp_path, format="webm")
-        temp_path_wav = "temp_audio.wav"
-        audio.export(temp_path_wav, format="wav")
-    else:
-        temp_path_wav = temp_path
+    # Decode the upload in memory to 16 kHz float32 (no shared temp files)
+    try:
+        audio = decode_audio(audio_file.read(), file_extension)
+    except AudioDecodeError as e:
+        return jsonify({"error": f"Could not decode audio: {e}"}), 400
 
     # Transcribe
-    transcription = whisper_asr(temp_path_wav)["text"]
-    from app import build_hybrid_context_and_query
+    transcription = transcribe(get_whisper(), audio)
+    from app import build_hybrid_context_and_query, stream_hybrid_answer
+    scope = request_scope(request.form)
 
-    # Call your RAG pipeline
-    rag_response = run_text_query(build_hybrid_context_and_query, transcription)
+    # Streamed mode: transcription first, then the same events as /ask-hybrid
+    if wants_stream(request):
+        def events():
+            yield {"type": "transcription", "transcription": transcription}
+            yield from stream_hybrid_answer(transcription, scope)
+        return event_stream_response(events(), request)
 
-    # Cleanup
-    os.remove(temp_path)
-    if temp_path_wav != temp_path:
-        os.remove(temp_path_wav)
+    # Call your RAG pipeline
+    rag_response = run_text_query(lambda text: build_hybrid_context_and_query(text, scope), transcription)
 
     return jsonify({"transcription": transcription, "rag_response": rag_response})
\ No newline at end of file
@@ -0,0 +1,300 @@
+# voice_stream.py
+"""
+Streaming voice queries over WebSocket.
+
+    python voice_stream.py            # ws://0.0.0.0:5003/voice-stream
+
+Protocol (JSON text messages, audio as binary frames):
+
+    client -> {"type": "start", "sample_rate": 16000, "encoding": "pcm_s16le" | "pcm_f32le",
+               "stream_answer": true,                       (optional, these are the defaults)
+               "recruiter_id": ..., "job_id": ..., "file_name": ...}   optional /ask-hybrid scope
+    client -> binary mono PCM frames, any size
+    client -> {"type": "stop"}                               flush the last utterance and close
+
+    server -> {"type": "partial", "utterance": n, "text": ...}   rolling-window transcript while speaking
+    server -> {"type": "final", "utterance": n, "text": ...}     utterance ended (silence detected)
+    server -> /ask-hybrid stream events for that utterance, each tagged with "utterance":
+              {"type": "context" | "token" | "done" | "error", ...}
+              or {"type": "answer", "answer": ...} with "stream_answer": false
+
+An energy VAD splits the audio into utterances. Whisper runs on the current
+utterance every VOICE_PARTIAL_INTERVAL_MS of new speech for partials, and
+once more on the complete utterance when VOICE_END_SILENCE_MS of silence
+follows it. Retrieval and generation for an utterance start right away on a
+worker thread while the client keeps sending audio, so recording,
+transcription and generation overlap.
+"""
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from audio_utils import ASR_SAMPLING_RATE, transcribe
+from model_loader import get_whisper
+from retrieval_scope import request_scope
+
+logger = logging.getLogger(__name__)
+
+VOICE_WS_HOST = os.getenv("VOICE_WS_HOST", "0.0.0.0")
+VOICE_WS_PORT = int(os.getenv("VOICE_WS_PORT", 5003))
+VOICE_VAD_RMS = float(os.getenv("VOICE_VAD_RMS", 0.01))  # frame RMS above this counts as speech
+VOICE_FRAME_MS = 30
+VOICE_END_SILENCE_MS = int(os.getenv("VOICE_END_SILENCE_MS", 700))
+VOICE_MIN_SPEECH_MS = int(os.getenv("VOICE_MIN_SPEECH_MS", 300))
+VOICE_MAX_UTTERANCE_S = float(os.getenv("VOICE_MAX_UTTERANCE_S", 30))
+VOICE_PARTIAL_INTERVAL_MS = int(os.getenv("VOICE_PARTIAL_INTERVAL_MS", 1000))
+VOICE_PARTIAL_WINDOW_S = float(os.getenv("VOICE_PARTIAL_WINDOW_S", 10))
+VOICE_PREROLL_MS = 200  # audio kept before speech onset so the first syllable isn't clipped
+
+# Whisper is not thread-safe: one ASR thread per process; answers get their own pool
+_asr_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="voice-asr")
+_answer_executor = ThreadPoolExecutor(max_workers=int(os.getenv("VOICE_ANSWER_WORKERS", 4)),
+                                      thread_name_prefix="voice-answer")
+
+
+# --- 1️⃣ VAD segmentation ---
+class UtteranceSegmenter:
+    """
+    Feed float32 16 kHz samples; get back ("partial", audio) when a new
+    partial transcript is due and ("final", audio) when an utterance ends.
+    """
+
+    def __init__(self, sampling_rate=ASR_SAMPLING_RATE):
+        self.sampling_rate = sampling_rate
+        self.frame = sampling_rate * VOICE_FRAME_MS // 1000
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._preroll = []
+        self._speech = []
+        self._in_speech = False
+        self._voiced_frames = 0
+        self._silent_frames = 0
+        self._since_partial = 0
+
+    def _frames_for(self, ms):
+        return max(1, ms // VOICE_FRAME_MS)
+
+    def _finish(self):
+        audio = np.concatenate(self._speech) if self._speech else np.zeros(0, dtype=np.float32)
+        voiced = self._voiced_frames
+        self._speech, self._in_speech = [], False
+        self._voiced_frames = self._silent_frames = self._since_partial = 0
+        if voiced >= self._frames_for(VOICE_MIN_SPEECH_MS):
+            return [("final", audio)]
+        return []
+
+    def feed(self, samples):
+        events = []
+        data = np.concatenate([self._pending, samples])
+        usable = len(data) - len(data) % self.frame
+        self._pending = data[usable:]
+
+        for start in range(0, usable, self.frame):
+            frame = data[start:start + self.frame]
+            voiced = float(np.sqrt(np.mean(frame * frame))) > VOICE_VAD_RMS
+
+            if not self._in_speech:
+                self._preroll.append(frame)
+                self._preroll = self._preroll[-self._frames_for(VOICE_PREROLL_MS):]
+                if voiced:
+                    self._in_speech = True
+                    self._speech, self._preroll = self._preroll, []
+                    self._voiced_frames = 1
+                continue
+
+            self._speech.append(frame)
+            self._since_partial += 1
+            if voiced:
+                self._voiced_frames += 1
+                self._silent_frames = 0
+            else:
+                self._silent_frames += 1
+
+            duration_s = len(self._speech) * VOICE_FRAME_MS / 1000
+            if self._silent_frames >= self._frames_for(VOICE_END_SILENCE_MS) or duration_s >= VOICE_MAX_UTTERANCE_S:
+                events.extend(self._finish())
+            elif self._since_partial >= self._frames_for(VOICE_PARTIAL_INTERVAL_MS):
+                self._since_partial = 0
+                window = int(VOICE_PARTIAL_WINDOW_S * self.sampling_rate)
+                events.append(("partial", np.concatenate(self._speech)[-window:]))
+        return events
+
+    def flush(self):
+        """End of stream: close the open utterance, if any."""
+        if self._in_speech:
+            if len(self._pending):
+                self._speech.append(self._pending)
+            self._pending = np.zeros(0, dtype=np.float32)
+            return self._finish()
+        return []
+
+
+class FrameDecoder:
+    """
+    Binary frames -> float32 mono at ASR_SAMPLING_RATE. Frames need not be
+    sample-aligned: a trailing partial sample is carried into the next frame,
+    and the resampler keeps its position across frames so frame boundaries
+    don't drop or repeat samples.
+    """
+
+    def __init__(self, encoding="pcm_s16le", sample_rate=ASR_SAMPLING_RATE):
+        self.encoding = encoding
+        self.sample_rate = sample_rate
+        self._dtype = "<f4" if encoding == "pcm_f32le" else "<i2"
+        self._leftover = b""
+        self._tail = np.zeros(0, dtype=np.float32)  # last input sample of the previous frame
+        self._position = 0.0  # next output sample, in input samples from the start of _tail
+
+    def decode(self, message):
+        data = self._leftover + message
+        width = np.dtype(self._dtype).itemsize
+        usable = len(data) - len(data) % width
+        self._leftover = data[usable:]
+        samples = np.frombuffer(data[:usable], dtype=self._dtype).astype(np.float32)
+        if self._dtype == "<i2":
+            samples /= 32768.0
+        if self.sample_rate == ASR_SAMPLING_RATE or not len(samples):
+            return samples
+
+        # Linear resampling is plenty for speech recognition input
+        buffer = np.concatenate([self._tail, samples])
+        step = self.sample_rate / ASR_SAMPLING_RATE
+        positions = np.arange(self._position, len(buffer) - 1 + 1e-9, step)
+        self._position = (positions[-1] + step if len(positions) else self._position) - (len(buffer) - 1)
+        self._tail = buffer[-1:]
+        return np.interp(positions, np.arange(len(buffer)), buffer).astype(np.float32)
+
+
+# --- 2️⃣ Session ---
+class VoiceSession:
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.loop = asyncio.get_running_loop()
+        self.outbox = asyncio.Queue()
+        self.segmenter = UtteranceSegmenter()
+        self.decoder = FrameDecoder()
+        self.stream_answer = True
+        self.scope = {}
+        self.utterance = 0
+        self.partial_running = False
+        self.tasks = set()
+
+    def send(self, event):
+        self.outbox.put_nowait(event)
+
+    async def _sender(self):
+        while True:
+            event = await self.outbox.get()
+            if event is None:
+                return
+            await self.websocket.send(json.dumps(event))
+
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _transcribe(self, audio):
+        # get_whisper() inside the executor: the first call loads the model
+        return await self.loop.run_in_executor(_asr_executor, lambda: transcribe(get_whisper(), audio))
+
+    async def _partial(self, utterance, audio):
+        try:
+            text = (await self._transcribe(audio)).strip()
+            if text and utterance == self.utterance + 1:  # still the open utterance
+                self.send({"type": "partial", "utterance": utterance, "text": text})
+        except Exception as e:
+            logger.warning("Partial transcription failed: %s", e)
+        finally:
+            self.partial_running = False
+
+    def _answer(self, utterance, question):
+        """Runs on a worker thread; pushes RAG events back onto the loop."""
+        from app import build_hybrid_context_and_query, stream_hybrid_answer
+
+        def push(event):
+            self.loop.call_soon_threadsafe(self.send, {**event, "utterance": utterance})
+
+        if self.stream_answer:
+            for event in stream_hybrid_answer(question, self.scope):
+                push(event)
+        else:
+            push({"type": "answer", "answer": build_hybrid_context_and_query(question, self.scope)})
+
+    async def _final(self, utterance, audio):
+        try:
+            text = (await self._transcribe(audio)).strip()
+        except Exception as e:
+            self.send({"type": "error", "utterance": utterance, "error": f"Transcription failed: {e}"})
+            return
+        self.send({"type": "final", "utterance": utterance, "text": text})
+        if not text:
+            return
+        try:
+            await self.loop.run_in_executor(_answer_executor, self._answer, utterance, text)
+        except Exception as e:
+            self.send({"type": "error", "utterance": utterance, "error": str(e)})
+
+    def _handle(self, events):
+        for kind, audio in events:
+            if kind == "final":
+                self.utterance += 1
+                self._spawn(self._final(self.utterance, audio))
+            elif not self.partial_running:
+                # Skip partials while one is in flight; the next one covers newer audio
+                self.partial_running = True
+                self._spawn(self._partial(self.utterance + 1, audio))
+
+    async def run(self):
+        sender = asyncio.ensure_future(self._sender())
+        try:
+            async for message in self.websocket:
+                if isinstance(message, bytes):
+                    samples = self.decoder.decode(message)
+                    self._handle(self.segmenter.feed(samples))
+                    continue
+
+                try:
+                    control = json.loads(message)
+                except json.JSONDecodeError:
+                    self.send({"type": "error", "error": "Invalid control message"})
+                    continue
+                if control.get("type") == "start":
+                    self.decoder = FrameDecoder(
+                        control.get("encoding", self.decoder.encoding),
+                        int(control.get("sample_rate", self.decoder.sample_rate)),
+                    )
+                    self.stream_answer = bool(control.get("stream_answer", True))
+                    self.scope = request_scope(control)
+                elif control.get("type") == "stop":
+                    break
+
+            self._handle(self.segmenter.flush())
+            while self.tasks:
+                await asyncio.gather(*list(self.tasks), return_exceptions=True)
+        finally:
+            self.send(None)
+            await sender
+
+
+async def handler(websocket):
+    if websocket.request.path.split("?")[0] != "/voice-stream":
+        await websocket.close(code=1008, reason="Unknown path")
+        return
+    await VoiceSession(websocket).run()
+
+
+async def main(host=VOICE_WS_HOST, port=VOICE_WS_PORT):
+    from websockets.asyncio.server import serve
+
+    async with serve(handler, host, port, max_size=2 ** 22) as server:
+        logger.info("Voice stream listening on ws://%s:%d/voice-stream", host, port)
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    asyncio.run(main())